@@ -9,6 +9,9 @@ from app.models import *  # noqa: F401, F403 — charge tous les modèles
 
 config = context.config
 config.set_main_option("sqlalchemy.url", settings.DATABASE_URL_SYNC)
+# Réglages lus par les révisions, qui n'importent pas le code de l'application
+config.set_main_option("partitionnement_annuel", "true" if settings.PARTITIONNEMENT_ANNUEL else "false")
+config.set_main_option("depot_principal", settings.DEPOT_PRINCIPAL.replace("%", "%%"))
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
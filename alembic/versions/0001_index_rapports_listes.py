@@ -0,0 +1,63 @@
+"""Index des rapports et des listes
+
+Index sur les dates et statuts des pièces (filtres des rapports, tris des
+listes), sur le code-barres des articles, et index trigrammes (pg_trgm) pour
+les recherches par sous-chaîne sur les articles et les clients.
+
+Première révision : elle s'applique à un schéma créé par Base.metadata.create_all.
+Les index déjà présents (schéma créé avec les modèles à jour) sont ignorés.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = [
+    ("factures", "date_facture"),
+    ("factures", "statut"),
+    ("commandes", "date_commande"),
+    ("commandes", "statut"),
+    ("bons_livraison", "date_bl"),
+    ("bons_livraison", "statut"),
+    ("mouvements_stock", "date_mouvement"),
+    ("articles", "code_barre"),
+]
+
+TRIGRAMMES = [
+    ("articles", "reference"),
+    ("articles", "designation"),
+    ("articles", "code_barre"),
+    ("clients", "code_client"),
+    ("clients", "raison_sociale"),
+    ("clients", "ville"),
+]
+
+
+def upgrade() -> None:
+    for table, column in INDEX:
+        op.create_index(f"ix_{table}_{column}", table, [column], if_not_exists=True)
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table, column in TRIGRAMMES:
+            op.create_index(
+                f"ix_{table}_{column}_trgm", table, [column], if_not_exists=True,
+                postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"},
+            )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        for table, column in TRIGRAMMES:
+            op.drop_index(f"ix_{table}_{column}_trgm", table_name=table, if_exists=True)
+    for table, column in INDEX:
+        op.drop_index(f"ix_{table}_{column}", table_name=table, if_exists=True)
@@ -0,0 +1,168 @@
+"""Partitionnement annuel des factures et des mouvements de stock
+
+Les lignes de facture et de mouvement reçoivent la date de leur pièce
+(date_facture, date_mouvement), renseignée à partir des pièces existantes.
+
+Si PARTITIONNEMENT_ANNUEL est activé (PostgreSQL uniquement, réglage transmis
+par alembic/env.py), les tables factures, lignes_facture, mouvements_stock et
+lignes_mouvement_stock sont ensuite converties en tables partitionnées par
+année. La conversion recopie les données ; prévoir une fenêtre de maintenance
+sur une base volumineuse.
+
+Clés, index et clés étrangères sont recréés tels qu'ils sont à cette révision
+(modèles d'origine et index de 0001), la clé de partitionnement ajoutée à la
+clé primaire et aux index uniques ; app/services/partition_service.py applique
+la même conversion au schéma courant (scripts/generate_dataset.py).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 14:00:00.000000
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Table -> colonne de partitionnement ; les pièces avant leurs lignes.
+TABLES = {
+    "factures": "date_facture",
+    "lignes_facture": "date_facture",
+    "mouvements_stock": "date_mouvement",
+    "lignes_mouvement_stock": "date_mouvement",
+}
+# Lignes -> (pièce, clé étrangère vers la pièce)
+LIGNES = {
+    "lignes_facture": ("factures", "facture_id"),
+    "lignes_mouvement_stock": ("mouvements_stock", "mouvement_id"),
+}
+# Index des tables converties : (nom, colonnes, unique)
+INDEX = {
+    "factures": [
+        ("ix_factures_numero", ["numero"], True),
+        ("ix_factures_client_id", ["client_id"], False),
+        ("ix_factures_date_facture", ["date_facture"], False),
+        ("ix_factures_statut", ["statut"], False),
+    ],
+    "lignes_facture": [
+        ("ix_lignes_facture_facture_id", ["facture_id"], False),
+        ("ix_lignes_facture_article_id", ["article_id"], False),
+    ],
+    "mouvements_stock": [
+        ("ix_mouvements_stock_numero", ["numero"], True),
+        ("ix_mouvements_stock_date_mouvement", ["date_mouvement"], False),
+    ],
+    "lignes_mouvement_stock": [
+        ("ix_lignes_mouvement_stock_article_id", ["article_id"], False),
+        ("ix_lignes_mouvement_stock_mouvement_id", ["mouvement_id"], False),
+    ],
+}
+# Clés étrangères portées par les tables converties ou pointant vers elles : (table, colonne, cible, ON DELETE)
+CLES_ETRANGERES = [
+    ("factures", "client_id", "clients", None),
+    ("factures", "commande_id", "commandes", None),
+    ("factures", "vrp_id", "vrps", None),
+    ("lignes_facture", "facture_id", "factures", "CASCADE"),
+    ("lignes_facture", "article_id", "articles", None),
+    ("mouvements_stock", "user_id", "users", None),
+    ("lignes_mouvement_stock", "mouvement_id", "mouvements_stock", "CASCADE"),
+    ("lignes_mouvement_stock", "article_id", "articles", None),
+    ("interventions", "facture_id", "factures", None),
+]
+
+
+def _partitionnee(conn: sa.Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).scalar())
+
+
+def _bornes(annee: int) -> str:
+    return f"FROM ('{annee}-01-01 00:00:00+00') TO ('{annee + 1}-01-01 00:00:00+00')"
+
+
+def _annees(conn: sa.Connection, table: str, column: str) -> range:
+    bornes = conn.execute(sa.text(
+        f"SELECT min(extract(year FROM {column} AT TIME ZONE 'UTC')), "
+        f"max(extract(year FROM {column} AT TIME ZONE 'UTC')) FROM {table}"
+    )).one()
+    courante = datetime.now(timezone.utc).year
+    debut = int(bornes[0]) if bornes[0] is not None else courante
+    fin = max(int(bornes[1]) if bornes[1] is not None else courante, courante)
+    return range(debut, fin + 2)
+
+
+def _reconstruire(conn: sa.Connection, name: str, key: str | None) -> None:
+    """Recrée la table (partitionnée par ``key``, ou simple), données, clé primaire et index compris."""
+    sequence = f"{name}_id_seq"
+    conn.execute(sa.text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    conn.execute(sa.text(f"ALTER TABLE {name} RENAME TO {name}_ancienne"))
+    partition_by = f" PARTITION BY RANGE ({key})" if key else ""
+    conn.execute(sa.text(f"CREATE TABLE {name} (LIKE {name}_ancienne INCLUDING DEFAULTS){partition_by}"))
+    if key:
+        conn.execute(sa.text(f"ALTER TABLE {name} ALTER COLUMN {key} SET NOT NULL"))
+        conn.execute(sa.text(f"CREATE TABLE {name}_defaut PARTITION OF {name} DEFAULT"))
+        for annee in _annees(conn, f"{name}_ancienne", key):
+            conn.execute(sa.text(f"CREATE TABLE {name}_{annee} PARTITION OF {name} FOR VALUES {_bornes(annee)}"))
+    conn.execute(sa.text(f"INSERT INTO {name} SELECT * FROM {name}_ancienne"))
+    conn.execute(sa.text(f"DROP TABLE {name}_ancienne CASCADE"))
+    conn.execute(sa.text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+
+    conn.execute(sa.text(f"ALTER TABLE {name} ADD PRIMARY KEY ({', '.join(['id', key] if key else ['id'])})"))
+    for index, columns, unique in INDEX[name]:
+        if unique and key:
+            columns = columns + [key]
+        conn.execute(sa.text(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX {index} ON {name} ({', '.join(columns)})"
+        ))
+
+
+def _cles_etrangeres(conn: sa.Connection, partitioned: bool) -> None:
+    for table, column, referred, ondelete in CLES_ETRANGERES:
+        columns, targets = [column], ["id"]
+        if partitioned and referred in TABLES:
+            if LIGNES.get(table, (None, None))[1] != column:
+                continue  # une table partitionnée ne peut être référencée que par sa clé complète
+            columns, targets = columns + [TABLES[table]], targets + [TABLES[referred]]
+        on_delete = f" ON DELETE {ondelete}" if ondelete else ""
+        conn.execute(sa.text(
+            f"ALTER TABLE {table} ADD FOREIGN KEY ({', '.join(columns)}) "
+            f"REFERENCES {referred} ({', '.join(targets)}){on_delete}"
+        ))
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    for lignes, (piece, fk) in LIGNES.items():
+        column = TABLES[lignes]
+        if column not in {c["name"] for c in inspector.get_columns(lignes)}:
+            op.add_column(lignes, sa.Column(column, sa.DateTime(timezone=True), nullable=True))
+        op.execute(
+            f"UPDATE {lignes} SET {column} = (SELECT {piece}.{column} FROM {piece} WHERE {piece}.id = {lignes}.{fk}) "
+            f"WHERE {column} IS NULL"
+        )
+
+    if (context.config.get_main_option("partitionnement_annuel") == "true"
+            and conn.dialect.name == "postgresql" and not _partitionnee(conn, "factures")):
+        for name, key in TABLES.items():
+            _reconstruire(conn, name, key)
+        _cles_etrangeres(conn, partitioned=True)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if _partitionnee(conn, "factures"):
+        for name in TABLES:
+            _reconstruire(conn, name, None)
+        _cles_etrangeres(conn, partitioned=False)
+    for lignes in LIGNES:
+        op.drop_column(lignes, TABLES[lignes])
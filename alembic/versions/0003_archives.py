@@ -0,0 +1,138 @@
+"""Tables d'archive des pièces closes
+
+factures_archive, commandes_archive, bons_livraison_archive et
+inventaires_archive : colonnes des tables courantes à cette révision, sans clés
+étrangères, lignes en JSON. Les révisions suivantes y ajoutent leurs propres
+colonnes. Elles sont remplies par scripts/archive_documents.py ; la descente
+supprime les pièces archivées.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 16:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Colonne -> index (unique ou non) de chaque table d'archive
+INDEX = {
+    "factures_archive": [("numero", True), ("client_id", False), ("statut", False), ("date_facture", False)],
+    "commandes_archive": [("numero", True), ("client_id", False), ("statut", False), ("date_commande", False)],
+    "bons_livraison_archive": [("numero", True), ("client_id", False), ("statut", False), ("date_bl", False)],
+    "inventaires_archive": [("numero", True)],
+}
+
+
+def _enum(nom: str, *valeurs: str) -> sa.Enum:
+    # Type enum des tables courantes, partagé sous PostgreSQL : il existe déjà
+    return sa.Enum(*valeurs, name=nom).with_variant(
+        postgresql.ENUM(*valeurs, name=nom, create_type=False), "postgresql"
+    )
+
+
+def _piece(nom: str, *columns: sa.Column) -> None:
+    op.create_table(
+        nom,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("numero", sa.String(20), nullable=False),
+        *columns,
+        sa.Column("lignes", sa.JSON(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    for column, unique in INDEX[nom]:
+        op.create_index(f"ix_{nom}_{column}", nom, [column], unique=unique, if_not_exists=True)
+
+
+def upgrade() -> None:
+    _piece(
+        "factures_archive",
+        sa.Column("client_id", sa.Integer(), nullable=False),
+        sa.Column("commande_id", sa.Integer()),
+        sa.Column("vrp_id", sa.Integer()),
+        sa.Column("statut", _enum(
+            "statutfacture", "BROUILLON", "EMISE", "ENVOYEE", "PAYEE_PARTIELLEMENT", "PAYEE", "EN_RETARD",
+            "ANNULEE", "AVOIR",
+        ), nullable=False),
+        sa.Column("date_facture", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("date_echeance", sa.DateTime(timezone=True)),
+        sa.Column("mode_reglement", sa.String(50)),
+        sa.Column("reference_client", sa.String(50)),
+        sa.Column("notes", sa.Text()),
+        sa.Column("adresse_facturation", sa.String(255)),
+        sa.Column("cp_facturation", sa.String(10)),
+        sa.Column("ville_facturation", sa.String(100)),
+        sa.Column("total_ht", sa.Numeric(14, 2), nullable=False),
+        sa.Column("total_tva", sa.Numeric(14, 2), nullable=False),
+        sa.Column("total_ttc", sa.Numeric(14, 2), nullable=False),
+        sa.Column("montant_regle", sa.Numeric(14, 2), nullable=False),
+        sa.Column("remise_globale_pct", sa.Numeric(5, 2), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    _piece(
+        "commandes_archive",
+        sa.Column("client_id", sa.Integer(), nullable=False),
+        sa.Column("vrp_id", sa.Integer()),
+        sa.Column("statut", _enum(
+            "statutcommande", "BROUILLON", "VALIDEE", "EN_PREPARATION", "PREPAREE", "EXPEDIEE", "LIVREE",
+            "FACTUREE", "ANNULEE",
+        ), nullable=False),
+        sa.Column("date_commande", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("date_livraison_souhaitee", sa.DateTime(timezone=True)),
+        sa.Column("reference_client", sa.String(50)),
+        sa.Column("notes", sa.Text()),
+        sa.Column("adresse_livraison", sa.String(255)),
+        sa.Column("cp_livraison", sa.String(10)),
+        sa.Column("ville_livraison", sa.String(100)),
+        sa.Column("pays_livraison", sa.String(50), nullable=False),
+        sa.Column("total_ht", sa.Numeric(14, 2), nullable=False),
+        sa.Column("total_tva", sa.Numeric(14, 2), nullable=False),
+        sa.Column("total_ttc", sa.Numeric(14, 2), nullable=False),
+        sa.Column("remise_globale_pct", sa.Numeric(5, 2), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    _piece(
+        "bons_livraison_archive",
+        sa.Column("commande_id", sa.Integer()),
+        sa.Column("client_id", sa.Integer(), nullable=False),
+        sa.Column("vrp_id", sa.Integer()),
+        sa.Column("statut", _enum(
+            "statutlivraison", "EN_PREPARATION", "PREPAREE", "EXPEDIEE", "LIVREE", "RETOUR", "ANNULEE",
+        ), nullable=False),
+        sa.Column("transport_id", sa.Integer()),
+        sa.Column("date_bl", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("date_expedition", sa.DateTime(timezone=True)),
+        sa.Column("date_livraison", sa.DateTime(timezone=True)),
+        sa.Column("adresse_livraison", sa.String(255)),
+        sa.Column("cp_livraison", sa.String(10)),
+        sa.Column("ville_livraison", sa.String(100)),
+        sa.Column("pays_livraison", sa.String(50), nullable=False),
+        sa.Column("poids_total", sa.Numeric(10, 3), nullable=False),
+        sa.Column("nb_colis", sa.Integer(), nullable=False),
+        sa.Column("notes", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    _piece(
+        "inventaires_archive",
+        sa.Column("depot", sa.String(100), nullable=False),
+        sa.Column("date_inventaire", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("statut", _enum("statutinventaire", "EN_COURS", "VALIDE", "ANNULE"), nullable=False),
+        sa.Column("notes", sa.Text()),
+        sa.Column("user_id", sa.Integer()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    for nom in reversed(INDEX):
+        op.drop_table(nom, if_exists=True)
@@ -0,0 +1,38 @@
+"""Clés d'idempotence des requêtes POST
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 17:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cles_idempotence",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cle", sa.String(255), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("methode", sa.String(10), nullable=False),
+        sa.Column("chemin", sa.String(255), nullable=False),
+        sa.Column("empreinte", sa.String(64), nullable=False),
+        sa.Column("status_code", sa.Integer()),
+        sa.Column("reponse", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint("user_id", "cle", name="uq_cles_idempotence_user_cle"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_cles_idempotence_created_at", "cles_idempotence", ["created_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_table("cles_idempotence")
@@ -0,0 +1,65 @@
+"""Journal des paiements
+
+Table paiements (un règlement par ligne, imputé sur factures.montant_regle).
+Chaque facture déjà réglée reçoit un paiement de reprise de son montant réglé.
+La clé étrangère vers factures n'est posée que si la table n'est pas
+partitionnée. Les paiements des factures archivées suivent en JSON.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 18:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _partitionnee(conn: sa.Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).scalar())
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    facture_fk = [] if _partitionnee(conn, "factures") else [sa.ForeignKey("factures.id")]
+    op.create_table(
+        "paiements",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("facture_id", sa.Integer(), *facture_fk, nullable=False),
+        sa.Column("montant", sa.Numeric(14, 2), nullable=False),
+        sa.Column("date_paiement", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("mode_reglement", sa.String(50)),
+        sa.Column("reference", sa.String(100)),
+        sa.Column("libelle", sa.String(255)),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_paiements_facture_id", "paiements", ["facture_id"], if_not_exists=True)
+    op.create_index("ix_paiements_reference", "paiements", ["reference"], if_not_exists=True)
+    op.execute(
+        "INSERT INTO paiements (facture_id, montant, date_paiement, mode_reglement, libelle) "
+        "SELECT id, montant_regle, updated_at, mode_reglement, 'Reprise du montant réglé' "
+        "FROM factures WHERE montant_regle > 0"
+    )
+
+    inspector = sa.inspect(conn)
+    if inspector.has_table("factures_archive") and "paiements" not in {
+        c["name"] for c in inspector.get_columns("factures_archive")
+    }:
+        op.add_column("factures_archive", sa.Column("paiements", sa.JSON()))
+
+
+def downgrade() -> None:
+    op.drop_column("factures_archive", "paiements")
+    op.drop_table("paiements")
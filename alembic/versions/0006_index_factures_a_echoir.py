@@ -0,0 +1,34 @@
+"""Index partiel des factures à échoir
+
+Index sur date_echeance limité aux factures émises ou envoyées : le passage
+des retards (scripts/mark_overdue.py) ne lit que les factures échues depuis
+le passage précédent.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 19:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Factures émises ou envoyées (statuts enregistrés par leur nom)
+A_ECHOIR = sa.text("statut IN ('EMISE', 'ENVOYEE')")
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_factures_a_echoir", "factures", ["date_echeance"], if_not_exists=True,
+        postgresql_where=A_ECHOIR, sqlite_where=A_ECHOIR,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_factures_a_echoir", "factures")
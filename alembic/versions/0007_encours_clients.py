@@ -0,0 +1,32 @@
+"""Encours des clients
+
+Colonne clients.encours (reste dû des factures non annulées), initialisée
+depuis les factures puis tenue à jour par l'application.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 20:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("clients", sa.Column("encours", sa.Numeric(14, 2), nullable=False, server_default="0"))
+    op.execute(
+        "UPDATE clients SET encours = COALESCE(("
+        "SELECT SUM(total_ttc - montant_regle) FROM factures "
+        "WHERE factures.client_id = clients.id AND statut <> 'ANNULEE'), 0)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("clients", "encours")
@@ -0,0 +1,38 @@
+"""Livraisons partielles et reliquats
+
+Statut de commande « expédiée partiellement », priorité des commandes
+(ordre de service des reliquats) et stock alloué aux lignes de commande.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 22:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        # Type enum partagé par commandes et commandes_archive ; ADD VALUE hors transaction
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE statutcommande ADD VALUE IF NOT EXISTS 'EXPEDIEE_PARTIELLEMENT' BEFORE 'EXPEDIEE'")
+    inspector = sa.inspect(op.get_bind())
+    for table in ("commandes", "commandes_archive"):
+        if "priorite" not in {c["name"] for c in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column("priorite", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("lignes_commande", sa.Column("quantite_allouee", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    # La valeur d'enum ne peut pas être retirée du type PostgreSQL : elle reste inutilisée.
+    op.drop_column("lignes_commande", "quantite_allouee")
+    for table in ("commandes_archive", "commandes"):
+        op.drop_column(table, "priorite")
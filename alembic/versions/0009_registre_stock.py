@@ -0,0 +1,62 @@
+"""Registre du stock par variante
+
+Table ``stocks`` (physique et réservé par article, taille et couleur),
+initialisée avec le stock des articles (sans variante) et le réservé des
+reliquats alloués et des BL en préparation.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 23:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stocks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("article_id", sa.Integer(), sa.ForeignKey("articles.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("taille", sa.String(20), nullable=False, server_default=""),
+        sa.Column("couleur", sa.String(50), nullable=False, server_default=""),
+        sa.Column("physique", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("reserve", sa.Integer(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("article_id", "taille", "couleur", name="uq_stocks_variante"),
+    )
+    op.create_index("ix_stocks_article_id", "stocks", ["article_id"])
+
+    op.execute(
+        "INSERT INTO stocks (article_id, taille, couleur, physique, reserve) "
+        "SELECT id, '', '', stock_actuel, 0 FROM articles"
+    )
+    # WHERE true : lève l'ambiguïté INSERT ... SELECT / ON CONFLICT pour SQLite
+    op.execute("""
+        INSERT INTO stocks (article_id, taille, couleur, physique, reserve)
+        SELECT article_id, taille, couleur, 0, SUM(quantite) FROM (
+            SELECT l.article_id, COALESCE(l.taille, '') AS taille, COALESCE(l.couleur, '') AS couleur,
+                   l.quantite_allouee AS quantite
+            FROM lignes_commande l JOIN commandes c ON c.id = l.commande_id
+            WHERE l.quantite_allouee > 0
+              AND c.statut IN ('VALIDEE', 'EN_PREPARATION', 'PREPAREE', 'EXPEDIEE_PARTIELLEMENT')
+            UNION ALL
+            SELECT l.article_id, COALESCE(l.taille, ''), COALESCE(l.couleur, ''), l.quantite
+            FROM lignes_bon_livraison l JOIN bons_livraison b ON b.id = l.bon_livraison_id
+            WHERE b.statut IN ('EN_PREPARATION', 'PREPAREE')
+        ) reservations
+        WHERE true
+        GROUP BY article_id, taille, couleur
+        ON CONFLICT (article_id, taille, couleur) DO UPDATE SET reserve = excluded.reserve
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stocks_article_id", table_name="stocks")
+    op.drop_table("stocks")
@@ -0,0 +1,72 @@
+"""Stock par dépôt et par variante
+
+Table ``stocks_depots`` (stock physique par article, dépôt, taille et couleur),
+initialisée au dépôt principal avec le stock physique des variantes. Les stocks
+des articles, tailles, couleurs et dépôts deviennent des caches du registre et
+sont refaits à partir de lui.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-20 09:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stocks_depots",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("article_id", sa.Integer(), sa.ForeignKey("articles.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("depot", sa.String(100), nullable=False),
+        sa.Column("taille", sa.String(20), nullable=False, server_default=""),
+        sa.Column("couleur", sa.String(50), nullable=False, server_default=""),
+        sa.Column("quantite", sa.Integer(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("article_id", "depot", "taille", "couleur", name="uq_stocks_depots_variante"),
+    )
+    op.create_index("ix_stocks_depots_article_id", "stocks_depots", ["article_id"])
+
+    # Dépôt principal configuré (DEPOT_PRINCIPAL), transmis par alembic/env.py
+    depot = sa.bindparam("depot", context.config.get_main_option("depot_principal", "Principal"))
+    op.get_bind().execute(
+        sa.text(
+            "INSERT INTO stocks_depots (article_id, depot, taille, couleur, quantite) "
+            "SELECT article_id, :depot, taille, couleur, physique FROM stocks"
+        ).bindparams(depot)
+    )
+    op.get_bind().execute(
+        sa.text(
+            "INSERT INTO article_depots (article_id, depot, stock) "
+            "SELECT a.id, :depot, 0 FROM articles a WHERE NOT EXISTS ("
+            "SELECT 1 FROM article_depots d WHERE d.article_id = a.id AND d.depot = :depot)"
+        ).bindparams(depot)
+    )
+    op.execute(
+        "UPDATE articles SET stock_actuel = "
+        "(SELECT COALESCE(SUM(s.physique), 0) FROM stocks s WHERE s.article_id = articles.id)"
+    )
+    op.execute(
+        "UPDATE article_tailles SET stock = (SELECT COALESCE(SUM(s.physique), 0) FROM stocks s "
+        "WHERE s.article_id = article_tailles.article_id AND s.taille = article_tailles.taille)"
+    )
+    op.execute(
+        "UPDATE article_couleurs SET stock = (SELECT COALESCE(SUM(s.physique), 0) FROM stocks s "
+        "WHERE s.article_id = article_couleurs.article_id AND s.couleur = article_couleurs.couleur)"
+    )
+    op.execute(
+        "UPDATE article_depots SET stock = (SELECT COALESCE(SUM(s.quantite), 0) FROM stocks_depots s "
+        "WHERE s.article_id = article_depots.article_id AND s.depot = article_depots.depot)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stocks_depots_article_id", table_name="stocks_depots")
+    op.drop_table("stocks_depots")
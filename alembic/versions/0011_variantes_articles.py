@@ -0,0 +1,42 @@
+"""Variantes d'articles (SKU taille × couleur)
+
+Table ``article_variantes`` : une ligne par combinaison taille × couleur
+vendable d'un article, avec son EAN, un prix propre facultatif et le cache de
+son stock physique au registre du stock.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-21 09:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "article_variantes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("article_id", sa.Integer(), sa.ForeignKey("articles.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("taille", sa.String(20), nullable=False, server_default=""),
+        sa.Column("couleur", sa.String(50), nullable=False, server_default=""),
+        sa.Column("ean", sa.String(14), nullable=True),
+        sa.Column("stock", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("prix_vente_ht", sa.Numeric(12, 4), nullable=True),
+        sa.UniqueConstraint("article_id", "taille", "couleur", name="uq_article_variantes"),
+    )
+    op.create_index("ix_article_variantes_article_id", "article_variantes", ["article_id"])
+    op.create_index("ix_article_variantes_ean", "article_variantes", ["ean"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_article_variantes_ean", table_name="article_variantes")
+    op.drop_index("ix_article_variantes_article_id", table_name="article_variantes")
+    op.drop_table("article_variantes")
@@ -0,0 +1,83 @@
+"""Unicité des numéros de ligne des pièces
+
+Contraintes uq_lignes_commande_numero, uq_lignes_facture_numero et
+uq_lignes_bon_livraison_numero sur (pièce, numéro de ligne) : clés naturelles
+des upserts de scripts/migrate_hyperfile.py. Sur lignes_facture partitionnée,
+la contrainte inclut la date de la facture (clé de partitionnement).
+
+Les lignes qui reprennent un numéro déjà pris dans leur pièce sont d'abord
+renumérotées à la suite de la dernière ligne de la pièce ; la descente ne les
+remet pas à leur ancien numéro.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-22 09:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Table -> (contrainte, clé étrangère vers la pièce)
+CONTRAINTES = {
+    "lignes_commande": ("uq_lignes_commande_numero", "commande_id"),
+    "lignes_facture": ("uq_lignes_facture_numero", "facture_id"),
+    "lignes_bon_livraison": ("uq_lignes_bon_livraison_numero", "bon_livraison_id"),
+}
+# Clé de partitionnement des tables de lignes pouvant être partitionnées (révision 0002)
+PARTITIONS = {"lignes_facture": "date_facture"}
+
+
+def _partitionnee(conn: sa.Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).scalar())
+
+
+def _renumeroter(conn: sa.Connection, table: str, fk: str) -> None:
+    """Renumérote, à la suite de la pièce, les lignes dont le numéro est déjà pris par une ligne plus ancienne."""
+    doublons = f"SELECT {fk}, ligne_numero FROM {table} GROUP BY {fk}, ligne_numero HAVING COUNT(*) > 1"
+    lignes = conn.execute(sa.text(
+        f"SELECT id, {fk}, ligne_numero FROM {table} WHERE ({fk}, ligne_numero) IN ({doublons}) "
+        f"ORDER BY {fk}, ligne_numero, id"
+    )).all()
+    if not lignes:
+        return
+    derniers = dict(conn.execute(sa.text(
+        f"SELECT {fk}, MAX(ligne_numero) FROM {table} WHERE {fk} IN (SELECT {fk} FROM ({doublons}) d) GROUP BY {fk}"
+    )).all())
+    vus, numeros = set(), []
+    for ident, piece, numero in lignes:
+        if (piece, numero) in vus:
+            derniers[piece] += 1
+            numeros.append({"ident": ident, "numero": derniers[piece]})
+        vus.add((piece, numero))
+    conn.execute(sa.text(f"UPDATE {table} SET ligne_numero = :numero WHERE id = :ident"), numeros)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    for table, (nom, fk) in CONTRAINTES.items():
+        if nom in {c["name"] for c in inspector.get_unique_constraints(table)}:
+            continue
+        _renumeroter(conn, table, fk)
+        columns = [fk, "ligne_numero"]
+        if table in PARTITIONS and _partitionnee(conn, table):
+            columns.append(PARTITIONS[table])
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_unique_constraint(nom, columns)
+
+
+def downgrade() -> None:
+    for table, (nom, _) in CONTRAINTES.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(nom, type_="unique")
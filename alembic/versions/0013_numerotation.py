@@ -0,0 +1,77 @@
+"""Compteurs de numérotation et liens factures-commandes
+
+Table compteurs : dernier numéro attribué par type de pièce, réservé par
+UPDATE ... RETURNING (voir app/services/numerotation_service.py). Les compteurs
+sont créés au premier numéro, à partir du nombre de pièces existantes.
+
+Table factures_commandes : commandes facturées par chaque facture, y compris
+les factures groupées (commande_id vide), reprises de leurs notes
+« Commandes CMD-..., CMD-... ». La clé étrangère vers factures n'est posée que
+si la table n'est pas partitionnée. Les liens des factures archivées suivent en
+JSON.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-23 09:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _partitionnee(conn: sa.Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).scalar())
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    op.create_table(
+        "compteurs",
+        sa.Column("piece", sa.String(50), primary_key=True),
+        sa.Column("valeur", sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+
+    facture_fk = [] if _partitionnee(conn, "factures") else [sa.ForeignKey("factures.id", ondelete="CASCADE")]
+    op.create_table(
+        "factures_commandes",
+        sa.Column("facture_id", sa.Integer(), *facture_fk, primary_key=True),
+        sa.Column("commande_id", sa.Integer(), sa.ForeignKey("commandes.id"), primary_key=True),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_factures_commandes_commande_id", "factures_commandes", ["commande_id"], if_not_exists=True
+    )
+    op.execute(
+        "INSERT INTO factures_commandes (facture_id, commande_id) "
+        "SELECT id, commande_id FROM factures WHERE commande_id IS NOT NULL"
+    )
+    op.execute(
+        "INSERT INTO factures_commandes (facture_id, commande_id) "
+        "SELECT f.id, c.id FROM factures f JOIN commandes c ON c.client_id = f.client_id "
+        "WHERE f.commande_id IS NULL AND f.notes LIKE 'Commandes %' "
+        "AND ' ' || f.notes || ',' LIKE '% ' || c.numero || ',%'"
+    )
+
+    inspector = sa.inspect(conn)
+    if inspector.has_table("factures_archive") and "factures_commandes" not in {
+        c["name"] for c in inspector.get_columns("factures_archive")
+    }:
+        op.add_column("factures_archive", sa.Column("factures_commandes", sa.JSON()))
+
+
+def downgrade() -> None:
+    op.drop_column("factures_archive", "factures_commandes")
+    op.drop_table("factures_commandes")
+    op.drop_table("compteurs")
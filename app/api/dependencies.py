@@ -0,0 +1,60 @@
+import hashlib
+
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.dependencies import get_current_user
+from app.database import get_db
+from app.models.idempotence import CleIdempotence
+from app.models.user import User
+from app.services import idempotence_service
+
+
+class Idempotence:
+    """Contexte d'idempotence d'une requête POST.
+
+    ``reponse`` contient la réponse à rejouer si la même requête a déjà abouti ;
+    sinon la route s'exécute et passe son résultat à ``enregistrer``.
+    """
+
+    def __init__(self, db: AsyncSession, entree: CleIdempotence | None = None, reponse: JSONResponse | None = None):
+        self.db = db
+        self.entree = entree
+        self.reponse = reponse
+
+    async def enregistrer(self, contenu, status_code: int = 200):
+        if self.entree is not None:
+            await idempotence_service.enregistrer_reponse(self.db, self.entree, status_code, jsonable_encoder(contenu))
+        return contenu
+
+
+async def get_idempotence(
+    request: Request,
+    idempotency_key: str | None = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+) -> Idempotence:
+    if idempotency_key is None:
+        return Idempotence(db)
+
+    empreinte = hashlib.sha256(
+        f"{request.method} {request.url.path}?{request.url.query}\n".encode() + await request.body()
+    ).hexdigest()
+    entree = await idempotence_service.get_cle(db, user.id, idempotency_key)
+    if entree is None:
+        entree = await idempotence_service.reserver_cle(
+            db, user.id, idempotency_key, request.method, request.url.path, empreinte
+        )
+        if entree is not None:
+            return Idempotence(db, entree)
+        entree = await idempotence_service.get_cle(db, user.id, idempotency_key)
+
+    if entree is None or entree.status_code is None:
+        raise HTTPException(status_code=409, detail="Requête déjà en cours de traitement avec cette clé")
+    if entree.empreinte != empreinte:
+        raise HTTPException(status_code=400, detail="Clé d'idempotence déjà utilisée pour une autre requête")
+    return Idempotence(db, reponse=JSONResponse(
+        entree.reponse, status_code=entree.status_code, headers={"Idempotency-Replayed": "true"}
+    ))
@@ -15,6 +15,9 @@ from app.schemas.article import (
     ArticleTailleRead,
     ArticleCouleurCreate,
     ArticleCouleurRead,
+    ArticleVarianteCreate,
+    ArticleVarianteRead,
+    GrilleVariantesRead,
     ArticleDepotCreate,
     ArticleDepotRead,
     ArticleTarifCreate,
@@ -68,7 +71,10 @@ async def create_article(
     existing = await article_service.get_article_by_ref(db, data.reference)
     if existing:
         raise HTTPException(status_code=400, detail="Référence article déjà existante")
-    return await article_service.create_article(db, data)
+    try:
+        return await article_service.create_article(db, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @router.put("/{article_id}", response_model=ArticleRead)
@@ -116,6 +122,35 @@ async def add_couleur(
     return await article_service.add_couleur(db, article_id, data)
 
 
+@router.put("/{article_id}/variantes", response_model=list[ArticleVarianteRead])
+async def definir_variantes(
+    article_id: int,
+    data: list[ArticleVarianteCreate],
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    """Crée ou met à jour les variantes (taille × couleur) données ; renvoie toutes les variantes de l'article."""
+    article = await article_service.get_article(db, article_id)
+    if not article:
+        raise HTTPException(status_code=404, detail="Article introuvable")
+    try:
+        return await article_service.definir_variantes(db, article_id, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.get("/{article_id}/grille", response_model=GrilleVariantesRead)
+async def get_grille(
+    article_id: int,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    article = await article_service.get_article(db, article_id)
+    if not article:
+        raise HTTPException(status_code=404, detail="Article introuvable")
+    return await article_service.get_grille(db, article)
+
+
 @router.post("/{article_id}/depots", response_model=ArticleDepotRead, status_code=201)
 async def add_depot(
     article_id: int,
@@ -1,19 +1,37 @@
 import math
+from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.dependencies import Idempotence, get_idempotence
 from app.auth.dependencies import get_current_user
 from app.database import get_db
-from app.models.commande import StatutCommande
+from app.models.commande import Commande, StatutCommande
 from app.models.user import User
-from app.schemas.commande import CommandeCreate, CommandeUpdate, CommandeRead, CommandeList
+from app.schemas.commande import (
+    AllocationRead, CommandeCreate, CommandeUpdate, CommandeRead, CommandeList, DevisCreate, DevisRead,
+    EditionLigneRead, ImportCommandesRead, LigneCommandeCreate, LigneCommandeRead, LigneCommandeUpdate,
+)
 from app.schemas.common import PaginatedResponse, MessageResponse
-from app.services import commande_service
+from app.schemas.facture import FacturationCreate, FacturationRead
+from app.services import (
+    allocation_service, archive_service, client_service, commande_service, facturation_service, import_service,
+    tarif_service,
+)
 
 router = APIRouter()
 
 
+async def _controler_encours(db: AsyncSession, response: Response, client_id: int, montant, forcer: bool) -> None:
+    """Bloque une commande qui fait dépasser l'encours autorisé, sauf ``forcer`` (alerte en en-tête)."""
+    alerte = await client_service.controler_encours(db, client_id, montant)
+    if alerte and not forcer:
+        raise HTTPException(status_code=400, detail=alerte)
+    if alerte:
+        response.headers["X-Encours-Depasse"] = "true"
+
+
 @router.get("", response_model=PaginatedResponse)
 async def list_commandes(
     page: int = Query(1, ge=1),
@@ -48,10 +66,78 @@ async def get_commande(
 @router.post("", response_model=CommandeRead, status_code=201)
 async def create_commande(
     data: CommandeCreate,
+    response: Response,
+    forcer: bool = False,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+    idempotence: Idempotence = Depends(get_idempotence),
+):
+    if idempotence.reponse:
+        return idempotence.reponse
+    try:
+        commande = await commande_service.create_commande(db, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    await _controler_encours(db, response, commande.client_id, commande.total_ttc, forcer)
+    return await idempotence.enregistrer(CommandeRead.model_validate(commande), 201)
+
+
+@router.post("/devis", response_model=DevisRead)
+async def chiffrer_devis(
+    data: DevisCreate,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    try:
+        return await tarif_service.chiffrer_devis(db, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.post("/import", response_model=ImportCommandesRead)
+async def importer_commandes(
+    fichier: UploadFile = File(...),
+    simulation: bool = False,
     db: AsyncSession = Depends(get_db),
     _user: User = Depends(get_current_user),
 ):
-    return await commande_service.create_commande(db, data)
+    """Importe un fichier de commandes (CSV ou JSON lines), avec le détail des lignes rejetées."""
+    try:
+        return await import_service.importer(db, import_service.ouvrir(fichier.file), simulation)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Fichier illisible : {exc}") from exc
+
+
+@router.post("/facturation", response_model=FacturationRead)
+async def facturer_commandes(
+    data: FacturationCreate,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    """Facture en une fois toutes les commandes éligibles du filtre."""
+    commandes, numeros, total_ttc = 0, [], Decimal("0")
+    while (lot := await facturation_service.facturer_lot(db, data)).commandes:
+        commandes += lot.commandes
+        numeros += lot.numeros
+        total_ttc += lot.total_ttc
+    return FacturationRead(
+        commandes=commandes,
+        factures=len(numeros),
+        total_ttc=total_ttc,
+        premier_numero=numeros[0] if numeros else None,
+        dernier_numero=numeros[-1] if numeros else None,
+    )
+
+
+@router.post("/reliquats/allouer", response_model=AllocationRead)
+async def allouer_reliquats(
+    article_id: list[int] | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    """Répartit le stock libre entre les reliquats ouverts (tous les articles, ou ceux demandés)."""
+    allocation = await allocation_service.allouer(db, article_id)
+    return AllocationRead(lignes=allocation.lignes, quantite=allocation.quantite)
 
 
 @router.put("/{commande_id}", response_model=CommandeRead)
@@ -64,19 +150,112 @@ async def update_commande(
     commande = await commande_service.get_commande(db, commande_id)
     if not commande:
         raise HTTPException(status_code=404, detail="Commande introuvable")
+    if archive_service.est_archivee(commande):
+        raise HTTPException(status_code=400, detail="Commande archivée : lecture seule")
     return await commande_service.update_commande(db, commande, data)
 
 
+async def _commande_modifiable(db: AsyncSession, commande_id: int) -> Commande:
+    """Commande dont les lignes peuvent être modifiées : un brouillon."""
+    commande = await commande_service.get_commande_seule(db, commande_id)
+    if not commande:
+        raise HTTPException(status_code=404, detail="Commande introuvable")
+    if commande.statut != StatutCommande.BROUILLON:
+        raise HTTPException(status_code=400, detail="Commande validée : lignes non modifiables")
+    return commande
+
+
+def _edition(commande: Commande, ligne=None) -> EditionLigneRead:
+    return EditionLigneRead(
+        commande_id=commande.id,
+        ligne=LigneCommandeRead.model_validate(ligne) if ligne is not None else None,
+        total_ht=commande.total_ht,
+        total_tva=commande.total_tva,
+        total_ttc=commande.total_ttc,
+    )
+
+
+@router.post("/{commande_id}/lignes", response_model=EditionLigneRead, status_code=201)
+async def ajouter_ligne(
+    commande_id: int,
+    data: LigneCommandeCreate,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    commande = await _commande_modifiable(db, commande_id)
+    try:
+        ligne = await commande_service.ajouter_ligne(db, commande, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _edition(commande, ligne)
+
+
+@router.patch("/{commande_id}/lignes/{ligne_id}", response_model=EditionLigneRead)
+async def modifier_ligne(
+    commande_id: int,
+    ligne_id: int,
+    data: LigneCommandeUpdate,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    commande = await _commande_modifiable(db, commande_id)
+    ligne = await commande_service.get_ligne(db, commande_id, ligne_id)
+    if not ligne:
+        raise HTTPException(status_code=404, detail="Ligne introuvable")
+    return _edition(commande, await commande_service.modifier_ligne(db, commande, ligne, data))
+
+
+@router.delete("/{commande_id}/lignes/{ligne_id}", response_model=EditionLigneRead)
+async def supprimer_ligne(
+    commande_id: int,
+    ligne_id: int,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    commande = await _commande_modifiable(db, commande_id)
+    ligne = await commande_service.get_ligne(db, commande_id, ligne_id)
+    if not ligne:
+        raise HTTPException(status_code=404, detail="Ligne introuvable")
+    await commande_service.supprimer_ligne(db, commande, ligne)
+    return _edition(commande)
+
+
 @router.post("/{commande_id}/valider", response_model=CommandeRead)
 async def valider_commande(
     commande_id: int,
+    response: Response,
+    forcer: bool = False,
     db: AsyncSession = Depends(get_db),
     _user: User = Depends(get_current_user),
 ):
     commande = await commande_service.get_commande(db, commande_id)
     if not commande:
         raise HTTPException(status_code=404, detail="Commande introuvable")
-    return await commande_service.changer_statut(db, commande, StatutCommande.VALIDEE)
+    if archive_service.est_archivee(commande):
+        raise HTTPException(status_code=400, detail="Commande archivée : lecture seule")
+    try:
+        commande = await commande_service.valider(db, commande)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    await _controler_encours(db, response, commande.client_id, commande.total_ttc, forcer)
+    return commande
+
+
+@router.post("/{commande_id}/annuler", response_model=CommandeRead)
+async def annuler_commande(
+    commande_id: int,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    commande = await commande_service.get_commande(db, commande_id)
+    if not commande:
+        raise HTTPException(status_code=404, detail="Commande introuvable")
+    if archive_service.est_archivee(commande):
+        raise HTTPException(status_code=400, detail="Commande archivée : lecture seule")
+    try:
+        return await commande_service.annuler(db, commande)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @router.post("/{commande_id}/facturer", response_model=dict)
@@ -85,14 +264,25 @@ async def facturer_commande(
     mode_reglement: str | None = None,
     db: AsyncSession = Depends(get_db),
     _user: User = Depends(get_current_user),
+    idempotence: Idempotence = Depends(get_idempotence),
 ):
     from app.services import facture_service
 
+    if idempotence.reponse:
+        return idempotence.reponse
+
     commande = await commande_service.get_commande(db, commande_id)
     if not commande:
         raise HTTPException(status_code=404, detail="Commande introuvable")
-    facture = await facture_service.create_facture_from_commande(db, commande, mode_reglement)
-    return {"message": "Facture créée", "facture_numero": facture.numero, "facture_id": facture.id}
+    if archive_service.est_archivee(commande):
+        raise HTTPException(status_code=400, detail="Commande archivée : lecture seule")
+    try:
+        facture = await facture_service.create_facture_from_commande(db, commande, mode_reglement)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return await idempotence.enregistrer(
+        {"message": "Facture créée", "facture_numero": facture.numero, "facture_id": facture.id}
+    )
 
 
 @router.post("/{commande_id}/livrer", response_model=dict)
@@ -101,11 +291,20 @@ async def livrer_commande(
     transport_id: int | None = None,
     db: AsyncSession = Depends(get_db),
     _user: User = Depends(get_current_user),
+    idempotence: Idempotence = Depends(get_idempotence),
 ):
     from app.services import livraison_service
 
+    if idempotence.reponse:
+        return idempotence.reponse
+
     commande = await commande_service.get_commande(db, commande_id)
     if not commande:
         raise HTTPException(status_code=404, detail="Commande introuvable")
-    bl = await livraison_service.create_bl_from_commande(db, commande, transport_id)
-    return {"message": "Bon de livraison créé", "bl_numero": bl.numero, "bl_id": bl.id}
+    if archive_service.est_archivee(commande):
+        raise HTTPException(status_code=400, detail="Commande archivée : lecture seule")
+    try:
+        bl = await livraison_service.create_bl_from_commande(db, commande, transport_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return await idempotence.enregistrer({"message": "Bon de livraison créé", "bl_numero": bl.numero, "bl_id": bl.id})
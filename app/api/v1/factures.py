@@ -1,15 +1,18 @@
 import math
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.dependencies import Idempotence, get_idempotence
 from app.auth.dependencies import get_current_user
 from app.database import get_db
 from app.models.facture import StatutFacture
 from app.models.user import User
-from app.schemas.facture import FactureCreate, FactureRead, FactureList, PaiementCreate
+from app.schemas.facture import (
+    FactureCreate, FactureRead, FactureList, PaiementCreate, PaiementRead, RapprochementRead,
+)
 from app.schemas.common import PaginatedResponse
-from app.services import facture_service
+from app.services import archive_service, facture_service, rapprochement_service
 
 router = APIRouter()
 
@@ -50,8 +53,12 @@ async def create_facture(
     data: FactureCreate,
     db: AsyncSession = Depends(get_db),
     _user: User = Depends(get_current_user),
+    idempotence: Idempotence = Depends(get_idempotence),
 ):
-    return await facture_service.create_facture(db, data)
+    if idempotence.reponse:
+        return idempotence.reponse
+    facture = await facture_service.create_facture(db, data)
+    return await idempotence.enregistrer(FactureRead.model_validate(facture), 201)
 
 
 @router.post("/{facture_id}/paiement", response_model=FactureRead)
@@ -59,9 +66,64 @@ async def enregistrer_paiement(
     facture_id: int,
     data: PaiementCreate,
     db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+    idempotence: Idempotence = Depends(get_idempotence),
+):
+    if idempotence.reponse:
+        return idempotence.reponse
+    facture = await facture_service.get_facture(db, facture_id)
+    if not facture:
+        raise HTTPException(status_code=404, detail="Facture introuvable")
+    if archive_service.est_archivee(facture):
+        raise HTTPException(status_code=400, detail="Facture archivée : lecture seule")
+    try:
+        facture = await facture_service.enregistrer_paiement(
+            db, facture, data.montant, data.mode_reglement, data.reference, user.id
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return await idempotence.enregistrer(FactureRead.model_validate(facture))
+
+
+@router.post("/{facture_id}/annuler", response_model=FactureRead)
+async def annuler_facture(
+    facture_id: int,
+    db: AsyncSession = Depends(get_db),
     _user: User = Depends(get_current_user),
 ):
     facture = await facture_service.get_facture(db, facture_id)
     if not facture:
         raise HTTPException(status_code=404, detail="Facture introuvable")
-    return await facture_service.enregistrer_paiement(db, facture, data.montant)
+    if archive_service.est_archivee(facture):
+        raise HTTPException(status_code=400, detail="Facture archivée : lecture seule")
+    if facture.statut in (StatutFacture.ANNULEE, StatutFacture.AVOIR):
+        raise HTTPException(status_code=400, detail="Facture déjà annulée")
+    if facture.montant_regle > 0:
+        raise HTTPException(status_code=400, detail="Facture réglée : établir un avoir")
+    return await facture_service.annuler_facture(db, facture)
+
+
+@router.get("/{facture_id}/paiements", response_model=list[PaiementRead])
+async def list_paiements(
+    facture_id: int,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    facture = await facture_service.get_facture(db, facture_id)
+    if not facture:
+        raise HTTPException(status_code=404, detail="Facture introuvable")
+    return await facture_service.get_paiements(db, facture)
+
+
+@router.post("/rapprochement", response_model=RapprochementRead)
+async def rapprocher_releve(
+    releve: UploadFile = File(...),
+    simulation: bool = False,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    try:
+        lignes = rapprochement_service.lire_releve(await releve.read())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Relevé illisible : {exc}") from exc
+    return await rapprochement_service.rapprocher(db, lignes, simulation, user.id)
@@ -7,9 +7,11 @@ from app.auth.dependencies import get_current_user
 from app.database import get_db
 from app.models.livraison import StatutLivraison
 from app.models.user import User
-from app.schemas.livraison import BonLivraisonCreate, BonLivraisonRead, BonLivraisonList
+from app.schemas.livraison import (
+    BonLivraisonCreate, BonLivraisonRead, BonLivraisonList, ExpeditionCreate, ExpeditionRead,
+)
 from app.schemas.common import PaginatedResponse
-from app.services import livraison_service
+from app.services import archive_service, livraison_service
 
 router = APIRouter()
 
@@ -33,6 +35,25 @@ async def list_bons_livraison(
     )
 
 
+@router.post("/expedier", response_model=ExpeditionRead)
+async def expedier_en_masse(
+    data: ExpeditionCreate,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Expédie en une opération les BL désignés ; ``ignores`` liste ceux qui n'étaient pas en préparation."""
+    if not data.bl_ids and data.date_bl is None:
+        raise HTTPException(status_code=400, detail="Aucun BL désigné")
+    bls = await livraison_service.get_bons_a_expedier(db, data.bl_ids, data.date_bl)
+    expedition = await livraison_service.expedier(db, bls, user_id=user.id)
+    return ExpeditionRead(
+        bls=expedition.bls,
+        mouvements=expedition.mouvements,
+        quantite=expedition.quantite,
+        ignores=sorted(set(data.bl_ids) - {bl.id for bl in bls}),
+    )
+
+
 @router.get("/{bl_id}", response_model=BonLivraisonRead)
 async def get_bon_livraison(
     bl_id: int,
@@ -58,21 +79,42 @@ async def create_bon_livraison(
 async def expedier(
     bl_id: int,
     db: AsyncSession = Depends(get_db),
-    _user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user),
 ):
     bl = await livraison_service.get_bon_livraison(db, bl_id)
     if not bl:
         raise HTTPException(status_code=404, detail="BL introuvable")
-    return await livraison_service.changer_statut(db, bl, StatutLivraison.EXPEDIEE)
+    if archive_service.est_archivee(bl):
+        raise HTTPException(status_code=400, detail="BL archivé : lecture seule")
+    return await livraison_service.changer_statut(db, bl, StatutLivraison.EXPEDIEE, user.id)
 
 
 @router.post("/{bl_id}/livrer", response_model=BonLivraisonRead)
 async def marquer_livre(
     bl_id: int,
     db: AsyncSession = Depends(get_db),
-    _user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user),
+):
+    bl = await livraison_service.get_bon_livraison(db, bl_id)
+    if not bl:
+        raise HTTPException(status_code=404, detail="BL introuvable")
+    if archive_service.est_archivee(bl):
+        raise HTTPException(status_code=400, detail="BL archivé : lecture seule")
+    return await livraison_service.changer_statut(db, bl, StatutLivraison.LIVREE, user.id)
+
+
+@router.post("/{bl_id}/annuler", response_model=BonLivraisonRead)
+async def annuler(
+    bl_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
 ):
     bl = await livraison_service.get_bon_livraison(db, bl_id)
     if not bl:
         raise HTTPException(status_code=404, detail="BL introuvable")
-    return await livraison_service.changer_statut(db, bl, StatutLivraison.LIVREE)
+    if archive_service.est_archivee(bl):
+        raise HTTPException(status_code=400, detail="BL archivé : lecture seule")
+    try:
+        return await livraison_service.annuler(db, bl, user.id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -3,14 +3,18 @@ import math
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.dependencies import Idempotence, get_idempotence
 from app.auth.dependencies import get_current_user
 from app.database import get_db
 from app.models.stock import TypeMouvement
 from app.models.user import User
 from app.schemas.article import ArticleList
-from app.schemas.stock import MouvementStockCreate, MouvementStockRead, InventaireCreate, InventaireRead
+from app.schemas.stock import (
+    MouvementStockCreate, MouvementStockRead, InventaireCreate, InventaireRead,
+    DisponibiliteCreate, DisponibiliteRead, LigneDisponibiliteRead, StockRead, StockDepotRead,
+)
 from app.schemas.common import PaginatedResponse
-from app.services import stock_service
+from app.services import disponibilite_service, stock_service
 
 router = APIRouter()
 
@@ -50,8 +54,15 @@ async def create_mouvement(
     data: MouvementStockCreate,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
+    idempotence: Idempotence = Depends(get_idempotence),
 ):
-    return await stock_service.create_mouvement(db, data, user.id)
+    if idempotence.reponse:
+        return idempotence.reponse
+    try:
+        mouvement = await stock_service.create_mouvement(db, data, user.id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return await idempotence.enregistrer(MouvementStockRead.model_validate(mouvement), 201)
 
 
 @router.post("/inventaires", response_model=InventaireRead, status_code=201)
@@ -81,6 +92,53 @@ async def valider_inventaire(
     return await stock_service.valider_inventaire(db, inventaire)
 
 
+@router.post("/disponibilite", response_model=DisponibiliteRead)
+async def disponibilite(
+    data: DisponibiliteCreate,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    """Le panier peut-il partir ? Disponible de chaque variante demandée, en une requête."""
+    resultat = await disponibilite_service.disponibilites(db, [
+        (disponibilite_service.cle(ligne.article_id, ligne.taille, ligne.couleur), ligne.quantite)
+        for ligne in data.lignes
+    ])
+    lignes = [
+        LigneDisponibiliteRead(
+            article_id=cle[0], taille=cle[1], couleur=cle[2], quantite=quantite,
+            physique=etat.physique, reserve=etat.reserve, disponible=etat.disponible, livrable=livrable,
+        )
+        for cle, quantite, etat, livrable in resultat
+    ]
+    return DisponibiliteRead(livrable=all(ligne.livrable for ligne in lignes), lignes=lignes)
+
+
+@router.get("/disponibilite/{article_id}", response_model=list[StockRead])
+async def disponibilite_article(
+    article_id: int,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    stocks = await disponibilite_service.get_stocks_article(db, article_id)
+    return [
+        StockRead(
+            article_id=s.article_id, taille=s.taille, couleur=s.couleur,
+            physique=s.physique, reserve=s.reserve, disponible=s.physique - s.reserve,
+        )
+        for s in stocks
+    ]
+
+
+@router.get("/depots/{article_id}", response_model=list[StockDepotRead])
+async def stocks_depots_article(
+    article_id: int,
+    db: AsyncSession = Depends(get_db),
+    _user: User = Depends(get_current_user),
+):
+    """Stock de l'article par dépôt et par variante."""
+    return await disponibilite_service.get_stocks_depots_article(db, article_id)
+
+
 @router.get("/alertes", response_model=list[ArticleList])
 async def get_alertes_stock(
     db: AsyncSession = Depends(get_db),
@@ -20,6 +20,18 @@ class Settings(BaseSettings):
     DEBUG: bool = False
     CORS_ORIGINS: list[str] = ["http://localhost:3000", "http://localhost:5173"]
 
+    # Partitionnement annuel des factures et mouvements (PostgreSQL, appliqué par la migration 0002)
+    PARTITIONNEMENT_ANNUEL: bool = False
+
+    # Durée de conservation des réponses rejouables (en-tête Idempotency-Key)
+    IDEMPOTENCE_TTL_HEURES: int = 24
+
+    # Durée de vie de l'index des tarifs en mémoire (rechargé aussitôt après une modification locale)
+    TARIFS_CACHE_SECONDES: int = 300
+
+    # Dépôt des mouvements de stock et des expéditions qui n'en précisent pas
+    DEPOT_PRINCIPAL: str = "Principal"
+
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
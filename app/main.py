@@ -5,12 +5,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
+from app.database import engine
+from app.services import partition_service
 from app.api.v1 import router as api_v1_router
 from app.auth.router import router as auth_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    if settings.PARTITIONNEMENT_ANNUEL and engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            await conn.run_sync(partition_service.ensure_partitions)
     yield
 
 
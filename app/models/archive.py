@@ -0,0 +1,37 @@
+from sqlalchemy import JSON, Column, DateTime, Table, func
+
+from app.database import Base
+from app.models.commande import Commande
+from app.models.facture import Facture
+from app.models.livraison import BonLivraison
+from app.models.stock import Inventaire
+
+
+def _archive_table(table: Table, *annexes: str) -> Table:
+    """Table d'archive d'une pièce : mêmes colonnes, sans clés étrangères, lignes (et annexes) regroupées en JSON."""
+    columns = [
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, index=c.index, unique=c.unique)
+        for c in table.columns
+    ]
+    return Table(
+        f"{table.name}_archive", Base.metadata, *columns,
+        Column("lignes", JSON, nullable=False),
+        *[Column(annexe, JSON) for annexe in annexes],
+        Column("archived_at", DateTime(timezone=True), server_default=func.now()),
+    )
+
+
+class FactureArchive(Base):
+    __table__ = _archive_table(Facture.__table__, "paiements", "factures_commandes")
+
+
+class CommandeArchive(Base):
+    __table__ = _archive_table(Commande.__table__)
+
+
+class BonLivraisonArchive(Base):
+    __table__ = _archive_table(BonLivraison.__table__)
+
+
+class InventaireArchive(Base):
+    __table__ = _archive_table(Inventaire.__table__)
@@ -1,14 +1,19 @@
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import String, Text, Numeric, Integer, Boolean, DateTime, ForeignKey, func
+from sqlalchemy import String, Text, Numeric, Integer, Boolean, DateTime, ForeignKey, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, trigram_index
 
 
 class Article(Base):
     __tablename__ = "articles"
+    __table_args__ = (
+        trigram_index("articles", "reference"),
+        trigram_index("articles", "designation"),
+        trigram_index("articles", "code_barre"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     reference: Mapped[str] = mapped_column(String(50), unique=True, index=True)
@@ -31,7 +36,7 @@ class Article(Base):
     stock_maximum: Mapped[int | None] = mapped_column(Integer)
 
     # Métadonnées
-    code_barre: Mapped[str | None] = mapped_column(String(50))
+    code_barre: Mapped[str | None] = mapped_column(String(50), index=True)
     poids: Mapped[Decimal | None] = mapped_column(Numeric(10, 3))
     unite: Mapped[str] = mapped_column(String(20), default="pièce")
     photo_url: Mapped[str | None] = mapped_column(String(500))
@@ -47,6 +52,9 @@ class Article(Base):
     tailles: Mapped[list["ArticleTaille"]] = relationship(back_populates="article", cascade="all, delete-orphan")
     couleurs: Mapped[list["ArticleCouleur"]] = relationship(back_populates="article", cascade="all, delete-orphan")
     depots: Mapped[list["ArticleDepot"]] = relationship(back_populates="article", cascade="all, delete-orphan")
+    variantes: Mapped[list["ArticleVariante"]] = relationship(
+        back_populates="article", cascade="all, delete-orphan", order_by="ArticleVariante.id"
+    )
     tarifs: Mapped[list["ArticleTarif"]] = relationship(back_populates="article", cascade="all, delete-orphan")
 
 
@@ -73,6 +81,26 @@ class ArticleCouleur(Base):
     article: Mapped["Article"] = relationship(back_populates="couleurs")
 
 
+class ArticleVariante(Base):
+    """Référence vendable (SKU) : une combinaison taille × couleur de l'article.
+
+    ``stock`` est un cache du stock physique de la variante au registre du stock ;
+    ``prix_vente_ht``, s'il est renseigné, remplace le prix de l'article.
+    """
+    __tablename__ = "article_variantes"
+    __table_args__ = (UniqueConstraint("article_id", "taille", "couleur", name="uq_article_variantes"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    article_id: Mapped[int] = mapped_column(ForeignKey("articles.id", ondelete="CASCADE"), index=True)
+    taille: Mapped[str] = mapped_column(String(20), default="", server_default="")
+    couleur: Mapped[str] = mapped_column(String(50), default="", server_default="")
+    ean: Mapped[str | None] = mapped_column(String(14), unique=True, index=True)
+    stock: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    prix_vente_ht: Mapped[Decimal | None] = mapped_column(Numeric(12, 4))
+
+    article: Mapped["Article"] = relationship(back_populates="variantes")
+
+
 class ArticleDepot(Base):
     __tablename__ = "article_depots"
 
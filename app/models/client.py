@@ -4,11 +4,16 @@ from decimal import Decimal
 from sqlalchemy import String, Text, Numeric, Boolean, DateTime, ForeignKey, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, trigram_index
 
 
 class Client(Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        trigram_index("clients", "code_client"),
+        trigram_index("clients", "raison_sociale"),
+        trigram_index("clients", "ville"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     code_client: Mapped[str] = mapped_column(String(20), unique=True, index=True)
@@ -34,6 +39,8 @@ class Client(Base):
     vrp_id: Mapped[int | None] = mapped_column(ForeignKey("vrps.id"))
     concession_id: Mapped[int | None] = mapped_column(ForeignKey("concessions.id"))
     encours_max: Mapped[Decimal] = mapped_column(Numeric(12, 2), default=0)
+    # Reste dû des factures non annulées, tenu à jour par client_service (voir recalculer_encours)
+    encours: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0, server_default="0")
     mode_reglement: Mapped[str | None] = mapped_column(String(50))
     delai_reglement: Mapped[int] = mapped_column(default=30)
 
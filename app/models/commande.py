@@ -2,7 +2,7 @@ import enum
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import String, Text, Numeric, Integer, DateTime, ForeignKey, Enum, func
+from sqlalchemy import String, Text, Numeric, Integer, DateTime, ForeignKey, Enum, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -13,6 +13,7 @@ class StatutCommande(str, enum.Enum):
     VALIDEE = "validee"
     EN_PREPARATION = "en_preparation"
     PREPAREE = "preparee"
+    EXPEDIEE_PARTIELLEMENT = "expediee_partiellement"
     EXPEDIEE = "expediee"
     LIVREE = "livree"
     FACTUREE = "facturee"
@@ -26,12 +27,14 @@ class Commande(Base):
     numero: Mapped[str] = mapped_column(String(20), unique=True, index=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"), index=True)
     vrp_id: Mapped[int | None] = mapped_column(ForeignKey("vrps.id"))
-    statut: Mapped[StatutCommande] = mapped_column(Enum(StatutCommande), default=StatutCommande.BROUILLON)
+    statut: Mapped[StatutCommande] = mapped_column(Enum(StatutCommande), default=StatutCommande.BROUILLON, index=True)
 
-    date_commande: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    date_commande: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
     date_livraison_souhaitee: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     reference_client: Mapped[str | None] = mapped_column(String(50))
     notes: Mapped[str | None] = mapped_column(Text)
+    # Ordre de service des reliquats : la plus haute priorité d'abord, puis la plus ancienne
+    priorite: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     # Adresse de livraison
     adresse_livraison: Mapped[str | None] = mapped_column(String(255))
@@ -56,6 +59,7 @@ class Commande(Base):
 
 class LigneCommande(Base):
     __tablename__ = "lignes_commande"
+    __table_args__ = (UniqueConstraint("commande_id", "ligne_numero", name="uq_lignes_commande_numero"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     commande_id: Mapped[int] = mapped_column(ForeignKey("commandes.id", ondelete="CASCADE"), index=True)
@@ -65,6 +69,8 @@ class LigneCommande(Base):
     designation: Mapped[str] = mapped_column(String(255))
     quantite: Mapped[int] = mapped_column(Integer, default=1)
     quantite_livree: Mapped[int] = mapped_column(Integer, default=0)
+    # Part du reliquat (quantite - quantite_livree) couverte par du stock mis de côté (voir allocation_service)
+    quantite_allouee: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     prix_unitaire_ht: Mapped[Decimal] = mapped_column(Numeric(12, 4))
     remise_pct: Mapped[Decimal] = mapped_column(Numeric(5, 2), default=0)
     tva_pct: Mapped[Decimal] = mapped_column(Numeric(5, 2), default=20.00)
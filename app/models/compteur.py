@@ -0,0 +1,13 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class Compteur(Base):
+    """Dernier numéro attribué par type de pièce (voir numerotation_service)."""
+
+    __tablename__ = "compteurs"
+
+    piece: Mapped[str] = mapped_column(String(50), primary_key=True)
+    valeur: Mapped[int] = mapped_column(Integer, default=0)
@@ -2,7 +2,9 @@ import enum
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import String, Text, Numeric, Integer, DateTime, ForeignKey, Enum, func
+from sqlalchemy import (
+    String, Text, Numeric, Integer, DateTime, ForeignKey, Enum, Index, UniqueConstraint, func, text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -19,17 +21,24 @@ class StatutFacture(str, enum.Enum):
     AVOIR = "avoir"
 
 
+# Factures émises non échues : prédicat de l'index partiel lu par le passage des retards
+A_ECHOIR = text("statut IN ('EMISE', 'ENVOYEE')")
+
+
 class Facture(Base):
     __tablename__ = "factures"
+    __table_args__ = (
+        Index("ix_factures_a_echoir", "date_echeance", postgresql_where=A_ECHOIR, sqlite_where=A_ECHOIR),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     numero: Mapped[str] = mapped_column(String(20), unique=True, index=True)
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"), index=True)
     commande_id: Mapped[int | None] = mapped_column(ForeignKey("commandes.id"))
     vrp_id: Mapped[int | None] = mapped_column(ForeignKey("vrps.id"))
-    statut: Mapped[StatutFacture] = mapped_column(Enum(StatutFacture), default=StatutFacture.BROUILLON)
+    statut: Mapped[StatutFacture] = mapped_column(Enum(StatutFacture), default=StatutFacture.BROUILLON, index=True)
 
-    date_facture: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    date_facture: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
     date_echeance: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     mode_reglement: Mapped[str | None] = mapped_column(String(50))
     reference_client: Mapped[str | None] = mapped_column(String(50))
@@ -57,11 +66,14 @@ class Facture(Base):
 
 class LigneFacture(Base):
     __tablename__ = "lignes_facture"
+    __table_args__ = (UniqueConstraint("facture_id", "ligne_numero", name="uq_lignes_facture_numero"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     facture_id: Mapped[int] = mapped_column(ForeignKey("factures.id", ondelete="CASCADE"), index=True)
     article_id: Mapped[int] = mapped_column(ForeignKey("articles.id"), index=True)
     ligne_numero: Mapped[int] = mapped_column(Integer)
+    # Copie de la date de la facture : clé de partitionnement (voir partition_service)
+    date_facture: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
     designation: Mapped[str] = mapped_column(String(255))
     quantite: Mapped[int] = mapped_column(Integer, default=1)
@@ -74,3 +86,30 @@ class LigneFacture(Base):
     couleur: Mapped[str | None] = mapped_column(String(50))
 
     facture: Mapped["Facture"] = relationship(back_populates="lignes")
+
+
+class FactureCommande(Base):
+    """Commande facturée par une facture : une seule, ou plusieurs en facturation groupée."""
+
+    __tablename__ = "factures_commandes"
+
+    facture_id: Mapped[int] = mapped_column(ForeignKey("factures.id", ondelete="CASCADE"), primary_key=True)
+    commande_id: Mapped[int] = mapped_column(ForeignKey("commandes.id"), primary_key=True, index=True)
+
+
+class Paiement(Base):
+    """Règlement imputé sur une facture (saisie ou rapprochement bancaire)."""
+
+    __tablename__ = "paiements"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    facture_id: Mapped[int] = mapped_column(ForeignKey("factures.id"), index=True)
+    montant: Mapped[Decimal] = mapped_column(Numeric(14, 2))
+    date_paiement: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    mode_reglement: Mapped[str | None] = mapped_column(String(50))
+    # Référence bancaire : une ligne de relevé n'est imputée qu'une fois
+    reference: Mapped[str | None] = mapped_column(String(100), index=True)
+    libelle: Mapped[str | None] = mapped_column(String(255))
+    user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"))
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, ForeignKey, Integer, String, UniqueConstraint, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class CleIdempotence(Base):
+    """Réponse d'une requête POST associée à son en-tête Idempotency-Key."""
+
+    __tablename__ = "cles_idempotence"
+    __table_args__ = (UniqueConstraint("user_id", "cle", name="uq_cles_idempotence_user_cle"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    cle: Mapped[str] = mapped_column(String(255))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    methode: Mapped[str] = mapped_column(String(10))
+    chemin: Mapped[str] = mapped_column(String(255))
+    empreinte: Mapped[str] = mapped_column(String(64))
+
+    # Vides tant que la requête est en cours de traitement
+    status_code: Mapped[int | None] = mapped_column(Integer)
+    reponse: Mapped[dict | list | None] = mapped_column(JSON)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -2,7 +2,7 @@ import enum
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import String, Text, Numeric, Integer, DateTime, ForeignKey, Enum, func
+from sqlalchemy import String, Text, Numeric, Integer, DateTime, ForeignKey, Enum, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -25,10 +25,12 @@ class BonLivraison(Base):
     commande_id: Mapped[int | None] = mapped_column(ForeignKey("commandes.id"))
     client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"), index=True)
     vrp_id: Mapped[int | None] = mapped_column(ForeignKey("vrps.id"))
-    statut: Mapped[StatutLivraison] = mapped_column(Enum(StatutLivraison), default=StatutLivraison.EN_PREPARATION)
+    statut: Mapped[StatutLivraison] = mapped_column(
+        Enum(StatutLivraison), default=StatutLivraison.EN_PREPARATION, index=True
+    )
     transport_id: Mapped[int | None] = mapped_column(ForeignKey("transports.id"))
 
-    date_bl: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    date_bl: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
     date_expedition: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     date_livraison: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
@@ -50,6 +52,7 @@ class BonLivraison(Base):
 
 class LigneBonLivraison(Base):
     __tablename__ = "lignes_bon_livraison"
+    __table_args__ = (UniqueConstraint("bon_livraison_id", "ligne_numero", name="uq_lignes_bon_livraison_numero"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     bon_livraison_id: Mapped[int] = mapped_column(ForeignKey("bons_livraison.id", ondelete="CASCADE"), index=True)
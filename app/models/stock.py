@@ -2,7 +2,7 @@ import enum
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import String, Text, Numeric, Integer, DateTime, ForeignKey, Enum, func
+from sqlalchemy import String, Text, Numeric, Integer, DateTime, ForeignKey, Enum, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -22,13 +22,46 @@ class StatutInventaire(str, enum.Enum):
     ANNULE = "annule"
 
 
+class Stock(Base):
+    """Stock d'une variante d'article (taille et couleur vides : article sans variante).
+
+    ``reserve`` : stock alloué aux reliquats de commande et quantités sur des BL
+    non expédiés. Disponible = physique - réservé (voir disponibilite_service).
+    ``physique`` est la somme du stock de la variante dans les dépôts (StockDepot).
+    """
+    __tablename__ = "stocks"
+    __table_args__ = (UniqueConstraint("article_id", "taille", "couleur", name="uq_stocks_variante"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    article_id: Mapped[int] = mapped_column(ForeignKey("articles.id", ondelete="CASCADE"), index=True)
+    taille: Mapped[str] = mapped_column(String(20), default="", server_default="")
+    couleur: Mapped[str] = mapped_column(String(50), default="", server_default="")
+    physique: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    reserve: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+
+class StockDepot(Base):
+    """Stock physique d'une variante d'article dans un dépôt."""
+    __tablename__ = "stocks_depots"
+    __table_args__ = (
+        UniqueConstraint("article_id", "depot", "taille", "couleur", name="uq_stocks_depots_variante"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    article_id: Mapped[int] = mapped_column(ForeignKey("articles.id", ondelete="CASCADE"), index=True)
+    depot: Mapped[str] = mapped_column(String(100))
+    taille: Mapped[str] = mapped_column(String(20), default="", server_default="")
+    couleur: Mapped[str] = mapped_column(String(50), default="", server_default="")
+    quantite: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+
 class MouvementStock(Base):
     __tablename__ = "mouvements_stock"
 
     id: Mapped[int] = mapped_column(primary_key=True)
     numero: Mapped[str] = mapped_column(String(20), unique=True, index=True)
     type_mouvement: Mapped[TypeMouvement] = mapped_column(Enum(TypeMouvement))
-    date_mouvement: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    date_mouvement: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
     depot_source: Mapped[str | None] = mapped_column(String(100))
     depot_destination: Mapped[str | None] = mapped_column(String(100))
     reference_document: Mapped[str | None] = mapped_column(String(50))
@@ -47,6 +80,8 @@ class LigneMouvementStock(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     mouvement_id: Mapped[int] = mapped_column(ForeignKey("mouvements_stock.id", ondelete="CASCADE"), index=True)
+    # Copie de la date du mouvement : clé de partitionnement (voir partition_service)
+    date_mouvement: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     article_id: Mapped[int] = mapped_column(ForeignKey("articles.id"), index=True)
     quantite: Mapped[int] = mapped_column(Integer)
     prix_unitaire: Mapped[Decimal] = mapped_column(Numeric(12, 4), default=0)
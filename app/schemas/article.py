@@ -1,7 +1,7 @@
 from datetime import datetime
 from decimal import Decimal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ArticleTailleBase(BaseModel):
@@ -35,6 +35,41 @@ class ArticleCouleurRead(ArticleCouleurBase):
     model_config = {"from_attributes": True}
 
 
+class ArticleVarianteBase(BaseModel):
+    taille: str = ""
+    couleur: str = ""
+    ean: str | None = Field(None, pattern=r"^\d{8,14}$")
+    prix_vente_ht: Decimal | None = None
+
+
+class ArticleVarianteCreate(ArticleVarianteBase):
+    pass
+
+
+class ArticleVarianteRead(ArticleVarianteBase):
+    id: int
+    article_id: int
+    stock: int
+    model_config = {"from_attributes": True}
+
+
+COLONNES_GRILLE = ("variante_id", "ean", "physique", "reserve", "disponible", "prix_vente_ht")
+
+
+class GrilleVariantesRead(BaseModel):
+    """Matrice des variantes d'un article, en tableaux.
+
+    ``cellules[i][j]`` décrit la variante (``tailles[i]``, ``couleurs[j]``) : les
+    valeurs de ``colonnes``, dans l'ordre, ou ``None`` si la combinaison n'existe
+    pas. Le prix est celui de la variante, à défaut celui de l'article.
+    """
+    article_id: int
+    tailles: list[str]
+    couleurs: list[str]
+    colonnes: list[str] = list(COLONNES_GRILLE)
+    cellules: list[list[list | None]]
+
+
 class ArticleDepotBase(BaseModel):
     depot: str
     stock: int = 0
@@ -95,6 +130,7 @@ class ArticleBase(BaseModel):
 class ArticleCreate(ArticleBase):
     tailles: list[ArticleTailleCreate] = []
     couleurs: list[ArticleCouleurCreate] = []
+    variantes: list[ArticleVarianteCreate] = []
 
 
 class ArticleUpdate(BaseModel):
@@ -124,6 +160,7 @@ class ArticleRead(ArticleBase):
     updated_at: datetime
     tailles: list[ArticleTailleRead] = []
     couleurs: list[ArticleCouleurRead] = []
+    variantes: list[ArticleVarianteRead] = []
     depots: list[ArticleDepotRead] = []
     tarifs: list[ArticleTarifRead] = []
     model_config = {"from_attributes": True}
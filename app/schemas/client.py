@@ -98,6 +98,7 @@ class ClientUpdate(BaseModel):
 
 class ClientRead(ClientBase):
     id: int
+    encours: Decimal = Decimal("0")
     created_at: datetime
     updated_at: datetime
     contacts: list[ContactClientRead] = []
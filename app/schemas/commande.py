@@ -1,9 +1,10 @@
 from datetime import datetime
 from decimal import Decimal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, computed_field
 
 from app.models.commande import StatutCommande
+from app.utils.chiffrage import VentilationTVA, chiffrer
 
 
 class LigneCommandeBase(BaseModel):
@@ -18,7 +19,19 @@ class LigneCommandeBase(BaseModel):
 
 
 class LigneCommandeCreate(LigneCommandeBase):
-    pass
+    # Sans prix, la ligne est tarifée par le serveur (tarif du type de client à la date du jour)
+    designation: str | None = None
+    prix_unitaire_ht: Decimal | None = None
+
+
+class LigneCommandeUpdate(BaseModel):
+    designation: str | None = None
+    quantite: int | None = None
+    prix_unitaire_ht: Decimal | None = None
+    remise_pct: Decimal | None = None
+    tva_pct: Decimal | None = None
+    taille: str | None = None
+    couleur: str | None = None
 
 
 class LigneCommandeRead(LigneCommandeBase):
@@ -26,16 +39,27 @@ class LigneCommandeRead(LigneCommandeBase):
     commande_id: int
     ligne_numero: int
     quantite_livree: int
+    quantite_allouee: int = 0
     montant_ht: Decimal
     model_config = {"from_attributes": True}
 
 
+class EditionLigneRead(BaseModel):
+    """Ligne ajoutée ou modifiée (absente après une suppression) et nouveaux totaux de la commande."""
+    commande_id: int
+    ligne: LigneCommandeRead | None = None
+    total_ht: Decimal
+    total_tva: Decimal
+    total_ttc: Decimal
+
+
 class CommandeBase(BaseModel):
     client_id: int
     vrp_id: int | None = None
     date_livraison_souhaitee: datetime | None = None
     reference_client: str | None = None
     notes: str | None = None
+    priorite: int = 0
     adresse_livraison: str | None = None
     cp_livraison: str | None = None
     ville_livraison: str | None = None
@@ -52,6 +76,7 @@ class CommandeUpdate(BaseModel):
     date_livraison_souhaitee: datetime | None = None
     reference_client: str | None = None
     notes: str | None = None
+    priorite: int | None = None
     adresse_livraison: str | None = None
     cp_livraison: str | None = None
     ville_livraison: str | None = None
@@ -71,6 +96,89 @@ class CommandeRead(CommandeBase):
     lignes: list[LigneCommandeRead] = []
     model_config = {"from_attributes": True}
 
+    @computed_field
+    @property
+    def ventilation_tva(self) -> list[VentilationTVA]:
+        return chiffrer(self.lignes, self.remise_globale_pct).ventilation
+
+
+class LigneDevisCreate(BaseModel):
+    article_id: int
+    quantite: int = 1
+
+
+class DevisCreate(BaseModel):
+    client_id: int | None = None
+    type_client: str | None = None
+    date_tarif: datetime | None = None
+    remise_globale_pct: Decimal = Decimal("0")
+    lignes: list[LigneDevisCreate]
+
+
+class LigneDevisRead(BaseModel):
+    article_id: int
+    reference: str
+    designation: str
+    quantite: int
+    prix_unitaire_ht: Decimal
+    remise_pct: Decimal
+    tva_pct: Decimal
+    montant_ht: Decimal
+    tarif: str | None = None
+
+
+class DevisRead(BaseModel):
+    type_client: str
+    date_tarif: datetime
+    lignes: list[LigneDevisRead]
+    total_ht: Decimal
+    total_tva: Decimal
+    total_ttc: Decimal
+    ventilation_tva: list[VentilationTVA]
+
+
+class LigneImport(BaseModel):
+    reference: str
+    quantite: int = Field(gt=0)
+    prix_unitaire_ht: Decimal | None = None
+    remise_pct: Decimal | None = None
+    taille: str | None = None
+    couleur: str | None = None
+
+
+class CommandeImport(BaseModel):
+    """Commande reçue par fichier : client et articles désignés par leurs codes."""
+    code_client: str
+    reference_client: str | None = None
+    date_livraison_souhaitee: datetime | None = None
+    notes: str | None = None
+    adresse_livraison: str | None = None
+    cp_livraison: str | None = None
+    ville_livraison: str | None = None
+    remise_globale_pct: Decimal = Decimal("0")
+    lignes: list[LigneImport] = Field(min_length=1)
+
+
+class AllocationRead(BaseModel):
+    lignes: int
+    quantite: int
+
+
+class ErreurImport(BaseModel):
+    ligne: int
+    reference_client: str | None = None
+    motif: str
+
+
+class ImportCommandesRead(BaseModel):
+    simulation: bool
+    lues: int
+    commandes: int
+    rejetees: int
+    premier_numero: str | None = None
+    dernier_numero: str | None = None
+    erreurs: list[ErreurImport]
+
 
 class CommandeList(BaseModel):
     id: int
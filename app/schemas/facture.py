@@ -1,9 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, computed_field
 
+from app.models.commande import StatutCommande
 from app.models.facture import StatutFacture
+from app.utils.chiffrage import VentilationTVA, chiffrer
 
 
 class LigneFactureBase(BaseModel):
@@ -61,10 +63,64 @@ class FactureUpdate(BaseModel):
 
 
 class PaiementCreate(BaseModel):
+    montant: Decimal = Field(gt=0)
+    mode_reglement: str | None = None
+    reference: str | None = None
+
+
+class PaiementRead(BaseModel):
+    id: int
+    facture_id: int
+    montant: Decimal
+    date_paiement: datetime
+    mode_reglement: str | None = None
+    reference: str | None = None
+    libelle: str | None = None
+    model_config = {"from_attributes": True}
+
+
+class LigneRapprochement(BaseModel):
+    ligne: int
+    date_operation: date | None = None
     montant: Decimal
+    libelle: str
+    reference: str
+    facture_id: int | None = None
+    facture_numero: str | None = None
+    methode: str | None = None
+    motif: str | None = None
+
+
+class RapprochementRead(BaseModel):
+    simulation: bool
+    lignes: int
+    rapprochees: int
+    montant_rapproche: Decimal
+    non_rapprochees: int
+    details: list[LigneRapprochement]
+
+
+class FacturationCreate(BaseModel):
+    """Sélection des commandes à facturer en masse.
+
+    Par défaut : toutes les commandes expédiées ou livrées non facturées.
+    """
+    client_id: int | None = None
+    vrp_id: int | None = None
+    statuts: list[StatutCommande] | None = None
+    date_commande_max: datetime | None = None
+    grouper_par_client: bool = False
     mode_reglement: str | None = None
 
 
+class FacturationRead(BaseModel):
+    commandes: int
+    factures: int
+    total_ttc: Decimal
+    premier_numero: str | None = None
+    dernier_numero: str | None = None
+
+
 class FactureRead(FactureBase):
     id: int
     numero: str
@@ -79,6 +135,11 @@ class FactureRead(FactureBase):
     lignes: list[LigneFactureRead] = []
     model_config = {"from_attributes": True}
 
+    @computed_field
+    @property
+    def ventilation_tva(self) -> list[VentilationTVA]:
+        return chiffrer(self.lignes, self.remise_globale_pct).ventilation
+
 
 class FactureList(BaseModel):
     id: int
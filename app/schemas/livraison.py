@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
 from pydantic import BaseModel
@@ -49,6 +49,19 @@ class BonLivraisonFromCommande(BaseModel):
     transport_id: int | None = None
 
 
+class ExpeditionCreate(BaseModel):
+    """BL à expédier en une fois : ceux de la liste, ou tous ceux du jour ``date_bl`` encore en préparation."""
+    bl_ids: list[int] = []
+    date_bl: date | None = None
+
+
+class ExpeditionRead(BaseModel):
+    bls: list[str]
+    mouvements: list[str]
+    quantite: int
+    ignores: list[int] = []
+
+
 class BonLivraisonRead(BonLivraisonBase):
     id: int
     numero: str
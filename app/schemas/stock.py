@@ -1,7 +1,7 @@
 from datetime import datetime
 from decimal import Decimal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.models.stock import TypeMouvement, StatutInventaire
 
@@ -84,3 +84,43 @@ class InventaireRead(InventaireBase):
     created_at: datetime
     lignes: list[LigneInventaireRead] = []
     model_config = {"from_attributes": True}
+
+
+class StockRead(BaseModel):
+    article_id: int
+    taille: str
+    couleur: str
+    physique: int
+    reserve: int
+    disponible: int
+
+
+class StockDepotRead(BaseModel):
+    article_id: int
+    depot: str
+    taille: str
+    couleur: str
+    quantite: int
+    model_config = {"from_attributes": True}
+
+
+class LigneDisponibiliteCreate(BaseModel):
+    article_id: int
+    taille: str | None = None
+    couleur: str | None = None
+    quantite: int = Field(1, gt=0)
+
+
+class DisponibiliteCreate(BaseModel):
+    lignes: list[LigneDisponibiliteCreate]
+
+
+class LigneDisponibiliteRead(StockRead):
+    quantite: int
+    livrable: bool
+
+
+class DisponibiliteRead(BaseModel):
+    """Un panier est livrable si chaque variante couvre la quantité demandée, toutes lignes confondues."""
+    livrable: bool
+    lignes: list[LigneDisponibiliteRead]
@@ -0,0 +1,100 @@
+"""Allocation du stock aux reliquats de commande.
+
+Le reliquat d'une ligne de commande est sa quantité restant à livrer
+(``quantite - quantite_livree``) ; ``quantite_allouee`` en est la part couverte
+par du stock mis de côté, qui n'est plus disponible pour les autres commandes.
+
+Le stock libre d'une variante est son disponible au registre du stock
+(disponibilite_service) : stock physique - stock alloué aux reliquats des
+commandes ouvertes - quantités sur des BL pas encore expédiés.
+
+À la validation d'une commande et à l'arrivée de stock (entrée, retour,
+inventaire), ``allouer`` répartit le stock libre entre les reliquats ouverts en
+une passe sur les lignes, par priorité de commande décroissante puis par
+ancienneté, enregistre les allocations en une instruction et les réserve au
+registre en une autre. ``liberer`` rend le stock alloué des commandes annulées
+ou facturées.
+"""
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.commande import Commande, LigneCommande
+from app.services import disponibilite_service
+from app.services.disponibilite_service import STATUTS_OUVERTS
+
+
+@dataclass
+class Allocation:
+    lignes: int = 0
+    quantite: int = 0
+
+
+async def allouer(db: AsyncSession, article_ids: Iterable[int] | None = None) -> Allocation:
+    """Alloue le stock libre aux reliquats ouverts (de tous les articles si ``article_ids`` est omis)."""
+    besoin = LigneCommande.quantite - LigneCommande.quantite_livree - LigneCommande.quantite_allouee
+    query = (
+        select(
+            LigneCommande.id, LigneCommande.article_id, LigneCommande.taille, LigneCommande.couleur,
+            besoin.label("besoin"),
+        )
+        .join(Commande, Commande.id == LigneCommande.commande_id)
+        .where(Commande.statut.in_(STATUTS_OUVERTS), besoin > 0)
+        .order_by(Commande.priorite.desc(), Commande.date_commande, Commande.id, LigneCommande.ligne_numero)
+    )
+    if article_ids is not None:
+        query = query.where(LigneCommande.article_id.in_(set(article_ids)))
+    lignes = [
+        (ligne, disponibilite_service.cle(ligne.article_id, ligne.taille, ligne.couleur))
+        for ligne in (await db.execute(query)).all()
+    ]
+    libre = await disponibilite_service.stock_libre(db, (cle for _, cle in lignes), verrouiller=True)
+
+    allocations, reservations = [], []
+    for ligne, cle in lignes:
+        quantite = min(ligne.besoin, libre[cle])
+        if quantite > 0:
+            libre[cle] -= quantite
+            allocations.append({"ligne_id": ligne.id, "q_allouee": quantite})
+            reservations.append((cle, 0, quantite))
+    if allocations:
+        table = LigneCommande.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("ligne_id"))
+            .values(quantite_allouee=table.c.quantite_allouee + bindparam("q_allouee")),
+            allocations,
+        )
+        await disponibilite_service.appliquer(db, reservations)
+    return Allocation(lignes=len(allocations), quantite=sum(a["q_allouee"] for a in allocations))
+
+
+async def liberer(db: AsyncSession, commande_ids: Iterable[int]) -> set[int]:
+    """Rend au stock libre les allocations des commandes ; renvoie les articles concernés.
+
+    À appeler avant que les commandes ne quittent les statuts ouverts.
+    """
+    commande_ids = set(commande_ids)
+    if not commande_ids:
+        return set()
+    taille, couleur = func.coalesce(LigneCommande.taille, ""), func.coalesce(LigneCommande.couleur, "")
+    alloue = (await db.execute(
+        select(LigneCommande.article_id, taille, couleur, func.sum(LigneCommande.quantite_allouee))
+        .join(Commande, Commande.id == LigneCommande.commande_id)
+        .where(
+            LigneCommande.commande_id.in_(commande_ids), Commande.statut.in_(STATUTS_OUVERTS),
+            LigneCommande.quantite_allouee > 0,
+        )
+        .group_by(LigneCommande.article_id, taille, couleur)
+    )).all()
+    if not alloue:
+        return set()
+    await disponibilite_service.appliquer(db, [((a, t, c), 0, -quantite) for a, t, c, quantite in alloue])
+    await db.execute(
+        update(LigneCommande)
+        .where(LigneCommande.commande_id.in_(commande_ids), LigneCommande.quantite_allouee > 0)
+        .values(quantite_allouee=0)
+    )
+    return {article_id for article_id, *_ in alloue}
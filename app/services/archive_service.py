@@ -0,0 +1,162 @@
+"""Archivage à froid des pièces closes.
+
+Les factures payées, BL livrés, commandes facturées et inventaires validés
+antérieurs à une date sont déplacés par lots dans les tables ``*_archive`` :
+une ligne par pièce, ses lignes regroupées en JSON (compressé par PostgreSQL
+au-delà de quelques Ko). Listes, comptages et recherches ne portent plus que sur
+les tables courantes ; ``get_facture``, ``get_commande`` et ``get_bon_livraison``
+lisent les archives quand la pièce n'y est plus.
+
+Une pièce lue dans les archives n'est pas rattachée à la session : elle est en
+lecture seule (voir ``est_archivee``).
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import Table, delete, exists, func, insert, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.archive import BonLivraisonArchive, CommandeArchive, FactureArchive, InventaireArchive
+from app.models.commande import Commande, LigneCommande, StatutCommande
+from app.models.facture import Facture, FactureCommande, LigneFacture, Paiement, StatutFacture
+from app.models.livraison import BonLivraison, LigneBonLivraison, StatutLivraison
+from app.models.stock import Inventaire, LigneInventaire, StatutInventaire
+from app.models.vrp import Intervention
+
+
+@dataclass(frozen=True)
+class Archivage:
+    """Règle d'archivage d'un type de pièce."""
+
+    modele: type
+    archive: type
+    lignes: type
+    cle: str
+    date_piece: object
+    statuts: tuple
+    # Colonnes des tables courantes qui référencent la pièce : une pièce encore référencée reste en place.
+    references: tuple = ()
+    # Enregistrements rattachés archivés avec la pièce : (modèle, colonne de rattachement)
+    annexes: tuple = ()
+
+
+# Dans l'ordre : les commandes ne sont archivées qu'une fois leurs factures et BL partis.
+ARCHIVAGES = [
+    Archivage(Facture, FactureArchive, LigneFacture, "facture_id", Facture.date_facture,
+              (StatutFacture.PAYEE, StatutFacture.ANNULEE), (Intervention.facture_id,),
+              ((Paiement, "facture_id"), (FactureCommande, "facture_id"))),
+    Archivage(BonLivraison, BonLivraisonArchive, LigneBonLivraison, "bon_livraison_id", BonLivraison.date_bl,
+              (StatutLivraison.LIVREE, StatutLivraison.ANNULEE)),
+    Archivage(Commande, CommandeArchive, LigneCommande, "commande_id", Commande.date_commande,
+              (StatutCommande.FACTUREE, StatutCommande.ANNULEE),
+              (Facture.commande_id, FactureCommande.commande_id, BonLivraison.commande_id)),
+    Archivage(Inventaire, InventaireArchive, LigneInventaire, "inventaire_id", Inventaire.date_inventaire,
+              (StatutInventaire.VALIDE, StatutInventaire.ANNULE)),
+]
+PAR_MODELE = {archivage.modele: archivage for archivage in ARCHIVAGES}
+
+
+async def _regrouper(db: AsyncSession, table: Table, cle: str, ids: list[int]) -> dict[int, list[dict]]:
+    groupes = defaultdict(list)
+    for row in (await db.execute(select(table).where(table.c[cle].in_(ids)).order_by(*table.primary_key))).mappings():
+        groupes[row[cle]].append(_to_json(row))
+    return groupes
+
+
+def _to_json(ligne) -> dict:
+    return {
+        name: str(value) if isinstance(value, Decimal) else value.isoformat() if isinstance(value, date) else value
+        for name, value in ligne.items()
+    }
+
+
+def _from_json(table: Table, data: dict) -> dict:
+    """Reconvertit une ligne archivée selon les types des colonnes.
+
+    Les colonnes ajoutées depuis l'archivage prennent leur valeur par défaut, ou restent vides.
+    """
+    values = {}
+    for column in table.columns:
+        value = data.get(column.name)
+        if column.name not in data and column.default is not None and column.default.is_scalar:
+            value = column.default.arg
+        if isinstance(value, str):
+            if column.type.python_type is Decimal:
+                value = Decimal(value)
+            elif column.type.python_type in (datetime, date):
+                value = column.type.python_type.fromisoformat(value)
+        values[column.name] = value
+    return values
+
+
+def _eligibles(archivage: Archivage, avant: datetime):
+    query = select(archivage.modele.id).where(
+        archivage.modele.statut.in_(archivage.statuts), archivage.date_piece < avant
+    )
+    for reference in archivage.references:
+        query = query.where(~exists().where(reference == archivage.modele.id))
+    return query
+
+
+async def compter_eligibles(db: AsyncSession, archivage: Archivage, avant: datetime) -> int:
+    result = await db.execute(select(func.count()).select_from(_eligibles(archivage, avant).subquery()))
+    return result.scalar() or 0
+
+
+async def archiver_lot(db: AsyncSession, archivage: Archivage, avant: datetime, taille: int = 1000) -> int:
+    """Déplace un lot de pièces éligibles (et leurs lignes) vers les archives ; renvoie le nombre archivé."""
+    ids = list((await db.execute(_eligibles(archivage, avant).order_by(archivage.modele.id).limit(taille))).scalars())
+    if not ids:
+        return 0
+    table = archivage.modele.__table__
+    rattachees = [(archivage.lignes.__table__, archivage.cle)]
+    rattachees += [(modele.__table__, cle) for modele, cle in archivage.annexes]
+
+    pieces = (await db.execute(select(table).where(table.c.id.in_(ids)))).mappings().all()
+    groupes = {t.name: await _regrouper(db, t, cle, ids) for t, cle in rattachees}
+    groupes["lignes"] = groupes.pop(archivage.lignes.__tablename__)
+
+    await db.execute(insert(archivage.archive.__table__), [
+        {**piece, **{nom: groupe[piece["id"]] for nom, groupe in groupes.items()}} for piece in pieces
+    ])
+    for t, cle in rattachees:
+        await db.execute(delete(t).where(t.c[cle].in_(ids)))
+    await db.execute(delete(table).where(table.c.id.in_(ids)))
+    return len(ids)
+
+
+async def get_archive(db: AsyncSession, modele: type, piece_id: int):
+    """Reconstitue une pièce archivée (avec ses lignes), ou None si elle n'est pas archivée."""
+    archivage = PAR_MODELE[modele]
+    table = archivage.archive.__table__
+    row = (await db.execute(select(table).where(table.c.id == piece_id))).mappings().one_or_none()
+    if row is None:
+        return None
+    piece = modele(**{c.name: row[c.name] for c in modele.__table__.columns})
+    piece.lignes = [archivage.lignes(**_from_json(archivage.lignes.__table__, ligne)) for ligne in row["lignes"]]
+    return piece
+
+
+async def get_annexes_archivees(db: AsyncSession, modele: type, piece_id: int, annexe: type) -> list:
+    """Enregistrements rattachés (ex. paiements) d'une pièce archivée."""
+    table = PAR_MODELE[modele].archive.__table__
+    result = await db.execute(select(table.c[annexe.__tablename__]).where(table.c.id == piece_id))
+    return [annexe(**_from_json(annexe.__table__, row)) for row in result.scalar() or []]
+
+
+def est_archivee(piece) -> bool:
+    """Une pièce reconstituée depuis les archives n'appartient à aucune session."""
+    return inspect(piece).transient
+
+
+async def compter_pieces(db: AsyncSession, modele: type) -> int:
+    """Nombre de pièces, archives comprises (sert à la numérotation)."""
+    if modele not in PAR_MODELE:
+        return (await db.execute(select(func.count(modele.id)))).scalar() or 0
+    archive = PAR_MODELE[modele].archive
+    result = await db.execute(select(
+        select(func.count(modele.id)).scalar_subquery() + select(func.count(archive.id)).scalar_subquery()
+    ))
+    return result.scalar() or 0
@@ -1,9 +1,14 @@
-from sqlalchemy import select, func
+from sqlalchemy import and_, select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.models.article import Article, ArticleTaille, ArticleCouleur, ArticleDepot, ArticleTarif
-from app.schemas.article import ArticleCreate, ArticleUpdate, ArticleTailleCreate, ArticleCouleurCreate, ArticleDepotCreate, ArticleTarifCreate
+from app.models.article import Article, ArticleTaille, ArticleCouleur, ArticleVariante, ArticleDepot, ArticleTarif
+from app.models.stock import Stock
+from app.schemas.article import (
+    ArticleCreate, ArticleUpdate, ArticleTailleCreate, ArticleCouleurCreate, ArticleDepotCreate, ArticleTarifCreate,
+    ArticleVarianteCreate, GrilleVariantesRead,
+)
+from app.services import allocation_service, disponibilite_service, tarif_service
 
 
 async def get_articles(
@@ -45,6 +50,7 @@ async def get_article(db: AsyncSession, article_id: int) -> Article | None:
         .options(
             selectinload(Article.tailles),
             selectinload(Article.couleurs),
+            selectinload(Article.variantes),
             selectinload(Article.depots),
             selectinload(Article.tarifs),
         )
@@ -58,16 +64,47 @@ async def get_article_by_ref(db: AsyncSession, reference: str) -> Article | None
     return result.scalar_one_or_none()
 
 
+def _stock_initial(article_id: int, data: ArticleCreate) -> list[tuple]:
+    """Stock de création au registre : par taille ou par couleur, le reste sans variante."""
+    cle = disponibilite_service.cle
+    variantes = [(cle(article_id, t.taille), t.stock) for t in data.tailles if t.stock] or [
+        (cle(article_id, None, c.couleur), c.stock) for c in data.couleurs if c.stock
+    ]
+    reste = data.stock_actuel - sum(quantite for _, quantite in variantes)
+    return [(k, None, quantite) for k, quantite in [*variantes, (cle(article_id), max(reste, 0))]]
+
+
 async def create_article(db: AsyncSession, data: ArticleCreate) -> Article:
-    article = Article(**data.model_dump(exclude={"tailles", "couleurs"}))
+    """Crée l'article ; son stock entre au registre, d'où sont refaits ses stocks agrégés.
+
+    ValueError si le stock est donné à la fois par taille et par couleur : le
+    registre ne saurait pas le répartir entre les combinaisons.
+    """
+    if any(t.stock for t in data.tailles) and any(c.stock for c in data.couleurs):
+        raise ValueError("Stock initial à donner par taille ou par couleur, pas les deux")
+    article = Article(**data.model_dump(exclude={"tailles", "couleurs", "variantes"}))
     for t in data.tailles:
         article.tailles.append(ArticleTaille(**t.model_dump()))
     for c in data.couleurs:
         article.couleurs.append(ArticleCouleur(**c.model_dump()))
+    for v in data.variantes:
+        article.variantes.append(ArticleVariante(**v.model_dump()))
     db.add(article)
     await db.flush()
-    await db.refresh(article, ["tailles", "couleurs", "depots", "tarifs"])
-    return article
+    await disponibilite_service.mouvementer(db, _stock_initial(article.id, data))
+    result = await db.execute(
+        select(Article)
+        .where(Article.id == article.id)
+        .options(
+            selectinload(Article.tailles),
+            selectinload(Article.couleurs),
+            selectinload(Article.variantes),
+            selectinload(Article.depots),
+            selectinload(Article.tarifs),
+        )
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
 
 
 async def update_article(db: AsyncSession, article: Article, data: ArticleUpdate) -> Article:
@@ -84,10 +121,22 @@ async def delete_article(db: AsyncSession, article: Article) -> None:
     await db.flush()
 
 
+async def _entrer_stock(
+    db: AsyncSession, article_id: int, cle: disponibilite_service.Cle, depot: str | None, quantite: int
+) -> None:
+    """Le stock saisi avec une taille, une couleur ou un dépôt entre au registre ; le cache en est refait."""
+    if quantite:
+        await disponibilite_service.mouvementer(db, [(cle, depot, quantite)])
+        await allocation_service.allouer(db, [article_id])
+    else:
+        await disponibilite_service.recalculer_agregats(db, [article_id])
+
+
 async def add_taille(db: AsyncSession, article_id: int, data: ArticleTailleCreate) -> ArticleTaille:
     taille = ArticleTaille(article_id=article_id, **data.model_dump())
     db.add(taille)
     await db.flush()
+    await _entrer_stock(db, article_id, disponibilite_service.cle(article_id, data.taille), None, data.stock)
     await db.refresh(taille)
     return taille
 
@@ -96,14 +145,100 @@ async def add_couleur(db: AsyncSession, article_id: int, data: ArticleCouleurCre
     couleur = ArticleCouleur(article_id=article_id, **data.model_dump())
     db.add(couleur)
     await db.flush()
+    await _entrer_stock(db, article_id, disponibilite_service.cle(article_id, None, data.couleur), None, data.stock)
     await db.refresh(couleur)
     return couleur
 
 
+async def get_variantes(db: AsyncSession, article_id: int) -> list[ArticleVariante]:
+    result = await db.execute(
+        select(ArticleVariante).where(ArticleVariante.article_id == article_id).order_by(ArticleVariante.id)
+    )
+    return list(result.scalars().all())
+
+
+async def definir_variantes(
+    db: AsyncSession, article_id: int, data: list[ArticleVarianteCreate]
+) -> list[ArticleVariante]:
+    """Crée ou met à jour (EAN, prix) les variantes données ; les autres variantes sont conservées.
+
+    ValueError si un EAN est donné deux fois ou appartient déjà à une autre variante.
+    """
+    eans = [v.ean for v in data if v.ean]
+    doublons = sorted({ean for ean in eans if eans.count(ean) > 1})
+    if doublons:
+        raise ValueError(f"EAN en double : {', '.join(doublons)}")
+    if eans:
+        cibles = {v.ean: (article_id, v.taille, v.couleur) for v in data if v.ean}
+        result = await db.execute(
+            select(ArticleVariante.ean, ArticleVariante.article_id, ArticleVariante.taille, ArticleVariante.couleur)
+            .where(ArticleVariante.ean.in_(eans))
+        )
+        pris = sorted(row.ean for row in result.all() if tuple(row[1:]) != cibles[row.ean])
+        if pris:
+            raise ValueError(f"EAN déjà attribué : {', '.join(pris)}")
+
+    existantes = {(v.taille, v.couleur): v for v in await get_variantes(db, article_id)}
+    for v in data:
+        variante = existantes.get((v.taille, v.couleur))
+        if variante is None:
+            db.add(ArticleVariante(article_id=article_id, **v.model_dump()))
+        else:
+            variante.ean = v.ean
+            variante.prix_vente_ht = v.prix_vente_ht
+    await db.flush()
+    await disponibilite_service.recalculer_agregats(db, [article_id])
+    result = await db.execute(
+        select(ArticleVariante)
+        .where(ArticleVariante.article_id == article_id)
+        .order_by(ArticleVariante.id)
+        .execution_options(populate_existing=True)
+    )
+    return list(result.scalars().all())
+
+
+def _ordre(definis: list[str], presents: list[str]) -> list[str]:
+    # Ordre de la fiche article (tailles, couleurs), puis valeurs propres aux variantes
+    utilises = set(presents)
+    ordre = [valeur for valeur in dict.fromkeys(definis) if valeur in utilises]
+    return ordre + [valeur for valeur in dict.fromkeys(presents) if valeur not in ordre]
+
+
+async def get_grille(db: AsyncSession, article: Article) -> GrilleVariantesRead:
+    """Matrice taille × couleur des variantes avec leur stock au registre, en une requête."""
+    result = await db.execute(
+        select(
+            ArticleVariante.id, ArticleVariante.taille, ArticleVariante.couleur, ArticleVariante.ean,
+            ArticleVariante.prix_vente_ht,
+            func.coalesce(Stock.physique, 0).label("physique"), func.coalesce(Stock.reserve, 0).label("reserve"),
+        )
+        .outerjoin(Stock, and_(
+            Stock.article_id == ArticleVariante.article_id,
+            Stock.taille == ArticleVariante.taille,
+            Stock.couleur == ArticleVariante.couleur,
+        ))
+        .where(ArticleVariante.article_id == article.id)
+        .order_by(ArticleVariante.id)
+    )
+    variantes = result.all()
+    tailles = _ordre([t.taille for t in article.tailles], [v.taille for v in variantes])
+    couleurs = _ordre([c.couleur for c in article.couleurs], [v.couleur for v in variantes])
+    index_taille = {taille: i for i, taille in enumerate(tailles)}
+    index_couleur = {couleur: j for j, couleur in enumerate(couleurs)}
+    cellules: list[list[list | None]] = [[None] * len(couleurs) for _ in tailles]
+    for v in variantes:
+        cellules[index_taille[v.taille]][index_couleur[v.couleur]] = [
+            v.id, v.ean, v.physique, v.reserve, v.physique - v.reserve,
+            v.prix_vente_ht if v.prix_vente_ht is not None else article.prix_vente_ht,
+        ]
+    return GrilleVariantesRead(article_id=article.id, tailles=tailles, couleurs=couleurs, cellules=cellules)
+
+
 async def add_depot(db: AsyncSession, article_id: int, data: ArticleDepotCreate) -> ArticleDepot:
     depot = ArticleDepot(article_id=article_id, **data.model_dump())
     db.add(depot)
     await db.flush()
+    await _entrer_stock(db, article_id, disponibilite_service.cle(article_id), data.depot, data.stock)
     await db.refresh(depot)
     return depot
 
@@ -112,5 +247,6 @@ async def add_tarif(db: AsyncSession, article_id: int, data: ArticleTarifCreate)
     tarif = ArticleTarif(article_id=article_id, **data.model_dump())
     db.add(tarif)
     await db.flush()
+    tarif_service.invalider_apres_commit(db)
     await db.refresh(tarif)
     return tarif
@@ -1,8 +1,11 @@
-from sqlalchemy import select, func
+from decimal import Decimal
+
+from sqlalchemy import bindparam, select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.models.client import Client, ContactClient, AdresseClient
+from app.models.facture import Facture, StatutFacture
 from app.schemas.client import ClientCreate, ClientUpdate, ContactClientCreate, AdresseClientCreate
 
 
@@ -90,3 +93,80 @@ async def add_adresse(db: AsyncSession, client_id: int, data: AdresseClientCreat
     await db.flush()
     await db.refresh(adresse)
     return adresse
+
+
+# --- Encours -------------------------------------------------------------------------
+# Client.encours = somme des restes dus (TTC - réglé) des factures non annulées.
+# Il est ajusté à l'émission, au règlement et à l'annulation d'une facture :
+# le contrôle d'une commande ne relit qu'une ligne de clients.
+
+async def ajuster_encours(db: AsyncSession, client_id: int, montant: Decimal) -> None:
+    table = Client.__table__
+    await db.execute(
+        update(table).where(table.c.id == client_id).values(encours=table.c.encours + montant)
+    )
+
+
+async def ajuster_encours_clients(db: AsyncSession, montants: dict[int, Decimal]) -> None:
+    """Ajuste l'encours de plusieurs clients en une instruction (montants par client)."""
+    if not montants:
+        return
+    table = Client.__table__
+    await db.execute(
+        update(table)
+        .where(table.c.id == bindparam("client_id"))
+        .values(encours=table.c.encours + bindparam("montant", type_=table.c.encours.type)),
+        [{"client_id": client_id, "montant": montant} for client_id, montant in montants.items()],
+    )
+
+
+def imputation_encours():
+    """UPDATE de l'encours du client d'une facture réglée (mêmes paramètres que ``facture_service.imputation``)."""
+    table = Client.__table__
+    client_id = select(Facture.client_id).where(Facture.id == bindparam("facture_id")).scalar_subquery()
+    return (
+        update(table)
+        .where(table.c.id == client_id)
+        .values(encours=table.c.encours - bindparam("montant", type_=table.c.encours.type))
+    )
+
+
+async def controler_encours(db: AsyncSession, client_id: int, montant: Decimal) -> str | None:
+    """Message d'alerte si ``montant`` fait dépasser au client son encours autorisé (0 = sans plafond)."""
+    result = await db.execute(select(Client.encours, Client.encours_max).where(Client.id == client_id))
+    row = result.one_or_none()
+    if row is None or not row.encours_max or row.encours + montant <= row.encours_max:
+        return None
+    return (
+        f"Encours client dépassé : {row.encours + montant:.2f} € "
+        f"pour un plafond de {row.encours_max:.2f} €"
+    )
+
+
+async def recalculer_encours(db: AsyncSession) -> list[tuple[int, Decimal, Decimal]]:
+    """Recalcule l'encours de tous les clients depuis les factures ; renvoie les écarts corrigés.
+
+    Réparation d'une dérive (import, correction manuelle en base) : les factures
+    archivées, payées ou annulées, n'y contribuent pas.
+    """
+    du = (
+        select(Facture.client_id, func.sum(Facture.total_ttc - Facture.montant_regle).label("du"))
+        .where(Facture.statut != StatutFacture.ANNULEE)
+        .group_by(Facture.client_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(Client.id, Client.encours, func.coalesce(du.c.du, 0)).outerjoin(du, du.c.client_id == Client.id)
+    )
+    ecarts = []
+    for client_id, encours, calcule in result.all():
+        calcule = Decimal(str(calcule)).quantize(Decimal("0.01"))
+        if encours != calcule:
+            ecarts.append((client_id, encours, calcule))
+    if ecarts:
+        table = Client.__table__
+        await db.execute(
+            update(table).where(table.c.id == bindparam("client_id")).values(encours=bindparam("calcule")),
+            [{"client_id": client_id, "calcule": calcule} for client_id, _, calcule in ecarts],
+        )
+    return ecarts
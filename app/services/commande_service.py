@@ -1,24 +1,18 @@
-from decimal import Decimal
-
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.models.commande import Commande, LigneCommande, StatutCommande
-from app.schemas.commande import CommandeCreate, CommandeUpdate
-
+from app.schemas.commande import CommandeCreate, CommandeUpdate, LigneCommandeCreate, LigneCommandeUpdate
+from app.services import allocation_service, archive_service, numerotation_service, tarif_service
+from app.services.disponibilite_service import STATUTS_OUVERTS
+from app.utils.chiffrage import chiffrer, montant_ligne, totaliser
 
-async def _next_numero(db: AsyncSession) -> str:
-    result = await db.execute(select(func.count(Commande.id)))
-    count = (result.scalar() or 0) + 1
-    return f"CMD-{count:06d}"
+STATUTS_ANNULABLES = (StatutCommande.BROUILLON, *STATUTS_OUVERTS)
 
 
-def _calc_ligne(quantite: int, prix_unitaire: Decimal, remise_pct: Decimal) -> Decimal:
-    montant = Decimal(str(quantite)) * prix_unitaire
-    if remise_pct > 0:
-        montant *= (1 - remise_pct / 100)
-    return montant.quantize(Decimal("0.01"))
+async def _next_numero(db: AsyncSession) -> str:
+    return await numerotation_service.numero(db, Commande, "CMD")
 
 
 async def get_commandes(
@@ -50,10 +44,14 @@ async def get_commandes(
 async def get_commande(db: AsyncSession, commande_id: int) -> Commande | None:
     query = select(Commande).where(Commande.id == commande_id).options(selectinload(Commande.lignes))
     result = await db.execute(query)
-    return result.scalar_one_or_none()
+    commande = result.scalar_one_or_none()
+    if commande is None:
+        commande = await archive_service.get_archive(db, Commande, commande_id)
+    return commande
 
 
 async def create_commande(db: AsyncSession, data: CommandeCreate) -> Commande:
+    await tarif_service.completer_lignes(db, data.client_id, data.lignes)
     numero = await _next_numero(db)
     commande = Commande(
         numero=numero,
@@ -62,6 +60,7 @@ async def create_commande(db: AsyncSession, data: CommandeCreate) -> Commande:
         date_livraison_souhaitee=data.date_livraison_souhaitee,
         reference_client=data.reference_client,
         notes=data.notes,
+        priorite=data.priorite,
         adresse_livraison=data.adresse_livraison,
         cp_livraison=data.cp_livraison,
         ville_livraison=data.ville_livraison,
@@ -69,10 +68,8 @@ async def create_commande(db: AsyncSession, data: CommandeCreate) -> Commande:
         remise_globale_pct=data.remise_globale_pct,
     )
 
-    total_ht = Decimal("0")
-    total_tva = Decimal("0")
-    for i, ligne_data in enumerate(data.lignes, 1):
-        montant_ht = _calc_ligne(ligne_data.quantite, ligne_data.prix_unitaire_ht, ligne_data.remise_pct)
+    chiffrage = chiffrer(data.lignes, data.remise_globale_pct)
+    for i, (ligne_data, montant_ht) in enumerate(zip(data.lignes, chiffrage.montants_ht, strict=True), 1):
         ligne = LigneCommande(
             ligne_numero=i,
             article_id=ligne_data.article_id,
@@ -86,16 +83,7 @@ async def create_commande(db: AsyncSession, data: CommandeCreate) -> Commande:
             couleur=ligne_data.couleur,
         )
         commande.lignes.append(ligne)
-        total_ht += montant_ht
-        total_tva += (montant_ht * ligne_data.tva_pct / 100).quantize(Decimal("0.01"))
-
-    if data.remise_globale_pct > 0:
-        total_ht *= (1 - data.remise_globale_pct / 100)
-        total_tva *= (1 - data.remise_globale_pct / 100)
-
-    commande.total_ht = total_ht.quantize(Decimal("0.01"))
-    commande.total_tva = total_tva.quantize(Decimal("0.01"))
-    commande.total_ttc = (total_ht + total_tva).quantize(Decimal("0.01"))
+    chiffrage.appliquer(commande)
 
     db.add(commande)
     await db.flush()
@@ -107,13 +95,128 @@ async def update_commande(db: AsyncSession, commande: Commande, data: CommandeUp
     update_data = data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(commande, field, value)
+    if "remise_globale_pct" in update_data:
+        await _retotaliser(db, commande)
     await db.flush()
     await db.refresh(commande)
     return commande
 
 
+async def get_commande_seule(db: AsyncSession, commande_id: int) -> Commande | None:
+    """En-tête de la commande, sans ses lignes (édition ligne à ligne)."""
+    return await db.get(Commande, commande_id)
+
+
+async def get_ligne(db: AsyncSession, commande_id: int, ligne_id: int) -> LigneCommande | None:
+    result = await db.execute(
+        select(LigneCommande).where(LigneCommande.id == ligne_id, LigneCommande.commande_id == commande_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _retotaliser(db: AsyncSession, commande: Commande) -> None:
+    """Totaux refaits depuis les bases HT par taux, agrégées en base : les lignes ne sont pas chargées.
+
+    La TVA étant arrondie par taux, un écart de montant ne peut pas être reporté sur les
+    seuls totaux de la commande : il faudrait conserver une base par taux, tenue à jour
+    par toutes les écritures de lignes (import, reliquats, facturation). L'agrégat parcourt
+    l'index sur ``commande_id`` et ne renvoie qu'une ligne par taux.
+    """
+    result = await db.execute(
+        select(LigneCommande.tva_pct, func.sum(LigneCommande.montant_ht))
+        .where(LigneCommande.commande_id == commande.id)
+        .group_by(LigneCommande.tva_pct)
+    )
+    totaliser(dict(result.all()), commande.remise_globale_pct).appliquer(commande)
+
+
+async def ajouter_ligne(db: AsyncSession, commande: Commande, data: LigneCommandeCreate) -> LigneCommande:
+    await tarif_service.completer_lignes(db, commande.client_id, [data])
+    result = await db.execute(
+        select(func.max(LigneCommande.ligne_numero)).where(LigneCommande.commande_id == commande.id)
+    )
+    ligne = LigneCommande(
+        commande_id=commande.id,
+        ligne_numero=(result.scalar() or 0) + 1,
+        article_id=data.article_id,
+        designation=data.designation,
+        quantite=data.quantite,
+        prix_unitaire_ht=data.prix_unitaire_ht,
+        remise_pct=data.remise_pct,
+        tva_pct=data.tva_pct,
+        montant_ht=montant_ligne(data),
+        taille=data.taille,
+        couleur=data.couleur,
+    )
+    db.add(ligne)
+    await db.flush()
+    await _retotaliser(db, commande)
+    await db.flush()
+    return ligne
+
+
+async def modifier_ligne(
+    db: AsyncSession, commande: Commande, ligne: LigneCommande, data: LigneCommandeUpdate
+) -> LigneCommande:
+    for field, value in data.model_dump(exclude_unset=True).items():
+        # null n'efface que les champs facultatifs (taille, couleur)
+        if value is not None or LigneCommande.__table__.c[field].nullable:
+            setattr(ligne, field, value)
+    ligne.montant_ht = montant_ligne(ligne)
+    await db.flush()
+    await _retotaliser(db, commande)
+    await db.flush()
+    return ligne
+
+
+async def supprimer_ligne(db: AsyncSession, commande: Commande, ligne: LigneCommande) -> None:
+    await db.delete(ligne)
+    await db.flush()
+    await _retotaliser(db, commande)
+    await db.flush()
+
+
 async def changer_statut(db: AsyncSession, commande: Commande, statut: StatutCommande) -> Commande:
     commande.statut = statut
     await db.flush()
     await db.refresh(commande)
     return commande
+
+
+async def _relire_lignes(db: AsyncSession, commande: Commande) -> None:
+    # Les allocations sont écrites en une instruction : les lignes chargées sont relues
+    await db.execute(
+        select(LigneCommande).where(LigneCommande.commande_id == commande.id)
+        .execution_options(populate_existing=True)
+    )
+
+
+async def valider(db: AsyncSession, commande: Commande) -> Commande:
+    """Valide la commande et réserve pour ses lignes le stock libre, après les reliquats prioritaires.
+
+    ValueError si la commande n'est pas un brouillon.
+    """
+    if commande.statut != StatutCommande.BROUILLON:
+        raise ValueError("Seule une commande en brouillon peut être validée")
+    commande.statut = StatutCommande.VALIDEE
+    await db.flush()
+    await allocation_service.allouer(db, {ligne.article_id for ligne in commande.lignes})
+    await _relire_lignes(db, commande)
+    await db.refresh(commande)
+    return commande
+
+
+async def annuler(db: AsyncSession, commande: Commande) -> Commande:
+    """Annule la commande ; son stock alloué revient aux reliquats des autres commandes.
+
+    ValueError si la commande est déjà expédiée, facturée ou annulée.
+    """
+    if commande.statut not in STATUTS_ANNULABLES:
+        raise ValueError("Commande non annulable")
+    article_ids = await allocation_service.liberer(db, [commande.id])
+    commande.statut = StatutCommande.ANNULEE
+    await db.flush()
+    await allocation_service.allouer(db, article_ids)
+    await _relire_lignes(db, commande)
+    await db.refresh(commande)
+    return commande
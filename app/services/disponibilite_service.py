@@ -0,0 +1,306 @@
+"""Registre du stock par variante et par dépôt : physique, réservé, disponible.
+
+Une ligne de ``stocks`` par (article, taille, couleur) ; taille et couleur vides
+désignent l'article sans variante. Une ligne de commande ou de BL sans variante
+puise dans le stock sans variante, une ligne d'une variante dans le stock de
+cette seule variante.
+
+Le stock physique est tenu par dépôt dans ``stocks_depots`` ; ``mouvementer``
+écrit les quantités des dépôts et leur somme par variante dans ``stocks``, puis
+refait les stocks agrégés des articles (``Article.stock_actuel``, stock des
+tailles, des couleurs, des variantes et des dépôts), qui ne sont que des caches
+du registre.
+
+``reserve`` compte le stock alloué aux reliquats des commandes ouvertes et les
+quantités sur des BL pas encore expédiés ; disponible = physique - réservé.
+Chaque opération (validation, annulation, livraison, mouvement de stock)
+applique ses écarts en une instruction d'upsert sur les lignes concernées, dans
+la transaction de la pièce : la disponibilité se lit sans agrégat, en une
+requête pour tout un panier.
+"""
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+
+from sqlalchemy import func, literal, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.article import Article, ArticleCouleur, ArticleDepot, ArticleTaille, ArticleVariante
+from app.models.commande import Commande, LigneCommande, StatutCommande
+from app.models.livraison import BonLivraison, LigneBonLivraison, StatutLivraison
+from app.models.stock import Stock, StockDepot
+
+STATUTS_OUVERTS = (
+    StatutCommande.VALIDEE, StatutCommande.EN_PREPARATION, StatutCommande.PREPAREE,
+    StatutCommande.EXPEDIEE_PARTIELLEMENT,
+)
+BL_EN_COURS = (StatutLivraison.EN_PREPARATION, StatutLivraison.PREPAREE)
+
+Cle = tuple[int, str, str]
+
+
+@dataclass(frozen=True, slots=True)
+class Etat:
+    physique: int = 0
+    reserve: int = 0
+
+    @property
+    def disponible(self) -> int:
+        return self.physique - self.reserve
+
+
+def cle(article_id: int, taille: str | None = None, couleur: str | None = None) -> Cle:
+    return article_id, taille or "", couleur or ""
+
+
+def _upsert(db: AsyncSession, table):
+    dialecte = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return dialecte.insert(table)
+
+
+async def appliquer(db: AsyncSession, variations: Iterable[tuple[Cle, int, int]]) -> None:
+    """Ajoute des écarts (clé, physique, réservé) au registre, en une instruction.
+
+    Les écarts d'une même clé sont cumulés ; une variante absente du registre y est créée.
+    """
+    ecarts: dict[Cle, list[int]] = defaultdict(lambda: [0, 0])
+    for k, physique, reserve in variations:
+        ecarts[k][0] += physique
+        ecarts[k][1] += reserve
+    lignes = [
+        {"article_id": k[0], "taille": k[1], "couleur": k[2], "physique": p, "reserve": r}
+        for k, (p, r) in sorted(ecarts.items()) if p or r
+    ]
+    if not lignes:
+        return
+    table = Stock.__table__
+    stmt = _upsert(db, table)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.article_id, table.c.taille, table.c.couleur],
+            set_={
+                "physique": table.c.physique + stmt.excluded.physique,
+                "reserve": table.c.reserve + stmt.excluded.reserve,
+            },
+        ),
+        lignes,
+    )
+
+
+async def mouvementer(db: AsyncSession, ecritures: Iterable[tuple[Cle, str | None, int]]) -> None:
+    """Ajoute des quantités (clé, dépôt, quantité signée) au stock des dépôts.
+
+    Une instruction pour les dépôts, une pour les variantes (un transfert entre
+    dépôts n'y change rien), puis les stocks agrégés des articles concernés.
+    Sans dépôt, le dépôt principal.
+    """
+    ecarts: dict[tuple[Cle, str], int] = defaultdict(int)
+    for k, depot, quantite in ecritures:
+        ecarts[(k, depot or settings.DEPOT_PRINCIPAL)] += quantite
+    lignes = [
+        {"article_id": k[0], "depot": depot, "taille": k[1], "couleur": k[2], "quantite": quantite}
+        for (k, depot), quantite in sorted(ecarts.items()) if quantite
+    ]
+    if not lignes:
+        return
+    table = StockDepot.__table__
+    stmt = _upsert(db, table)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.article_id, table.c.depot, table.c.taille, table.c.couleur],
+            set_={"quantite": table.c.quantite + stmt.excluded.quantite},
+        ),
+        lignes,
+    )
+    await appliquer(db, [(k, quantite, 0) for (k, _), quantite in ecarts.items()])
+    await recalculer_agregats(db, {ligne["article_id"] for ligne in lignes})
+
+
+async def fixer_depot(db: AsyncSession, depot: str | None, quantites: Mapping[Cle, int]) -> None:
+    """Remplace le stock des variantes dans un dépôt (inventaire) ; l'écart passe par ``mouvementer``."""
+    depot = depot or settings.DEPOT_PRINCIPAL
+    actuelles = await stocks_depot(db, depot, quantites, verrouiller=True)
+    await mouvementer(db, [(k, depot, quantite - actuelles[k]) for k, quantite in quantites.items()])
+
+
+async def stocks_depot(
+    db: AsyncSession, depot: str, cles: Iterable[Cle], verrouiller: bool = False
+) -> dict[Cle, int]:
+    """Stock des variantes dans un dépôt, en une requête ; les variantes absentes valent zéro."""
+    cles = sorted(set(cles))
+    if not cles:
+        return {}
+    query = select(StockDepot.article_id, StockDepot.taille, StockDepot.couleur, StockDepot.quantite).where(
+        StockDepot.depot == depot, tuple_(StockDepot.article_id, StockDepot.taille, StockDepot.couleur).in_(cles)
+    )
+    if verrouiller:
+        query = query.with_for_update()
+    quantites = dict.fromkeys(cles, 0)
+    for row in (await db.execute(query)).all():
+        quantites[(row.article_id, row.taille, row.couleur)] = row.quantite
+    return quantites
+
+
+async def recalculer_agregats(db: AsyncSession, article_ids: Iterable[int] | None = None) -> None:
+    """Refait depuis le registre le stock des articles, de leurs tailles, couleurs, variantes et dépôts.
+
+    Tous les articles si ``article_ids`` est omis. Un dépôt présent au registre
+    mais absent des dépôts de l'article y est ajouté.
+    """
+    ids = None if article_ids is None else sorted(set(article_ids))
+    if ids == []:
+        return
+
+    def somme(colonne, *conditions):
+        return select(func.coalesce(func.sum(colonne), 0)).where(*conditions).scalar_subquery()
+
+    def articles(colonne):
+        return [] if ids is None else [colonne.in_(ids)]
+
+    article, taille, couleur, variante, depot = (
+        Article.__table__, ArticleTaille.__table__, ArticleCouleur.__table__, ArticleVariante.__table__,
+        ArticleDepot.__table__,
+    )
+    await db.execute(
+        update(article).where(*articles(article.c.id))
+        .values(stock_actuel=somme(Stock.physique, Stock.article_id == article.c.id))
+    )
+    await db.execute(
+        update(taille).where(*articles(taille.c.article_id))
+        .values(stock=somme(Stock.physique, Stock.article_id == taille.c.article_id, Stock.taille == taille.c.taille))
+    )
+    await db.execute(
+        update(couleur).where(*articles(couleur.c.article_id))
+        .values(stock=somme(
+            Stock.physique, Stock.article_id == couleur.c.article_id, Stock.couleur == couleur.c.couleur
+        ))
+    )
+    await db.execute(
+        update(variante).where(*articles(variante.c.article_id))
+        .values(stock=somme(
+            Stock.physique, Stock.article_id == variante.c.article_id,
+            Stock.taille == variante.c.taille, Stock.couleur == variante.c.couleur,
+        ))
+    )
+    connus = select(depot.c.id).where(depot.c.article_id == StockDepot.article_id, depot.c.depot == StockDepot.depot)
+    await db.execute(
+        depot.insert().from_select(
+            ["article_id", "depot", "stock"],
+            select(StockDepot.article_id, StockDepot.depot, literal(0))
+            .where(*articles(StockDepot.article_id), ~connus.exists())
+            .distinct(),
+        )
+    )
+    await db.execute(
+        update(depot).where(*articles(depot.c.article_id))
+        .values(stock=somme(
+            StockDepot.quantite, StockDepot.article_id == depot.c.article_id, StockDepot.depot == depot.c.depot
+        ))
+    )
+
+
+async def lire(db: AsyncSession, cles: Iterable[Cle], verrouiller: bool = False) -> dict[Cle, Etat]:
+    """État des variantes demandées, en une requête ; les variantes absentes valent zéro.
+
+    ``verrouiller`` pose un verrou sur les lignes lues jusqu'à la fin de la transaction.
+    """
+    cles = sorted(set(cles))
+    if not cles:
+        return {}
+    query = (
+        select(Stock.article_id, Stock.taille, Stock.couleur, Stock.physique, Stock.reserve)
+        .where(tuple_(Stock.article_id, Stock.taille, Stock.couleur).in_(cles))
+        .order_by(Stock.article_id, Stock.taille, Stock.couleur)
+    )
+    if verrouiller:
+        query = query.with_for_update()
+    etats = dict.fromkeys(cles, Etat())
+    for row in (await db.execute(query)).all():
+        etats[(row.article_id, row.taille, row.couleur)] = Etat(row.physique, row.reserve)
+    return etats
+
+
+async def stock_libre(db: AsyncSession, cles: Iterable[Cle], verrouiller: bool = False) -> dict[Cle, int]:
+    return {k: etat.disponible for k, etat in (await lire(db, cles, verrouiller)).items()}
+
+
+async def get_stocks_article(db: AsyncSession, article_id: int) -> list[Stock]:
+    result = await db.execute(
+        select(Stock).where(Stock.article_id == article_id).order_by(Stock.taille, Stock.couleur)
+    )
+    return list(result.scalars().all())
+
+
+async def get_stocks_depots_article(db: AsyncSession, article_id: int) -> list[StockDepot]:
+    result = await db.execute(
+        select(StockDepot)
+        .where(StockDepot.article_id == article_id)
+        .order_by(StockDepot.depot, StockDepot.taille, StockDepot.couleur)
+    )
+    return list(result.scalars().all())
+
+
+async def disponibilites(
+    db: AsyncSession, demandes: Iterable[tuple[Cle, int]]
+) -> list[tuple[Cle, int, Etat, bool]]:
+    """Couverture d'un panier : (clé, quantité, état, livrable) par demande, dans l'ordre.
+
+    Les demandes d'une même variante sont cumulées : chacune n'est livrable que
+    si le disponible couvre le total demandé pour la variante.
+    """
+    demandes = list(demandes)
+    total: dict[Cle, int] = defaultdict(int)
+    for k, quantite in demandes:
+        total[k] += quantite
+    etats = await lire(db, total)
+    return [(k, quantite, etats[k], etats[k].disponible >= total[k]) for k, quantite in demandes]
+
+
+async def initialiser(db: AsyncSession) -> None:
+    """Complète le registre et en refait le réservé et les stocks agrégés.
+
+    Les articles absents du registre y entrent avec leur stock, sans variante,
+    au dépôt principal. À appeler après un chargement de données hors
+    application (reprise, jeu de test).
+    """
+    connus = select(Stock.id).where(Stock.article_id == Article.id).exists()
+    await db.execute(
+        Stock.__table__.insert().from_select(
+            ["article_id", "taille", "couleur", "physique", "reserve"],
+            select(Article.id, literal(""), literal(""), Article.stock_actuel, literal(0)).where(~connus),
+        )
+    )
+    en_depot = select(StockDepot.id).where(
+        StockDepot.article_id == Stock.article_id,
+        StockDepot.taille == Stock.taille,
+        StockDepot.couleur == Stock.couleur,
+    ).exists()
+    await db.execute(
+        StockDepot.__table__.insert().from_select(
+            ["article_id", "depot", "taille", "couleur", "quantite"],
+            select(Stock.article_id, literal(settings.DEPOT_PRINCIPAL), Stock.taille, Stock.couleur, Stock.physique)
+            .where(~en_depot),
+        )
+    )
+    await db.execute(update(Stock.__table__).values(reserve=0))
+
+    taille, couleur = func.coalesce(LigneCommande.taille, ""), func.coalesce(LigneCommande.couleur, "")
+    alloue = await db.execute(
+        select(LigneCommande.article_id, taille, couleur, func.sum(LigneCommande.quantite_allouee))
+        .join(Commande, Commande.id == LigneCommande.commande_id)
+        .where(Commande.statut.in_(STATUTS_OUVERTS), LigneCommande.quantite_allouee > 0)
+        .group_by(LigneCommande.article_id, taille, couleur)
+    )
+    taille, couleur = func.coalesce(LigneBonLivraison.taille, ""), func.coalesce(LigneBonLivraison.couleur, "")
+    en_bl = await db.execute(
+        select(LigneBonLivraison.article_id, taille, couleur, func.sum(LigneBonLivraison.quantite))
+        .join(BonLivraison, BonLivraison.id == LigneBonLivraison.bon_livraison_id)
+        .where(BonLivraison.statut.in_(BL_EN_COURS))
+        .group_by(LigneBonLivraison.article_id, taille, couleur)
+    )
+    await appliquer(db, [
+        ((article_id, t, c), 0, quantite) for article_id, t, c, quantite in [*alloue.all(), *en_bl.all()]
+    ])
+    await recalculer_agregats(db)
@@ -8,6 +8,7 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 
 from app.models.facture import Facture
+from app.utils.chiffrage import chiffrer
 
 
 def generate_facture_pdf(facture: Facture, client_name: str) -> bytes:
@@ -58,11 +59,10 @@ def generate_facture_pdf(facture: Facture, client_name: str) -> bytes:
     elements.append(Spacer(1, 10 * mm))
 
     # Totaux
-    totaux_data = [
-        ["Total HT", f"{facture.total_ht:.2f} €"],
-        ["TVA", f"{facture.total_tva:.2f} €"],
-        ["Total TTC", f"{facture.total_ttc:.2f} €"],
-    ]
+    totaux_data = [["Total HT", f"{facture.total_ht:.2f} €"]]
+    for tva in chiffrer(facture.lignes, facture.remise_globale_pct).ventilation:
+        totaux_data.append([f"TVA {tva.taux:.2f} % sur {tva.base_ht:.2f} €", f"{tva.montant_tva:.2f} €"])
+    totaux_data.append(["Total TTC", f"{facture.total_ttc:.2f} €"])
     if facture.montant_regle > 0:
         totaux_data.append(["Déjà réglé", f"{facture.montant_regle:.2f} €"])
         reste = facture.total_ttc - facture.montant_regle
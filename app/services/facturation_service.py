@@ -0,0 +1,178 @@
+"""Facturation en masse des commandes.
+
+Les commandes éligibles (expédiées ou livrées et non facturées, filtrées par
+client, VRP, statut ou date) sont traitées par lots : en-têtes et lignes lus en
+deux requêtes, numéros de facture réservés en bloc (voir numerotation_service),
+factures, lignes et liens facture-commande insérés en masse, commandes passées
+à « facturée » (leur stock alloué rendu), et encours des clients ajustés en une
+instruction chacun.
+
+Avec ``grouper_par_client``, les commandes d'un même client (et de même remise
+globale) sont réunies sur une seule facture, chiffrée par le moteur commun ;
+sinon chaque facture reprend les montants de sa commande, comme la
+facturation unitaire. Dans les deux cas, ``factures_commandes`` relie chaque
+facture à ses commandes.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.client import Client
+from app.models.commande import Commande, LigneCommande, StatutCommande
+from app.models.facture import Facture, LigneFacture, StatutFacture
+from app.schemas.facture import FacturationCreate
+from app.services import allocation_service, client_service, facture_service, numerotation_service
+from app.services.facture_service import STATUTS_FACTURABLES
+from app.utils.chiffrage import chiffrer
+
+LOT = 500
+
+COLONNES_LIGNE = (
+    "article_id", "designation", "quantite", "prix_unitaire_ht", "remise_pct", "tva_pct", "montant_ht",
+    "taille", "couleur",
+)
+
+
+@dataclass
+class Lot:
+    commandes: int = 0
+    numeros: list[str] = field(default_factory=list)
+    total_ttc: Decimal = Decimal("0")
+
+
+def _conditions(filtre: FacturationCreate) -> list:
+    statuts = [s for s in filtre.statuts or STATUTS_FACTURABLES if s in STATUTS_FACTURABLES]
+    conditions = [Commande.statut.in_(statuts)]
+    if filtre.client_id:
+        conditions.append(Commande.client_id == filtre.client_id)
+    if filtre.vrp_id:
+        conditions.append(Commande.vrp_id == filtre.vrp_id)
+    if filtre.date_commande_max:
+        conditions.append(Commande.date_commande <= filtre.date_commande_max)
+    return conditions
+
+
+async def compter_eligibles(db: AsyncSession, filtre: FacturationCreate) -> int:
+    result = await db.execute(select(func.count(Commande.id)).where(*_conditions(filtre)))
+    return result.scalar() or 0
+
+
+async def _commandes(db: AsyncSession, filtre: FacturationCreate, taille: int) -> list:
+    conditions = _conditions(filtre)
+    query = (
+        select(
+            Commande.id, Commande.numero, Commande.client_id, Commande.vrp_id,
+            Commande.adresse_livraison, Commande.cp_livraison, Commande.ville_livraison,
+            Commande.total_ht, Commande.total_tva, Commande.total_ttc, Commande.remise_globale_pct,
+            Client.mode_reglement, Client.delai_reglement,
+        )
+        .join(Client, Client.id == Commande.client_id)
+        .order_by(Commande.client_id, Commande.id)
+        .with_for_update(of=Commande)
+    )
+    if filtre.grouper_par_client:
+        # Lot de clients entiers : les commandes d'un client ne sont jamais réparties sur deux lots
+        clients = select(Commande.client_id).where(*conditions).distinct().order_by(Commande.client_id).limit(taille)
+        query = query.where(*conditions, Commande.client_id.in_(clients))
+    else:
+        query = query.where(*conditions).limit(taille)
+    return (await db.execute(query)).all()
+
+
+async def _lignes(db: AsyncSession, commande_ids: list[int]) -> dict[int, list]:
+    result = await db.execute(
+        select(LigneCommande.commande_id, *[getattr(LigneCommande, c) for c in COLONNES_LIGNE])
+        .where(LigneCommande.commande_id.in_(commande_ids))
+        .order_by(LigneCommande.commande_id, LigneCommande.ligne_numero)
+    )
+    lignes = defaultdict(list)
+    for ligne in result.all():
+        lignes[ligne.commande_id].append(ligne)
+    return lignes
+
+
+async def facturer_lot(db: AsyncSession, filtre: FacturationCreate, taille: int = LOT) -> Lot:
+    """Facture un lot de commandes éligibles ; un lot vide signifie qu'il n'en reste plus."""
+    commandes = await _commandes(db, filtre, taille)
+    if not commandes:
+        return Lot()
+    lignes = await _lignes(db, [c.id for c in commandes])
+
+    groupes = defaultdict(list)
+    for commande in commandes:
+        cle = (commande.client_id, commande.remise_globale_pct) if filtre.grouper_par_client else commande.id
+        groupes[cle].append(commande)
+
+    maintenant = datetime.now(timezone.utc)
+    numeros = await numerotation_service.numeros(db, Facture, "FAC", len(groupes))
+    factures, lignes_factures = [], []
+    for rang, groupe in enumerate(groupes.values()):
+        commande = groupe[0]
+        lignes_groupe = [ligne for c in groupe for ligne in lignes[c.id]]
+        if len(groupe) == 1:
+            totaux = (commande.total_ht, commande.total_tva, commande.total_ttc)
+            montants = [ligne.montant_ht for ligne in lignes_groupe]
+        else:
+            chiffrage = chiffrer(lignes_groupe, commande.remise_globale_pct)
+            totaux = (chiffrage.total_ht, chiffrage.total_tva, chiffrage.total_ttc)
+            montants = chiffrage.montants_ht
+        factures.append({
+            "numero": numeros[rang],
+            "date_facture": maintenant,
+            "client_id": commande.client_id,
+            "commande_id": commande.id if len(groupe) == 1 else None,
+            "vrp_id": commande.vrp_id,
+            "statut": StatutFacture.EMISE,
+            "date_echeance": maintenant + timedelta(days=commande.delai_reglement or 0),
+            "mode_reglement": filtre.mode_reglement or commande.mode_reglement,
+            "notes": f"Commandes {', '.join(c.numero for c in groupe)}" if len(groupe) > 1 else None,
+            "adresse_facturation": commande.adresse_livraison,
+            "cp_facturation": commande.cp_livraison,
+            "ville_facturation": commande.ville_livraison,
+            "total_ht": totaux[0],
+            "total_tva": totaux[1],
+            "total_ttc": totaux[2],
+            "montant_regle": Decimal("0"),
+            "remise_globale_pct": commande.remise_globale_pct,
+        })
+        lignes_factures.append([
+            {
+                **{c: getattr(ligne, c) for c in COLONNES_LIGNE},
+                "montant_ht": montant, "ligne_numero": numero, "date_facture": maintenant,
+            }
+            for numero, (ligne, montant) in enumerate(zip(lignes_groupe, montants, strict=True), 1)
+        ])
+
+    table = Facture.__table__
+    result = await db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), factures)
+    facture_ids = result.scalars().all()
+    rows = [
+        {**ligne, "facture_id": facture_id}
+        for facture_id, lignes_facture in zip(facture_ids, lignes_factures, strict=True)
+        for ligne in lignes_facture
+    ]
+    if rows:
+        await db.execute(insert(LigneFacture.__table__), rows)
+    await facture_service.lier_commandes(db, [
+        (facture_id, c.id) for facture_id, groupe in zip(facture_ids, groupes.values(), strict=True) for c in groupe
+    ])
+    await allocation_service.liberer(db, [c.id for c in commandes])
+    await db.execute(
+        update(Commande.__table__)
+        .where(Commande.__table__.c.id.in_([c.id for c in commandes]))
+        .values(statut=StatutCommande.FACTUREE)
+    )
+
+    encours = defaultdict(Decimal)
+    for facture in factures:
+        encours[facture["client_id"]] += facture["total_ttc"]
+    await client_service.ajuster_encours_clients(db, encours)
+    return Lot(
+        commandes=len(commandes),
+        numeros=[f["numero"] for f in factures],
+        total_ttc=sum((f["total_ttc"] for f in factures), Decimal("0")),
+    )
@@ -1,25 +1,28 @@
+from datetime import datetime, timezone
 from decimal import Decimal
 
-from sqlalchemy import select, func
+from sqlalchemy import bindparam, case, func, insert, literal, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.models.commande import Commande, StatutCommande
-from app.models.facture import Facture, LigneFacture, StatutFacture
+from app.models.facture import A_ECHOIR, Facture, FactureCommande, LigneFacture, Paiement, StatutFacture
 from app.schemas.facture import FactureCreate, FactureUpdate
+from app.services import allocation_service, archive_service, client_service, numerotation_service
+from app.utils.chiffrage import chiffrer
 
-
-async def _next_numero(db: AsyncSession) -> str:
-    result = await db.execute(select(func.count(Facture.id)))
-    count = (result.scalar() or 0) + 1
-    return f"FAC-{count:06d}"
+# Seules les commandes expédiées sont facturées : facturer libère leur stock alloué
+# et les clôt, une commande facturée avant expédition ne partirait jamais.
+STATUTS_FACTURABLES = (StatutCommande.EXPEDIEE, StatutCommande.LIVREE)
+# Factures pouvant recevoir un règlement : ni soldées, ni annulées, ni avoirs
+STATUTS_REGLABLES = (
+    StatutFacture.BROUILLON, StatutFacture.EMISE, StatutFacture.ENVOYEE, StatutFacture.EN_RETARD,
+    StatutFacture.PAYEE_PARTIELLEMENT,
+)
 
 
-def _calc_ligne(quantite: int, prix_unitaire: Decimal, remise_pct: Decimal) -> Decimal:
-    montant = Decimal(str(quantite)) * prix_unitaire
-    if remise_pct > 0:
-        montant *= (1 - remise_pct / 100)
-    return montant.quantize(Decimal("0.01"))
+async def _next_numero(db: AsyncSession) -> str:
+    return await numerotation_service.numero(db, Facture, "FAC")
 
 
 async def get_factures(
@@ -51,13 +54,17 @@ async def get_factures(
 async def get_facture(db: AsyncSession, facture_id: int) -> Facture | None:
     query = select(Facture).where(Facture.id == facture_id).options(selectinload(Facture.lignes))
     result = await db.execute(query)
-    return result.scalar_one_or_none()
+    facture = result.scalar_one_or_none()
+    if facture is None:
+        facture = await archive_service.get_archive(db, Facture, facture_id)
+    return facture
 
 
 async def create_facture(db: AsyncSession, data: FactureCreate) -> Facture:
     numero = await _next_numero(db)
     facture = Facture(
         numero=numero,
+        date_facture=datetime.now(timezone.utc),
         client_id=data.client_id,
         commande_id=data.commande_id,
         vrp_id=data.vrp_id,
@@ -71,12 +78,11 @@ async def create_facture(db: AsyncSession, data: FactureCreate) -> Facture:
         remise_globale_pct=data.remise_globale_pct,
     )
 
-    total_ht = Decimal("0")
-    total_tva = Decimal("0")
-    for i, ligne_data in enumerate(data.lignes, 1):
-        montant_ht = _calc_ligne(ligne_data.quantite, ligne_data.prix_unitaire_ht, ligne_data.remise_pct)
+    chiffrage = chiffrer(data.lignes, data.remise_globale_pct)
+    for i, (ligne_data, montant_ht) in enumerate(zip(data.lignes, chiffrage.montants_ht, strict=True), 1):
         ligne = LigneFacture(
             ligne_numero=i,
+            date_facture=facture.date_facture,
             article_id=ligne_data.article_id,
             designation=ligne_data.designation,
             quantite=ligne_data.quantite,
@@ -88,27 +94,32 @@ async def create_facture(db: AsyncSession, data: FactureCreate) -> Facture:
             couleur=ligne_data.couleur,
         )
         facture.lignes.append(ligne)
-        total_ht += montant_ht
-        total_tva += (montant_ht * ligne_data.tva_pct / 100).quantize(Decimal("0.01"))
-
-    if data.remise_globale_pct > 0:
-        total_ht *= (1 - data.remise_globale_pct / 100)
-        total_tva *= (1 - data.remise_globale_pct / 100)
-
-    facture.total_ht = total_ht.quantize(Decimal("0.01"))
-    facture.total_tva = total_tva.quantize(Decimal("0.01"))
-    facture.total_ttc = (total_ht + total_tva).quantize(Decimal("0.01"))
+    chiffrage.appliquer(facture)
 
     db.add(facture)
     await db.flush()
+    if facture.commande_id:
+        await lier_commandes(db, [(facture.id, facture.commande_id)])
+    await client_service.ajuster_encours(db, facture.client_id, facture.total_ttc)
     await db.refresh(facture, ["lignes"])
     return facture
 
 
+async def lier_commandes(db: AsyncSession, liens: list[tuple[int, int]]) -> None:
+    """Enregistre les commandes facturées, par couples (facture, commande)."""
+    await db.execute(insert(FactureCommande.__table__), [
+        {"facture_id": facture_id, "commande_id": commande_id} for facture_id, commande_id in liens
+    ])
+
+
 async def create_facture_from_commande(db: AsyncSession, commande: Commande, mode_reglement: str | None = None, date_echeance=None) -> Facture:
+    """Facture une commande expédiée ou livrée ; ValueError sinon (notamment si déjà facturée)."""
+    if commande.statut not in STATUTS_FACTURABLES:
+        raise ValueError("Seule une commande expédiée ou livrée peut être facturée")
     numero = await _next_numero(db)
     facture = Facture(
         numero=numero,
+        date_facture=datetime.now(timezone.utc),
         client_id=commande.client_id,
         commande_id=commande.id,
         vrp_id=commande.vrp_id,
@@ -127,6 +138,7 @@ async def create_facture_from_commande(db: AsyncSession, commande: Commande, mod
     for i, lc in enumerate(commande.lignes, 1):
         ligne = LigneFacture(
             ligne_numero=i,
+            date_facture=facture.date_facture,
             article_id=lc.article_id,
             designation=lc.designation,
             quantite=lc.quantite,
@@ -139,20 +151,92 @@ async def create_facture_from_commande(db: AsyncSession, commande: Commande, mod
         )
         facture.lignes.append(ligne)
 
+    await allocation_service.liberer(db, [commande.id])
     commande.statut = StatutCommande.FACTUREE
 
     db.add(facture)
     await db.flush()
+    await lier_commandes(db, [(facture.id, commande.id)])
+    await client_service.ajuster_encours(db, facture.client_id, facture.total_ttc)
     await db.refresh(facture, ["lignes"])
     return facture
 
 
-async def enregistrer_paiement(db: AsyncSession, facture: Facture, montant: Decimal) -> Facture:
-    facture.montant_regle += montant
-    if facture.montant_regle >= facture.total_ttc:
-        facture.statut = StatutFacture.PAYEE
-    else:
-        facture.statut = StatutFacture.PAYEE_PARTIELLEMENT
+def imputation():
+    """UPDATE d'imputation d'un règlement (paramètres ``facture_id`` et ``montant``).
+
+    Le montant est ajouté par la base et le statut calculé dans la même instruction :
+    deux paiements simultanés sur une facture ne peuvent pas s'écraser. Seule une
+    facture réglable est modifiée : une facture annulée ou soldée entre sa lecture et
+    le règlement n'est pas touchée (aucune ligne mise à jour).
+    """
+    table = Facture.__table__
+    regle = table.c.montant_regle + bindparam("montant", type_=table.c.montant_regle.type)
+    # Statuts en littéraux : une liste IN dépliée à l'exécution est refusée en executemany
+    reglables = [literal(statut, table.c.statut.type) for statut in STATUTS_REGLABLES]
+    return (
+        update(table)
+        .where(table.c.id == bindparam("facture_id"), table.c.statut.in_(reglables))
+        .values(
+            montant_regle=regle,
+            statut=case(
+                (regle >= table.c.total_ttc, literal(StatutFacture.PAYEE, table.c.statut.type)),
+                else_=literal(StatutFacture.PAYEE_PARTIELLEMENT, table.c.statut.type),
+            ),
+        )
+    )
+
+
+async def enregistrer_paiement(
+    db: AsyncSession,
+    facture: Facture,
+    montant: Decimal,
+    mode_reglement: str | None = None,
+    reference: str | None = None,
+    user_id: int | None = None,
+) -> Facture:
+    """Enregistre et impute un règlement ; ValueError si la facture n'est plus réglable."""
+    params = {"facture_id": facture.id, "montant": montant}
+    if (await db.execute(imputation(), params)).rowcount == 0:
+        raise ValueError("Facture non réglable")
+    db.add(Paiement(
+        facture_id=facture.id, montant=montant, mode_reglement=mode_reglement, reference=reference, user_id=user_id,
+    ))
+    await db.flush()
+    await db.execute(client_service.imputation_encours(), params)
+    await db.refresh(facture)
+    return facture
+
+
+async def annuler_facture(db: AsyncSession, facture: Facture) -> Facture:
+    facture.statut = StatutFacture.ANNULEE
     await db.flush()
+    await client_service.ajuster_encours(db, facture.client_id, facture.montant_regle - facture.total_ttc)
     await db.refresh(facture)
     return facture
+
+
+async def get_paiements(db: AsyncSession, facture: Facture) -> list[Paiement]:
+    if archive_service.est_archivee(facture):
+        return await archive_service.get_annexes_archivees(db, Facture, facture.id, Paiement)
+    result = await db.execute(
+        select(Paiement).where(Paiement.facture_id == facture.id).order_by(Paiement.date_paiement, Paiement.id)
+    )
+    return list(result.scalars().all())
+
+
+async def marquer_retards(db: AsyncSession, maintenant: datetime | None = None) -> list[int]:
+    """Passe en retard les factures émises ou envoyées dont l'échéance est dépassée ; renvoie leurs ids.
+
+    Une seule instruction UPDATE, lue par l'index partiel ``ix_factures_a_echoir`` : les
+    factures déjà passées en retard en sortent, chaque passage ne parcourt donc que
+    celles échues depuis le précédent.
+    """
+    table = Facture.__table__
+    result = await db.execute(
+        update(table)
+        .where(A_ECHOIR, table.c.date_echeance < (maintenant or datetime.now(timezone.utc)))
+        .values(statut=literal(StatutFacture.EN_RETARD, table.c.statut.type))
+        .returning(table.c.id)
+    )
+    return sorted(result.scalars())
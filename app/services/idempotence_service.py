@@ -0,0 +1,48 @@
+"""Stockage des clés d'idempotence (en-tête Idempotency-Key).
+
+La clé est réservée dans la transaction de la requête : elle n'est visible des
+autres requêtes qu'avec la pièce créée, et disparaît avec elle en cas d'erreur.
+Une requête concurrente portant la même clé attend la fin de la première (index
+unique), puis rejoue sa réponse.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.idempotence import CleIdempotence
+
+
+def _expiration() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCE_TTL_HEURES)
+
+
+async def get_cle(db: AsyncSession, user_id: int, cle: str) -> CleIdempotence | None:
+    result = await db.execute(select(CleIdempotence).where(
+        CleIdempotence.user_id == user_id,
+        CleIdempotence.cle == cle,
+        CleIdempotence.created_at >= _expiration(),
+    ))
+    return result.scalar_one_or_none()
+
+
+async def reserver_cle(
+    db: AsyncSession, user_id: int, cle: str, methode: str, chemin: str, empreinte: str
+) -> CleIdempotence | None:
+    """Enregistre la clé pour la requête en cours ; None si une autre requête l'a déjà prise."""
+    await db.execute(delete(CleIdempotence).where(CleIdempotence.created_at < _expiration()))
+    entree = CleIdempotence(cle=cle, user_id=user_id, methode=methode, chemin=chemin, empreinte=empreinte)
+    try:
+        async with db.begin_nested():
+            db.add(entree)
+    except IntegrityError:
+        return None
+    return entree
+
+
+async def enregistrer_reponse(db: AsyncSession, entree: CleIdempotence, status_code: int, reponse) -> None:
+    entree.status_code = status_code
+    entree.reponse = reponse
+    await db.flush()
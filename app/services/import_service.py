@@ -0,0 +1,362 @@
+"""Import de commandes par fichier (EDI des grands comptes, CSV, JSON lines).
+
+Formats reconnus :
+- CSV (séparateur ``;``, ``,`` ou tabulation), une ligne de fichier par ligne de
+  commande ; les lignes consécutives de même code client et même référence de
+  commande forment une commande ;
+- JSON lines, une commande par ligne (schéma ``CommandeImport``).
+
+Le fichier est lu au fil de l'eau et traité par lots de ``LOT`` commandes :
+codes clients et références articles sont résolus en une requête par lot, les
+lignes sans prix sont tarifées comme à la saisie (``tarif_service``), puis
+commandes et lignes sont insérées en masse et le lot est validé.
+
+Une commande dont une ligne est invalide est rejetée en entier, avec le numéro
+de la ligne fautive dans le fichier. Une commande déjà importée (même client,
+même référence de commande) est ignorée : un fichier peut être rechargé. Les
+commandes sont créées en brouillon ; l'encours est contrôlé à leur validation.
+"""
+import csv
+import io
+import itertools
+import json
+import unicodedata
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import BinaryIO
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.article import Article
+from app.models.client import Client
+from app.models.commande import Commande, LigneCommande, StatutCommande
+from app.schemas.commande import CommandeImport, ErreurImport, ImportCommandesRead, LigneCommandeCreate, LigneImport
+from app.services import numerotation_service, tarif_service
+from app.utils.chiffrage import chiffrer
+
+LOT = 500
+# Octets lus pour reconnaître l'encodage d'un fichier
+BLOC_ENCODAGE = 65536
+
+# En-têtes CSV reconnus (minuscules, sans accents)
+COLONNES = {
+    "code_client": ("code client", "client"),
+    "reference_client": ("reference client", "commande", "numero commande", "ref commande", "bon de commande"),
+    "reference": ("reference", "reference article", "article", "ref article"),
+    "quantite": ("quantite", "qte", "qty"),
+    "prix_unitaire_ht": ("prix unitaire ht", "prix unitaire", "pu ht", "prix ht", "prix"),
+    "remise_pct": ("remise", "remise pct", "remise %"),
+    "taille": ("taille",),
+    "couleur": ("couleur", "coloris"),
+    "date_livraison_souhaitee": ("date livraison souhaitee", "date livraison", "livraison"),
+    "notes": ("notes", "commentaire"),
+    "adresse_livraison": ("adresse livraison", "adresse"),
+    "cp_livraison": ("cp livraison", "code postal", "cp"),
+    "ville_livraison": ("ville livraison", "ville"),
+    "remise_globale_pct": ("remise globale", "remise globale pct"),
+}
+CHAMPS_LIGNE = ("reference", "quantite", "prix_unitaire_ht", "remise_pct", "taille", "couleur")
+DECIMAUX = ("prix_unitaire_ht", "remise_pct", "remise_globale_pct")
+
+
+@dataclass
+class PieceImport:
+    ligne: int
+    reference_client: str | None
+    commande: CommandeImport | None = None
+    lignes: list[int] = field(default_factory=list)  # ligne du fichier de chaque ligne de commande
+    erreurs: list[ErreurImport] = field(default_factory=list)
+
+    def rejeter(self, motif: str, ligne: int | None = None) -> None:
+        self.erreurs.append(
+            ErreurImport(ligne=ligne or self.ligne, reference_client=self.reference_client, motif=motif)
+        )
+
+
+# --- Lecture -------------------------------------------------------------------------
+
+def ouvrir(fichier: BinaryIO) -> io.TextIOWrapper:
+    """Ouvre un fichier binaire en texte : UTF-8 (BOM toléré), à défaut Windows-1252."""
+    debut = fichier.read(BLOC_ENCODAGE)
+    fichier.seek(0)
+    try:
+        debut.decode("utf-8")
+        encodage = "utf-8-sig"
+    except UnicodeDecodeError as exc:
+        # Caractère coupé par la fin du bloc lu (le fichier continue au-delà) : le fichier reste de l'UTF-8
+        coupe = len(debut) == BLOC_ENCODAGE and exc.start >= len(debut) - 3
+        encodage = "utf-8-sig" if coupe else "cp1252"
+    return io.TextIOWrapper(fichier, encoding=encodage, newline="")
+
+
+def _normaliser(texte: str) -> str:
+    texte = unicodedata.normalize("NFKD", texte).encode("ascii", "ignore").decode()
+    return " ".join(texte.lower().replace("_", " ").split())
+
+
+def _motif(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc']))} : {e['msg']}" for e in exc.errors())
+
+
+def _date(texte: str) -> datetime | str:
+    for fmt in ("%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(texte[:10], fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    return texte  # ISO 8601 : lu par le schéma
+
+
+def _valider(piece: PieceImport, entete: dict, lignes: list[LigneImport]) -> PieceImport:
+    if not piece.erreurs:
+        try:
+            piece.commande = CommandeImport.model_validate({**entete, "lignes": lignes})
+        except ValidationError as exc:
+            piece.rejeter(_motif(exc))
+    return piece
+
+
+def _lire_csv(lignes: Iterable[str], decalage: int) -> Iterator[PieceImport]:
+    lignes = iter(lignes)
+    entete = next(lignes)
+    dialect = csv.Sniffer().sniff(entete, delimiters=";,\t")
+    reader = csv.reader(itertools.chain([entete], lignes), dialect)
+    header = [_normaliser(h) for h in next(reader)]
+    index = {}
+    for champ, noms in COLONNES.items():
+        index[champ] = next((i for i, h in enumerate(header) if h in noms), None)
+    manquantes = [c for c in ("code_client", "reference", "quantite") if index[c] is None]
+    if manquantes:
+        raise ValueError(f"colonne(s) introuvable(s) : {', '.join(manquantes)}")
+
+    piece, cle, entete_piece, lignes_piece = None, None, {}, []
+    for values in reader:
+        numero = reader.line_num + decalage
+        if not any(v.strip() for v in values):
+            continue
+        valeurs = {
+            champ: values[i].strip() for champ, i in index.items()
+            if i is not None and i < len(values) and values[i].strip()
+        }
+        for champ in DECIMAUX:
+            if champ in valeurs:
+                valeurs[champ] = valeurs[champ].replace(",", ".")
+        if "date_livraison_souhaitee" in valeurs:
+            valeurs["date_livraison_souhaitee"] = _date(valeurs["date_livraison_souhaitee"])
+
+        if piece is None or (valeurs.get("code_client"), valeurs.get("reference_client")) != cle:
+            if piece is not None:
+                yield _valider(piece, entete_piece, lignes_piece)
+            cle = (valeurs.get("code_client"), valeurs.get("reference_client"))
+            piece = PieceImport(numero, valeurs.get("reference_client"))
+            entete_piece = {c: v for c, v in valeurs.items() if c not in CHAMPS_LIGNE}
+            lignes_piece = []
+        try:
+            lignes_piece.append(LigneImport.model_validate({c: valeurs[c] for c in CHAMPS_LIGNE if c in valeurs}))
+            piece.lignes.append(numero)
+        except ValidationError as exc:
+            piece.rejeter(_motif(exc), numero)
+    if piece is not None:
+        yield _valider(piece, entete_piece, lignes_piece)
+
+
+def _lire_jsonl(lignes: Iterable[tuple[int, str]]) -> Iterator[PieceImport]:
+    for numero, texte in lignes:
+        if not texte.strip():
+            continue
+        try:
+            donnees = json.loads(texte)
+        except json.JSONDecodeError as exc:
+            piece = PieceImport(numero, None)
+            piece.rejeter(f"JSON invalide : {exc.msg}")
+            yield piece
+            continue
+        reference = donnees.get("reference_client") if isinstance(donnees, dict) else None
+        piece = PieceImport(numero, reference if isinstance(reference, str) else None)
+        try:
+            piece.commande = CommandeImport.model_validate(donnees)
+            piece.lignes = [numero] * len(piece.commande.lignes)
+        except ValidationError as exc:
+            piece.rejeter(_motif(exc))
+        yield piece
+
+
+def lire_commandes(lignes: Iterable[str]) -> Iterator[PieceImport]:
+    """Commandes d'un fichier CSV ou JSON lines, au fil de la lecture.
+
+    ValueError si le fichier est illisible (en-tête CSV incomplet, CSV mal formé).
+    """
+    numerotees = enumerate(lignes, 1)
+    numero, premiere = next(((n, texte) for n, texte in numerotees if texte.strip()), (None, None))
+    if premiere is None:
+        return
+    if premiere.lstrip().startswith("{"):
+        yield from _lire_jsonl(itertools.chain([(numero, premiere)], numerotees))
+        return
+    try:
+        yield from _lire_csv(itertools.chain([premiere], (texte for _, texte in numerotees)), numero - 1)
+    except csv.Error as exc:
+        raise ValueError(f"CSV invalide : {exc}") from None
+
+
+# --- Import --------------------------------------------------------------------------
+
+async def _importer_lot(
+    db: AsyncSession, pieces: list[PieceImport], deja: set, simulation: bool
+) -> tuple[int, list[str]]:
+    """Renvoie (commandes retenues, numéros attribués) ; les rejets sont notés sur les pièces."""
+    valides = [p for p in pieces if p.commande]
+    if not valides:
+        return 0, []
+    codes = {p.commande.code_client for p in valides}
+    result = await db.execute(
+        select(
+            Client.id, Client.code_client, Client.type_client, Client.vrp_id, Client.actif,
+            Client.adresse, Client.code_postal, Client.ville, Client.pays,
+        ).where(Client.code_client.in_(codes))
+    )
+    clients = {c.code_client: c for c in result.all()}
+    references = {ligne.reference for p in valides for ligne in p.commande.lignes}
+    result = await db.execute(select(Article.reference, Article.id).where(Article.reference.in_(references)))
+    articles = dict(result.all())
+    refs_commande = {p.commande.reference_client for p in valides if p.commande.reference_client}
+    if refs_commande:
+        result = await db.execute(
+            select(Commande.client_id, Commande.reference_client).where(
+                Commande.client_id.in_([c.id for c in clients.values()]),
+                Commande.reference_client.in_(refs_commande),
+            )
+        )
+        deja.update(tuple(row) for row in result.all())
+
+    retenues = []
+    for piece in valides:
+        commande = piece.commande
+        client = clients.get(commande.code_client)
+        if client is None or not client.actif:
+            piece.rejeter(f"Client {'inconnu' if client is None else 'inactif'} : {commande.code_client}")
+            continue
+        inconnues = [
+            (n, ligne.reference) for n, ligne in zip(piece.lignes, commande.lignes, strict=True)
+            if ligne.reference not in articles
+        ]
+        for numero, reference in inconnues:
+            piece.rejeter(f"Article inconnu : {reference}", numero)
+        if inconnues:
+            continue
+        if commande.reference_client:
+            if (client.id, commande.reference_client) in deja:
+                piece.rejeter("Commande déjà importée")
+                continue
+            deja.add((client.id, commande.reference_client))
+        retenues.append((piece.commande, client))
+    if simulation or not retenues:
+        return len(retenues), []
+
+    par_type = defaultdict(set)
+    for commande, client in retenues:
+        par_type[client.type_client or tarif_service.TYPE_CLIENT_DEFAUT].update(
+            articles[ligne.reference] for ligne in commande.lignes
+        )
+    prix = {t: await tarif_service.resoudre(db, ids, t) for t, ids in par_type.items()}
+
+    numeros = await numerotation_service.numeros(db, Commande, "CMD", len(retenues))
+    commandes, lignes_commandes = [], []
+    for rang, (commande, client) in enumerate(retenues):
+        tarifs = prix[client.type_client or tarif_service.TYPE_CLIENT_DEFAUT]
+        lignes = []
+        for ligne in commande.lignes:
+            resolu = tarifs[articles[ligne.reference]]
+            # Prix imposé par le fichier : sa remise seule ; sinon celle du tarif
+            remise = ligne.remise_pct
+            if remise is None:
+                remise = resolu.remise_pct if ligne.prix_unitaire_ht is None else Decimal("0")
+            lignes.append(LigneCommandeCreate(
+                article_id=resolu.article_id,
+                designation=resolu.designation,
+                quantite=ligne.quantite,
+                prix_unitaire_ht=(
+                    ligne.prix_unitaire_ht if ligne.prix_unitaire_ht is not None else resolu.prix_unitaire_ht
+                ),
+                remise_pct=remise,
+                tva_pct=resolu.tva_pct,
+                taille=ligne.taille,
+                couleur=ligne.couleur,
+            ))
+        chiffrage = chiffrer(lignes, commande.remise_globale_pct)
+        livraison = (commande.adresse_livraison, commande.cp_livraison, commande.ville_livraison)
+        if not any(livraison):
+            livraison = (client.adresse, client.code_postal, client.ville)
+        commandes.append({
+            "numero": numeros[rang],
+            "client_id": client.id,
+            "vrp_id": client.vrp_id,
+            "statut": StatutCommande.BROUILLON,
+            "date_livraison_souhaitee": commande.date_livraison_souhaitee,
+            "reference_client": commande.reference_client,
+            "notes": commande.notes,
+            "adresse_livraison": livraison[0],
+            "cp_livraison": livraison[1],
+            "ville_livraison": livraison[2],
+            "pays_livraison": client.pays or "France",
+            "remise_globale_pct": commande.remise_globale_pct,
+            "total_ht": chiffrage.total_ht,
+            "total_tva": chiffrage.total_tva,
+            "total_ttc": chiffrage.total_ttc,
+        })
+        lignes_commandes.append([
+            {
+                **ligne.model_dump(include={
+                    "article_id", "designation", "quantite", "prix_unitaire_ht", "remise_pct", "tva_pct",
+                    "taille", "couleur",
+                }),
+                "ligne_numero": numero,
+                "montant_ht": montant_ht,
+            }
+            for numero, (ligne, montant_ht) in enumerate(zip(lignes, chiffrage.montants_ht, strict=True), 1)
+        ])
+
+    table = Commande.__table__
+    result = await db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), commandes)
+    await db.execute(insert(LigneCommande.__table__), [
+        {**ligne, "commande_id": commande_id}
+        for commande_id, lignes in zip(result.scalars().all(), lignes_commandes, strict=True)
+        for ligne in lignes
+    ])
+    return len(retenues), [c["numero"] for c in commandes]
+
+
+async def importer(
+    db: AsyncSession, lignes: Iterable[str], simulation: bool = False, taille: int = LOT
+) -> ImportCommandesRead:
+    """Importe les commandes d'un fichier ; chaque lot est validé (commit) dès qu'il est inséré.
+
+    En simulation, le fichier est entièrement contrôlé sans rien enregistrer.
+    """
+    pieces = lire_commandes(lignes)
+    lues = retenues = 0
+    numeros: list[str] = []
+    erreurs: list[ErreurImport] = []
+    deja: set[tuple[int, str]] = set()
+    while lot := list(itertools.islice(pieces, taille)):
+        nombre, numeros_lot = await _importer_lot(db, lot, deja, simulation)
+        if numeros_lot:
+            await db.commit()
+        lues += len(lot)
+        retenues += nombre
+        numeros += numeros_lot
+        erreurs += [erreur for piece in lot for erreur in piece.erreurs]
+    return ImportCommandesRead(
+        simulation=simulation,
+        lues=lues,
+        commandes=retenues,
+        rejetees=lues - retenues,
+        premier_numero=numeros[0] if numeros else None,
+        dernier_numero=numeros[-1] if numeros else None,
+        erreurs=erreurs,
+    )
@@ -1,3 +1,7 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -5,12 +9,21 @@ from sqlalchemy.orm import selectinload
 from app.models.commande import Commande, StatutCommande
 from app.models.livraison import BonLivraison, LigneBonLivraison, StatutLivraison
 from app.schemas.livraison import BonLivraisonCreate
+from app.services import (
+    allocation_service, archive_service, disponibilite_service, numerotation_service, stock_service,
+)
+from app.services.disponibilite_service import BL_EN_COURS, STATUTS_OUVERTS
+
+
+@dataclass
+class Expedition:
+    bls: list[str] = field(default_factory=list)
+    mouvements: list[str] = field(default_factory=list)
+    quantite: int = 0
 
 
 async def _next_numero(db: AsyncSession) -> str:
-    result = await db.execute(select(func.count(BonLivraison.id)))
-    count = (result.scalar() or 0) + 1
-    return f"BL-{count:06d}"
+    return await numerotation_service.numero(db, BonLivraison, "BL")
 
 
 async def get_bons_livraison(
@@ -42,7 +55,10 @@ async def get_bons_livraison(
 async def get_bon_livraison(db: AsyncSession, bl_id: int) -> BonLivraison | None:
     query = select(BonLivraison).where(BonLivraison.id == bl_id).options(selectinload(BonLivraison.lignes))
     result = await db.execute(query)
-    return result.scalar_one_or_none()
+    bl = result.scalar_one_or_none()
+    if bl is None:
+        bl = await archive_service.get_archive(db, BonLivraison, bl_id)
+    return bl
 
 
 async def create_bon_livraison(db: AsyncSession, data: BonLivraisonCreate) -> BonLivraison:
@@ -76,11 +92,34 @@ async def create_bon_livraison(db: AsyncSession, data: BonLivraisonCreate) -> Bo
 
     db.add(bl)
     await db.flush()
+    await _reserver(db, bl, 1)
     await db.refresh(bl, ["lignes"])
     return bl
 
 
+async def _reserver(db: AsyncSession, bl: BonLivraison, sens: int) -> None:
+    """Réserve (sens 1) ou rend (sens -1) au registre du stock les quantités du BL."""
+    await disponibilite_service.appliquer(db, [
+        (disponibilite_service.cle(ligne.article_id, ligne.taille, ligne.couleur), 0, sens * ligne.quantite)
+        for ligne in bl.lignes
+    ])
+
+
 async def create_bl_from_commande(db: AsyncSession, commande: Commande, transport_id: int | None = None) -> BonLivraison:
+    """Expédie le reliquat de chaque ligne dans la limite de son stock alloué et du stock libre.
+
+    Ce qui ne peut partir reste en reliquat (commande expédiée partiellement).
+    ValueError si la commande n'est pas validée et ouverte, si rien n'est à livrer
+    ou si aucun stock n'est disponible.
+    """
+    if commande.statut not in STATUTS_OUVERTS:
+        raise ValueError("Commande non livrable")
+    a_livrer = [lc for lc in commande.lignes if lc.quantite > lc.quantite_livree]
+    if not a_livrer:
+        raise ValueError("Commande entièrement livrée")
+    cles = {lc.id: disponibilite_service.cle(lc.article_id, lc.taille, lc.couleur) for lc in a_livrer}
+    libre = await disponibilite_service.stock_libre(db, cles.values(), verrouiller=True)
+
     numero = await _next_numero(db)
     bl = BonLivraison(
         numero=numero,
@@ -94,31 +133,143 @@ async def create_bl_from_commande(db: AsyncSession, commande: Commande, transpor
         pays_livraison=commande.pays_livraison,
     )
 
-    for i, lc in enumerate(commande.lignes, 1):
-        quantite_restante = lc.quantite - lc.quantite_livree
-        if quantite_restante <= 0:
+    # Le stock alloué passe sur le BL : seul le complément pris au stock libre s'ajoute au réservé
+    reservations = []
+    for lc in a_livrer:
+        cle = cles[lc.id]
+        quantite = min(lc.quantite - lc.quantite_livree, lc.quantite_allouee + max(libre[cle], 0))
+        if quantite <= 0:
             continue
+        depuis_allocation = min(lc.quantite_allouee, quantite)
+        libre[cle] -= quantite - depuis_allocation
+        reservations.append((cle, 0, quantite - depuis_allocation))
+        lc.quantite_allouee -= depuis_allocation
+        lc.quantite_livree += quantite
         ligne = LigneBonLivraison(
-            ligne_numero=i,
+            ligne_numero=len(bl.lignes) + 1,
             article_id=lc.article_id,
             designation=lc.designation,
-            quantite=quantite_restante,
+            quantite=quantite,
             taille=lc.taille,
             couleur=lc.couleur,
         )
         bl.lignes.append(ligne)
-        lc.quantite_livree = lc.quantite
+    if not bl.lignes:
+        raise ValueError("Aucun stock disponible pour cette commande")
 
-    commande.statut = StatutCommande.EXPEDIEE
+    complete = all(lc.quantite_livree >= lc.quantite for lc in commande.lignes)
+    commande.statut = StatutCommande.EXPEDIEE if complete else StatutCommande.EXPEDIEE_PARTIELLEMENT
 
     db.add(bl)
     await db.flush()
+    await disponibilite_service.appliquer(db, reservations)
     await db.refresh(bl, ["lignes"])
     return bl
 
 
-async def changer_statut(db: AsyncSession, bl: BonLivraison, statut: StatutLivraison) -> BonLivraison:
+async def get_bons_a_expedier(
+    db: AsyncSession, bl_ids: list[int] | None = None, jour: date | None = None
+) -> list[BonLivraison]:
+    """BL en préparation désignés par identifiant et/ou jour du BL, verrouillés pour la transaction."""
+    query = (
+        select(BonLivraison)
+        .where(BonLivraison.statut.in_(BL_EN_COURS))
+        .options(selectinload(BonLivraison.lignes))
+        .order_by(BonLivraison.id)
+        .with_for_update(of=BonLivraison)
+    )
+    if bl_ids:
+        query = query.where(BonLivraison.id.in_(bl_ids))
+    if jour:
+        debut = datetime.combine(jour, time.min, timezone.utc)
+        query = query.where(BonLivraison.date_bl >= debut, BonLivraison.date_bl < debut + timedelta(days=1))
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def expedier(
+    db: AsyncSession,
+    bls: list[BonLivraison],
+    statut: StatutLivraison = StatutLivraison.EXPEDIEE,
+    user_id: int | None = None,
+) -> Expedition:
+    """Expédie des BL en préparation : une sortie de stock par BL, dans la même transaction.
+
+    Les sorties sont enregistrées en masse (voir stock_service.sortir_en_masse) ;
+    les quantités quittent le stock physique et le stock réservé du registre.
+    """
+    bls = [bl for bl in bls if bl.statut in BL_EN_COURS]
+    if not bls:
+        return Expedition()
+    mouvements = await stock_service.sortir_en_masse(
+        db, [(bl.numero, bl.lignes) for bl in bls], user_id, depuis_reserve=True
+    )
+    maintenant = datetime.now(timezone.utc)
+    for bl in bls:
+        bl.statut = statut
+        bl.date_expedition = bl.date_expedition or maintenant
+    await db.flush()
+    return Expedition(
+        bls=[bl.numero for bl in bls],
+        mouvements=mouvements,
+        quantite=sum(ligne.quantite for bl in bls for ligne in bl.lignes),
+    )
+
+
+async def _rendre_a_la_commande(db: AsyncSession, bl: BonLivraison) -> None:
+    """Remet en reliquat sur sa commande les quantités d'un BL non expédié et refait le statut de la commande."""
+    if bl.commande_id is None:
+        return
+    result = await db.execute(
+        select(Commande).where(Commande.id == bl.commande_id).options(selectinload(Commande.lignes))
+    )
+    commande = result.scalar_one_or_none()
+    if commande is None:
+        return
+    a_rendre = defaultdict(int)
+    for ligne in bl.lignes:
+        a_rendre[disponibilite_service.cle(ligne.article_id, ligne.taille, ligne.couleur)] += ligne.quantite
+    # Les dernières lignes de la commande d'abord, dans la limite de leur quantité livrée
+    for lc in sorted(commande.lignes, key=lambda lc: lc.ligne_numero, reverse=True):
+        cle = disponibilite_service.cle(lc.article_id, lc.taille, lc.couleur)
+        quantite = min(a_rendre[cle], lc.quantite_livree)
+        lc.quantite_livree -= quantite
+        a_rendre[cle] -= quantite
+    if commande.statut in (StatutCommande.EXPEDIEE, StatutCommande.EXPEDIEE_PARTIELLEMENT):
+        if all(lc.quantite_livree >= lc.quantite for lc in commande.lignes):
+            commande.statut = StatutCommande.EXPEDIEE
+        elif any(lc.quantite_livree for lc in commande.lignes):
+            commande.statut = StatutCommande.EXPEDIEE_PARTIELLEMENT
+        else:
+            commande.statut = StatutCommande.VALIDEE
+
+
+async def changer_statut(
+    db: AsyncSession, bl: BonLivraison, statut: StatutLivraison, user_id: int | None = None
+) -> BonLivraison:
+    """Change le statut du BL.
+
+    Un BL en préparation expédié ou livré sort son stock (voir ``expedier``) ;
+    annulé, il libère son stock réservé et ses quantités redeviennent un reliquat
+    de la commande, servi aussitôt par le stock libre.
+    """
+    expedie = statut in (StatutLivraison.EXPEDIEE, StatutLivraison.LIVREE)
+    annule = bl.statut in BL_EN_COURS and statut not in BL_EN_COURS and not expedie
+    if bl.statut in BL_EN_COURS and expedie:
+        await expedier(db, [bl], statut, user_id)
+    elif annule:
+        await _reserver(db, bl, -1)
+        await _rendre_a_la_commande(db, bl)
     bl.statut = statut
     await db.flush()
+    if annule:
+        await allocation_service.allouer(db, {ligne.article_id for ligne in bl.lignes})
     await db.refresh(bl)
     return bl
+
+
+async def annuler(db: AsyncSession, bl: BonLivraison, user_id: int | None = None) -> BonLivraison:
+    """Annule un BL pas encore expédié (ValueError sinon)."""
+    if bl.statut not in BL_EN_COURS:
+        raise ValueError("BL non annulable")
+    return await changer_statut(db, bl, StatutLivraison.ANNULEE, user_id)
@@ -0,0 +1,73 @@
+"""Numérotation des pièces (commandes, factures, BL, mouvements, inventaires).
+
+Un compteur par type de pièce dans la table ``compteurs``. Réserver des numéros
+incrémente le compteur en une instruction (``UPDATE ... RETURNING``), qui
+verrouille sa ligne jusqu'à la fin de la transaction : deux transactions
+simultanées n'obtiennent jamais le même numéro, et un bloc de numéros (import,
+facturation en masse) est réservé d'un coup.
+
+Un compteur absent est créé au premier usage à partir du nombre de pièces
+existantes, archives comprises, ce qui prolonge la numérotation antérieure.
+
+L'unicité des numéros ne repose pas sur la seule contrainte de la table : une
+fois ``factures`` partitionnée, PostgreSQL n'y garantit que ``(numero,
+date_facture)``, et les archives ont leur propre index. ``numeros`` écarte donc
+les numéros réservés déjà portés par une pièce, courante ou archivée (pièces
+reprises de l'ancien logiciel, compteur recalculé), et en réserve d'autres.
+"""
+from sqlalchemy import delete, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.compteur import Compteur
+from app.services import archive_service
+
+
+async def _incrementer(db: AsyncSession, piece: str, nombre: int) -> int | None:
+    table = Compteur.__table__
+    result = await db.execute(
+        update(table).where(table.c.piece == piece).values(valeur=table.c.valeur + nombre).returning(table.c.valeur)
+    )
+    return result.scalar()
+
+
+async def reserver(db: AsyncSession, modele: type, nombre: int = 1) -> int:
+    """Réserve ``nombre`` numéros consécutifs pour les pièces de ``modele`` ; renvoie le premier."""
+    piece = modele.__tablename__
+    valeur = await _incrementer(db, piece, nombre)
+    if valeur is None:
+        dialecte = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        depart = await archive_service.compter_pieces(db, modele)
+        stmt = dialecte.insert(Compteur.__table__).values(piece=piece, valeur=depart)
+        await db.execute(stmt.on_conflict_do_nothing())
+        valeur = await _incrementer(db, piece, nombre)
+    return valeur - nombre + 1
+
+
+async def _existants(db: AsyncSession, modele: type, candidats: list[str]) -> set[str]:
+    tables = [modele.__table__]
+    if modele in archive_service.PAR_MODELE:
+        tables.append(archive_service.PAR_MODELE[modele].archive.__table__)
+    requete = union_all(*[select(t.c.numero).where(t.c.numero.in_(candidats)) for t in tables])
+    return set((await db.execute(requete)).scalars())
+
+
+async def numeros(db: AsyncSession, modele: type, prefixe: str, nombre: int = 1) -> list[str]:
+    """Réserve ``nombre`` numéros libres (absents des pièces et des archives), dans l'ordre."""
+    libres = []
+    while len(libres) < nombre:
+        manque = nombre - len(libres)
+        premier = await reserver(db, modele, manque)
+        candidats = [f"{prefixe}-{premier + rang:06d}" for rang in range(manque)]
+        pris = await _existants(db, modele, candidats)
+        libres += [n for n in candidats if n not in pris]
+    return libres
+
+
+async def numero(db: AsyncSession, modele: type, prefixe: str) -> str:
+    return (await numeros(db, modele, prefixe))[0]
+
+
+async def reinitialiser(db: AsyncSession) -> None:
+    """Supprime les compteurs, recalculés au prochain numéro (après un chargement direct des pièces)."""
+    await db.execute(delete(Compteur.__table__))
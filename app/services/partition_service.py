@@ -0,0 +1,173 @@
+"""Partitionnement annuel (PostgreSQL) des factures et des mouvements de stock.
+
+Les tables ``factures``, ``lignes_facture``, ``mouvements_stock`` et
+``lignes_mouvement_stock`` peuvent être partitionnées par année (RANGE sur la
+date de la pièce, recopiée sur les lignes). Chaque année a sa partition
+(``factures_2025``...) et une partition ``_defaut`` reçoit les lignes hors des
+années créées, en attendant leur partition.
+
+Contraintes imposées par PostgreSQL sur une table partitionnée :
+- clés primaires et unicités incluent la date (``(id, date_facture)``,
+  ``(numero, date_facture)``) ;
+- les lignes référencent leur pièce par ``(id, date)`` ;
+- les autres clés étrangères vers ces tables (ex. interventions.facture_id,
+  paiements.facture_id)
+  sont supprimées.
+
+Les fonctions prennent une connexion synchrone : elles servent à la migration
+Alembic et, via ``run_sync``, au démarrage de l'application.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import Connection, Index, MetaData, Table, text
+from sqlalchemy.schema import AddConstraint, CreateIndex, UniqueConstraint
+
+from app.database import Base
+
+# Table -> colonne de partitionnement ; les pièces avant leurs lignes.
+TABLES = {
+    "factures": "date_facture",
+    "lignes_facture": "date_facture",
+    "mouvements_stock": "date_mouvement",
+    "lignes_mouvement_stock": "date_mouvement",
+}
+# Lignes -> (pièce, clé étrangère vers la pièce)
+LIGNES = {
+    "lignes_facture": ("factures", "facture_id"),
+    "lignes_mouvement_stock": ("mouvements_stock", "mouvement_id"),
+}
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).scalar())
+
+
+def _bornes(annee: int) -> str:
+    return f"FROM ('{annee}-01-01 00:00:00+00') TO ('{annee + 1}-01-01 00:00:00+00')"
+
+
+def create_partition(conn: Connection, table: str, annee: int) -> bool:
+    """Crée la partition d'une année si elle n'existe pas ; renvoie True si elle a été créée.
+
+    Les lignes de l'année déjà tombées dans la partition par défaut y sont déplacées.
+    """
+    partition = f"{table}_{annee}"
+    if conn.execute(text("SELECT to_regclass(:p)"), {"p": partition}).scalar():
+        return False
+    column = TABLES[table]
+    conn.execute(text(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)"))
+    if conn.execute(text("SELECT to_regclass(:p)"), {"p": f"{table}_defaut"}).scalar():
+        debut = datetime(annee, 1, 1, tzinfo=timezone.utc)
+        conn.execute(text(
+            f"WITH deplacees AS (DELETE FROM {table}_defaut WHERE {column} >= :debut AND {column} < :fin RETURNING *) "
+            f"INSERT INTO {partition} SELECT * FROM deplacees"
+        ), {"debut": debut, "fin": debut.replace(year=annee + 1)})
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES {_bornes(annee)}"))
+    return True
+
+
+def ensure_partitions(conn: Connection, annee: int | None = None) -> list[str]:
+    """Garantit les partitions de l'année en cours et de la suivante (appelée au démarrage)."""
+    annee = annee or datetime.now(timezone.utc).year
+    created = []
+    for table in TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        for year in (annee, annee + 1):
+            if create_partition(conn, table, year):
+                created.append(f"{table}_{year}")
+    return created
+
+
+# --- Conversion ---------------------------------------------------------------------
+
+def _years(conn: Connection, table: str, column: str) -> range:
+    bornes = conn.execute(text(
+        f"SELECT min(extract(year FROM {column} AT TIME ZONE 'UTC')), "
+        f"max(extract(year FROM {column} AT TIME ZONE 'UTC')) FROM {table}"
+    )).one()
+    courante = datetime.now(timezone.utc).year
+    debut = int(bornes[0]) if bornes[0] is not None else courante
+    fin = max(int(bornes[1]) if bornes[1] is not None else courante, courante)
+    return range(debut, fin + 2)
+
+
+def _create_keys(conn: Connection, table: Table, key: str | None) -> None:
+    """Recrée clé primaire, unicités et index du modèle ; la clé de partitionnement y est ajoutée."""
+    def with_key(columns: list[str]) -> list[str]:
+        return columns + [key] if key and key not in columns else columns
+
+    conn.execute(text(f"ALTER TABLE {table.name} ADD PRIMARY KEY ({', '.join(with_key(['id']))})"))
+    copy = table.to_metadata(MetaData())
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns = with_key([c.name for c in constraint.columns])
+            conn.execute(AddConstraint(UniqueConstraint(*[copy.c[c] for c in columns], name=constraint.name)))
+    for index in table.indexes:
+        columns = [c.name for c in index.columns]
+        if index.unique:
+            columns = with_key(columns)
+        conn.execute(CreateIndex(Index(
+            index.name, *[copy.c[c] for c in columns], unique=index.unique, **index.dialect_kwargs
+        )))
+
+
+def _create_foreign_keys(conn: Connection, partitioned: bool) -> None:
+    """Recrée les clés étrangères portées par les tables converties ou pointant vers elles."""
+    for table in Base.metadata.sorted_tables:
+        for fk in table.foreign_key_constraints:
+            referred = fk.referred_table.name
+            if table.name not in TABLES and referred not in TABLES:
+                continue
+            columns = [c.name for c in fk.columns]
+            targets = [e.column.name for e in fk.elements]
+            if partitioned and referred in TABLES:
+                if LIGNES.get(table.name, (None, None))[1] != columns[0]:
+                    continue  # une table partitionnée ne peut être référencée que par sa clé complète
+                columns, targets = columns + [TABLES[table.name]], targets + [TABLES[referred]]
+            ondelete = f" ON DELETE {fk.ondelete}" if fk.ondelete else ""
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ADD FOREIGN KEY ({', '.join(columns)}) "
+                f"REFERENCES {referred} ({', '.join(targets)}){ondelete}"
+            ))
+
+
+def _rebuild(conn: Connection, table: Table, key: str | None) -> None:
+    name = table.name
+    sequence = f"{name}_id_seq"
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    conn.execute(text(f"ALTER TABLE {name} RENAME TO {name}_ancienne"))
+    partition_by = f" PARTITION BY RANGE ({key})" if key else ""
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {name}_ancienne INCLUDING DEFAULTS){partition_by}"))
+    if key:
+        conn.execute(text(f"ALTER TABLE {name} ALTER COLUMN {key} SET NOT NULL"))
+        conn.execute(text(f"CREATE TABLE {name}_defaut PARTITION OF {name} DEFAULT"))
+        for annee in _years(conn, f"{name}_ancienne", key):
+            conn.execute(text(f"CREATE TABLE {name}_{annee} PARTITION OF {name} FOR VALUES {_bornes(annee)}"))
+    conn.execute(text(f"INSERT INTO {name} SELECT * FROM {name}_ancienne"))
+    conn.execute(text(f"DROP TABLE {name}_ancienne CASCADE"))
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+    _create_keys(conn, table, key)
+
+
+def partition_tables(conn: Connection) -> None:
+    """Convertit les quatre tables en tables partitionnées par année (données conservées)."""
+    for lignes, (piece, fk) in LIGNES.items():
+        key = TABLES[lignes]
+        conn.execute(text(
+            f"UPDATE {lignes} l SET {key} = p.{key} FROM {piece} p WHERE p.id = l.{fk} AND l.{key} IS NULL"
+        ))
+    for name, key in TABLES.items():
+        _rebuild(conn, Base.metadata.tables[name], key)
+    _create_foreign_keys(conn, partitioned=True)
+
+
+def unpartition_tables(conn: Connection) -> None:
+    """Revient à des tables simples, conformes aux modèles."""
+    for name in TABLES:
+        _rebuild(conn, Base.metadata.tables[name], None)
+    _create_foreign_keys(conn, partitioned=False)
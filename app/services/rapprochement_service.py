@@ -0,0 +1,338 @@
+"""Rapprochement d'un relevé bancaire avec les factures ouvertes.
+
+Le relevé (CSV ou XML CAMT.053) est lu en entier, puis chaque crédit est
+rapproché en une passe à l'aide d'index en mémoire construits une seule fois :
+
+1. par numéro de facture cité dans le libellé ou la référence (plusieurs numéros :
+   le virement doit solder exactement les factures citées) ;
+2. à défaut, par montant, si une seule facture ouverte a ce reste dû.
+
+Les paiements sont ensuite insérés et imputés par lots, encours des clients
+compris (voir ``facture_service.imputation``). Les factures rapprochées sont
+d'abord verrouillées : une facture soldée ou annulée depuis la lecture du relevé
+n'est pas imputée, ses lignes sont rendues non rapprochées. Une ligne de relevé
+déjà imputée (même référence bancaire) est ignorée : un relevé peut être
+rechargé sans double comptage.
+"""
+import csv
+import hashlib
+import io
+import re
+import unicodedata
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.facture import Facture, Paiement, StatutFacture
+from app.schemas.facture import LigneRapprochement, RapprochementRead
+from app.services.client_service import imputation_encours
+from app.services.facture_service import imputation
+
+STATUTS_OUVERTS = (
+    StatutFacture.EMISE, StatutFacture.ENVOYEE, StatutFacture.EN_RETARD, StatutFacture.PAYEE_PARTIELLEMENT,
+)
+NUMERO_FACTURE = re.compile(r"FAC[\s\-_]?(\d{1,6})\b", re.IGNORECASE)
+LOT = 5000
+
+# En-têtes CSV reconnus (minuscules, sans accents)
+COLONNES = {
+    "date": ("date", "date operation", "date_operation", "date valeur", "booking date"),
+    "montant": ("montant", "amount", "credit", "montant credit"),
+    "libelle": ("libelle", "label", "description", "motif", "communication"),
+    "reference": ("reference", "ref", "reference bancaire", "id"),
+}
+
+
+@dataclass
+class LigneReleve:
+    ligne: int
+    date_operation: date | None
+    montant: Decimal
+    libelle: str
+    reference: str
+
+
+# --- Lecture -------------------------------------------------------------------------
+
+def _normaliser(texte: str) -> str:
+    texte = unicodedata.normalize("NFKD", texte).encode("ascii", "ignore").decode()
+    return " ".join(texte.lower().replace("_", " ").split())
+
+
+def _montant(texte: str) -> Decimal:
+    texte = re.sub(r"[\s\u00a0\u202f€]", "", texte)
+    if "," in texte and "." in texte:
+        # Le dernier séparateur est le séparateur décimal : 1.234,56 ou 1,234.56
+        if texte.rfind(",") > texte.rfind("."):
+            texte = texte.replace(".", "").replace(",", ".")
+        else:
+            texte = texte.replace(",", "")
+    else:
+        texte = texte.replace(",", ".")
+    try:
+        return Decimal(texte)
+    except InvalidOperation:
+        raise ValueError(f"montant invalide : {texte!r}") from None
+
+
+def _date(texte: str) -> date | None:
+    texte = texte.strip()[:10]
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(texte, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _reference(reference: str, date_operation: date | None, montant: Decimal, libelle: str) -> str:
+    """Référence fournie par la banque, sinon empreinte de la ligne."""
+    if reference:
+        return reference[:100]
+    empreinte = hashlib.sha1(f"{date_operation}|{montant}|{libelle}".encode()).hexdigest()
+    return f"RLV-{empreinte[:32]}"
+
+
+def _lire_csv(texte: str) -> list[LigneReleve]:
+    dialect = csv.Sniffer().sniff(texte[:4096], delimiters=";,\t")
+    reader = csv.reader(io.StringIO(texte), dialect)
+    header = [_normaliser(h) for h in next(reader, [])]
+    index = {}
+    for champ, noms in COLONNES.items():
+        index[champ] = next((i for i, h in enumerate(header) if h in noms), None)
+    if index["montant"] is None:
+        raise ValueError("colonne montant introuvable")
+
+    lignes = []
+    for numero, values in enumerate(reader, 2):
+        if not any(v.strip() for v in values):
+            continue
+        champs = {champ: values[i].strip() if i is not None else "" for champ, i in index.items()}
+        montant = _montant(champs["montant"])
+        if montant <= 0:
+            continue  # débits : hors rapprochement clients
+        date_operation, libelle = _date(champs["date"]), champs["libelle"]
+        lignes.append(LigneReleve(
+            numero, date_operation, montant, libelle, _reference(champs["reference"], date_operation, montant, libelle)
+        ))
+    return lignes
+
+
+def _enfant(element, *chemin: str):
+    """Recherche par nom local (les espaces de noms CAMT varient selon la version)."""
+    for nom in chemin:
+        if element is None:
+            return None
+        element = next((e for e in element if e.tag.rsplit("}", 1)[-1] == nom), None)
+    return element
+
+
+def _textes(element, nom: str) -> list[str]:
+    return [e.text.strip() for e in element.iter() if e.tag.rsplit("}", 1)[-1] == nom and e.text]
+
+
+def _montant_transaction(transaction):
+    montant = _enfant(transaction, "Amt")
+    return montant if montant is not None else _enfant(transaction, "AmtDtls", "TxAmt", "Amt")
+
+
+def _lire_camt(contenu: bytes) -> list[LigneReleve]:
+    try:
+        racine = ET.fromstring(contenu)
+    except ET.ParseError as exc:
+        raise ValueError(f"XML invalide : {exc}") from None
+
+    lignes = []
+    entrees = [e for e in racine.iter() if e.tag.rsplit("}", 1)[-1] == "Ntry"]
+    for numero, entree in enumerate(entrees, 1):
+        sens = _enfant(entree, "CdtDbtInd")
+        if sens is None or sens.text != "CRDT":
+            continue
+        date_element = _enfant(entree, "BookgDt", "Dt")
+        if date_element is None:
+            date_element = _enfant(entree, "ValDt", "Dt")
+        date_operation = _date(date_element.text) if date_element is not None else None
+        ref_entree = _enfant(entree, "AcctSvcrRef")
+        ref_entree = ref_entree.text.strip() if ref_entree is not None and ref_entree.text else ""
+
+        transactions = [t for t in entree.iter() if t.tag.rsplit("}", 1)[-1] == "TxDtls"]
+        if len(transactions) <= 1:
+            details = [(entree, _enfant(entree, "Amt"), ref_entree)]
+        else:  # virement groupé : une ligne par transaction
+            details = [
+                (t, _montant_transaction(t), next(iter(_textes(t, "AcctSvcrRef") + _textes(t, "EndToEndId")), ""))
+                for t in transactions
+            ]
+        for element, montant_element, reference in details:
+            if montant_element is None or not montant_element.text:
+                continue
+            montant = _montant(montant_element.text)
+            libelle = " ".join(_textes(element, "Ustrd") + _textes(element, "Ref") + _textes(element, "AddtlNtryInf"))
+            lignes.append(LigneReleve(
+                numero, date_operation, montant, libelle[:255], _reference(reference, date_operation, montant, libelle)
+            ))
+    return lignes
+
+
+def lire_releve(contenu: bytes) -> list[LigneReleve]:
+    """Lit un relevé CSV ou CAMT.053 ; ne garde que les crédits. ValueError si le fichier est illisible."""
+    if contenu.startswith(b"\xef\xbb\xbf"):
+        contenu = contenu[3:]
+    if contenu.lstrip().startswith(b"<"):
+        return _lire_camt(contenu)
+    try:
+        texte = contenu.decode("utf-8")
+    except UnicodeDecodeError:
+        texte = contenu.decode("cp1252")
+    try:
+        return _lire_csv(texte)
+    except csv.Error as exc:
+        raise ValueError(f"CSV invalide : {exc}") from None
+
+
+# --- Rapprochement -------------------------------------------------------------------
+
+class _Index:
+    """Factures ouvertes indexées par numéro et par reste dû ; les restes sont tenus à jour en mémoire."""
+
+    def __init__(self, factures):
+        self.numero: dict[str, int] = {}
+        self.reste: dict[int, Decimal] = {}
+        self.par_reste: dict[Decimal, set[int]] = defaultdict(set)
+        self.numeros: dict[int, str] = {}
+        for facture_id, numero, total_ttc, montant_regle in factures:
+            self.numero[numero.upper()] = facture_id
+            self.numeros[facture_id] = numero
+            self.reste[facture_id] = total_ttc - montant_regle
+            self.par_reste[self.reste[facture_id]].add(facture_id)
+
+    def imputer(self, facture_id: int, montant: Decimal) -> None:
+        self.par_reste[self.reste[facture_id]].discard(facture_id)
+        self.reste[facture_id] -= montant
+        if self.reste[facture_id] > 0:
+            self.par_reste[self.reste[facture_id]].add(facture_id)
+
+    def factures_citees(self, texte: str) -> list[int]:
+        ids = []
+        for chiffres in NUMERO_FACTURE.findall(texte):
+            facture_id = self.numero.get(f"FAC-{int(chiffres):06d}")
+            if facture_id is not None and facture_id not in ids:
+                ids.append(facture_id)
+        return ids
+
+
+def _apparier(index: _Index, ligne: LigneReleve) -> tuple[list[tuple[int, Decimal]], str | None, str | None]:
+    """Renvoie (imputations, méthode, motif de rejet)."""
+    citees = index.factures_citees(f"{ligne.libelle} {ligne.reference}")
+    if any(index.reste[f] <= 0 for f in citees):
+        return [], None, "facture citée déjà soldée"
+    if len(citees) == 1:
+        return [(citees[0], ligne.montant)], "numero", None
+    if len(citees) > 1:
+        restes = [index.reste[f] for f in citees]
+        if sum(restes) != ligne.montant:
+            return [], None, "plusieurs factures citées, montant différent de leur reste dû"
+        return list(zip(citees, restes, strict=True)), "numero", None
+
+    candidates = index.par_reste.get(ligne.montant)
+    if not candidates:
+        return [], None, "aucune facture ouverte correspondante"
+    if len(candidates) > 1:
+        return [], None, f"{len(candidates)} factures ouvertes ont ce montant"
+    return [(next(iter(candidates)), ligne.montant)], "montant", None
+
+
+async def _references_connues(db: AsyncSession, references: list[str]) -> set[str]:
+    connues = set()
+    for i in range(0, len(references), LOT):
+        result = await db.execute(select(Paiement.reference).where(Paiement.reference.in_(references[i:i + LOT])))
+        connues.update(result.scalars())
+    return connues
+
+
+async def _verrouiller_ouvertes(db: AsyncSession, ids: list[int]) -> set[int]:
+    """Verrouille jusqu'à la fin de la transaction celles des factures ``ids`` encore ouvertes et les renvoie."""
+    ouvertes = set()
+    for i in range(0, len(ids), LOT):
+        result = await db.execute(
+            select(Facture.id).where(Facture.id.in_(ids[i:i + LOT]), Facture.statut.in_(STATUTS_OUVERTS))
+            .with_for_update()
+        )
+        ouvertes.update(result.scalars())
+    return ouvertes
+
+
+async def rapprocher(
+    db: AsyncSession, lignes: list[LigneReleve], simulation: bool = False, user_id: int | None = None
+) -> RapprochementRead:
+    factures = await db.execute(
+        select(Facture.id, Facture.numero, Facture.total_ttc, Facture.montant_regle)
+        .where(Facture.statut.in_(STATUTS_OUVERTS))
+    )
+    index = _Index(factures.all())
+    connues = await _references_connues(db, [ligne.reference for ligne in lignes])
+
+    details: list[LigneRapprochement] = []
+    paiements: list[tuple[int, dict]] = []
+    non_rapprochees: dict[int, LigneRapprochement] = {}
+    for ligne in lignes:
+        detail = LigneRapprochement(
+            ligne=ligne.ligne, date_operation=ligne.date_operation, montant=ligne.montant,
+            libelle=ligne.libelle, reference=ligne.reference,
+        )
+        if ligne.reference in connues:
+            details.append(detail.model_copy(update={"motif": "ligne déjà imputée"}))
+            continue
+        connues.add(ligne.reference)
+
+        imputations, methode, motif = _apparier(index, ligne)
+        if not imputations:
+            details.append(detail.model_copy(update={"motif": motif}))
+            continue
+        non_rapprochees[ligne.ligne] = detail.model_copy(update={"motif": "facture soldée ou annulée entre-temps"})
+        date_paiement = datetime.combine(ligne.date_operation or date.today(), time(), tzinfo=timezone.utc)
+        for i, (facture_id, montant) in enumerate(imputations):
+            index.imputer(facture_id, montant)
+            paiements.append((ligne.ligne, {
+                "facture_id": facture_id, "montant": montant, "date_paiement": date_paiement,
+                "mode_reglement": "virement", "libelle": ligne.libelle[:255] or None, "user_id": user_id,
+                # Virement réparti sur plusieurs factures : une référence par imputation
+                "reference": ligne.reference if i == 0 else f"{ligne.reference[:96]}/{i}",
+            }))
+            details.append(detail.model_copy(update={
+                "facture_id": facture_id, "facture_numero": index.numeros[facture_id],
+                "montant": montant, "methode": methode,
+            }))
+
+    if paiements and not simulation:
+        # Une ligne dont une facture a été close depuis sa lecture n'est imputée sur aucune
+        ouvertes = await _verrouiller_ouvertes(db, list({p["facture_id"] for _, p in paiements}))
+        rejetees = {n for n, p in paiements if p["facture_id"] not in ouvertes}
+        if rejetees:
+            details = sorted(
+                [d for d in details if d.ligne not in rejetees] + [non_rapprochees[n] for n in rejetees],
+                key=lambda d: d.ligne,
+            )
+        paiements = [(n, p) for n, p in paiements if n not in rejetees]
+        for i in range(0, len(paiements), LOT):
+            lot = [p for _, p in paiements[i:i + LOT]]
+            await db.execute(insert(Paiement), lot)
+            params = [{"facture_id": p["facture_id"], "montant": p["montant"]} for p in lot]
+            await db.execute(imputation(), params)
+            await db.execute(imputation_encours(), params)
+        await db.flush()
+
+    rapprochees = [d for d in details if d.facture_id is not None]
+    return RapprochementRead(
+        simulation=simulation,
+        lignes=len(lignes),
+        rapprochees=len({d.ligne for d in rapprochees}),
+        montant_rapproche=sum((d.montant for d in rapprochees), Decimal("0")),
+        non_rapprochees=len(details) - len(rapprochees),
+        details=details,
+    )
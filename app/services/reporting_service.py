@@ -10,6 +10,18 @@ from app.models.article import Article
 from app.models.client import Client
 
 
+def _periode_annee(colonne, annee: int):
+    """Filtre sur une année exprimé en intervalle, pour que l'index sur la date soit utilisable."""
+    debut = datetime(annee, 1, 1, tzinfo=timezone.utc)
+    return (colonne >= debut) & (colonne < debut.replace(year=annee + 1))
+
+
+def _facture_de(lignes):
+    """Jointure lignes -> facture sur (id, date) : la date, clé de partitionnement des deux tables,
+    permet à PostgreSQL de ne lire que les partitions de la période filtrée."""
+    return (Facture.id == lignes.facture_id) & (Facture.date_facture == lignes.date_facture)
+
+
 async def get_dashboard(db: AsyncSession) -> dict:
     now = datetime.now(timezone.utc)
     debut_mois = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -32,6 +44,7 @@ async def get_dashboard(db: AsyncSession) -> dict:
         select(
             func.count(Facture.id),
             func.coalesce(func.sum(Facture.total_ttc - Facture.montant_regle), 0),
+            func.count(case((Facture.statut == StatutFacture.EN_RETARD, Facture.id))),
         ).where(Facture.statut.in_([StatutFacture.EMISE, StatutFacture.ENVOYEE, StatutFacture.EN_RETARD, StatutFacture.PAYEE_PARTIELLEMENT]))
     )
     impayees_row = impayees.one()
@@ -52,6 +65,7 @@ async def get_dashboard(db: AsyncSession) -> dict:
         "nb_commandes_mois": nb_commandes.scalar() or 0,
         "factures_impayees_count": impayees_row[0] or 0,
         "factures_impayees_montant": float(impayees_row[1] or 0),
+        "factures_en_retard_count": impayees_row[2] or 0,
         "nb_clients_actifs": nb_clients.scalar() or 0,
         "articles_en_alerte": articles_alerte.scalar() or 0,
     }
@@ -66,7 +80,7 @@ async def get_ca_par_mois(db: AsyncSession, annee: int) -> list[dict]:
             func.count(Facture.id).label("nb_factures"),
         )
         .where(
-            extract("year", Facture.date_facture) == annee,
+            _periode_annee(Facture.date_facture, annee),
             Facture.statut != StatutFacture.ANNULEE,
         )
         .group_by(extract("month", Facture.date_facture))
@@ -100,7 +114,7 @@ async def get_top_clients(db: AsyncSession, limit: int = 10, annee: int | None =
         .where(Facture.statut != StatutFacture.ANNULEE)
     )
     if annee:
-        query = query.where(extract("year", Facture.date_facture) == annee)
+        query = query.where(_periode_annee(Facture.date_facture, annee))
 
     query = query.group_by(Client.id, Client.code_client, Client.raison_sociale, Client.ville).order_by(func.sum(Facture.total_ttc).desc()).limit(limit)
 
@@ -129,11 +143,13 @@ async def get_top_articles(db: AsyncSession, limit: int = 10, annee: int | None
             func.coalesce(func.sum(LigneFacture.montant_ht), 0).label("ca_ht"),
         )
         .join(LigneFacture, LigneFacture.article_id == Article.id)
-        .join(Facture, Facture.id == LigneFacture.facture_id)
+        .join(Facture, _facture_de(LigneFacture))
         .where(Facture.statut != StatutFacture.ANNULEE)
     )
     if annee:
-        query = query.where(extract("year", Facture.date_facture) == annee)
+        query = query.where(
+            _periode_annee(Facture.date_facture, annee), _periode_annee(LigneFacture.date_facture, annee)
+        )
 
     query = query.group_by(Article.id, Article.reference, Article.designation, Article.famille).order_by(func.sum(LigneFacture.montant_ht).desc()).limit(limit)
 
@@ -159,11 +175,13 @@ async def get_ca_par_famille(db: AsyncSession, annee: int | None = None) -> list
             func.coalesce(func.sum(LigneFacture.quantite), 0).label("quantite"),
         )
         .join(LigneFacture, LigneFacture.article_id == Article.id)
-        .join(Facture, Facture.id == LigneFacture.facture_id)
+        .join(Facture, _facture_de(LigneFacture))
         .where(Facture.statut != StatutFacture.ANNULEE)
     )
     if annee:
-        query = query.where(extract("year", Facture.date_facture) == annee)
+        query = query.where(
+            _periode_annee(Facture.date_facture, annee), _periode_annee(LigneFacture.date_facture, annee)
+        )
 
     query = query.group_by(Article.famille).order_by(func.sum(LigneFacture.montant_ht).desc())
 
@@ -185,7 +203,7 @@ async def get_ca_par_region(db: AsyncSession, annee: int | None = None) -> list[
         .where(Facture.statut != StatutFacture.ANNULEE)
     )
     if annee:
-        query = query.where(extract("year", Facture.date_facture) == annee)
+        query = query.where(_periode_annee(Facture.date_facture, annee))
 
     query = query.group_by(func.substr(Client.code_postal, 1, 2)).order_by(func.sum(Facture.total_ttc).desc())
 
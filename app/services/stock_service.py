@@ -1,7 +1,11 @@
-from sqlalchemy import select, func
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.config import settings
 from app.models.article import Article
 from app.models.stock import (
     MouvementStock,
@@ -12,21 +16,18 @@ from app.models.stock import (
     StatutInventaire,
 )
 from app.schemas.stock import MouvementStockCreate, InventaireCreate
+from app.services import allocation_service, disponibilite_service, numerotation_service
 
 _mouvement_counter = 0
 _inventaire_counter = 0
 
 
 async def _next_numero_mouvement(db: AsyncSession) -> str:
-    result = await db.execute(select(func.count(MouvementStock.id)))
-    count = (result.scalar() or 0) + 1
-    return f"MVT-{count:06d}"
+    return await numerotation_service.numero(db, MouvementStock, "MVT")
 
 
 async def _next_numero_inventaire(db: AsyncSession) -> str:
-    result = await db.execute(select(func.count(Inventaire.id)))
-    count = (result.scalar() or 0) + 1
-    return f"INV-{count:06d}"
+    return await numerotation_service.numero(db, Inventaire, "INV")
 
 
 async def get_mouvements(
@@ -62,11 +63,39 @@ async def get_mouvement(db: AsyncSession, mouvement_id: int) -> MouvementStock |
     return result.scalar_one_or_none()
 
 
+def _ecritures(data: MouvementStockCreate) -> list[tuple]:
+    """Écritures (clé, dépôt, quantité signée) d'un mouvement au registre du stock.
+
+    Entrée et retour : au dépôt de destination ; sortie : au dépôt source ;
+    transfert : de l'un à l'autre ; inventaire : ajustement signé au dépôt de
+    destination, à défaut source. Sans dépôt, le dépôt principal.
+    """
+    type_mouvement = data.type_mouvement
+    if type_mouvement == TypeMouvement.TRANSFERT:
+        if not data.depot_source or not data.depot_destination or data.depot_source == data.depot_destination:
+            raise ValueError("Transfert : dépôts source et destination distincts requis")
+        sens = [(data.depot_source, -1), (data.depot_destination, 1)]
+    elif type_mouvement in (TypeMouvement.ENTREE, TypeMouvement.RETOUR):
+        sens = [(data.depot_destination, 1)]
+    elif type_mouvement == TypeMouvement.SORTIE:
+        sens = [(data.depot_source, -1)]
+    else:
+        sens = [(data.depot_destination or data.depot_source, 1)]
+    return [
+        (disponibilite_service.cle(ligne.article_id, ligne.taille, ligne.couleur), depot, signe * ligne.quantite)
+        for ligne in data.lignes
+        for depot, signe in sens
+    ]
+
+
 async def create_mouvement(db: AsyncSession, data: MouvementStockCreate, user_id: int | None = None) -> MouvementStock:
+    """Enregistre le mouvement et l'applique au registre du stock (ValueError si un transfert est incomplet)."""
+    ecritures = _ecritures(data)
     numero = await _next_numero_mouvement(db)
     mouvement = MouvementStock(
         numero=numero,
         type_mouvement=data.type_mouvement,
+        date_mouvement=datetime.now(timezone.utc),
         depot_source=data.depot_source,
         depot_destination=data.depot_destination,
         reference_document=data.reference_document,
@@ -75,24 +104,72 @@ async def create_mouvement(db: AsyncSession, data: MouvementStockCreate, user_id
     )
 
     for ligne_data in data.lignes:
-        ligne = LigneMouvementStock(**ligne_data.model_dump())
+        ligne = LigneMouvementStock(**ligne_data.model_dump(), date_mouvement=mouvement.date_mouvement)
         mouvement.lignes.append(ligne)
 
-        # Mettre à jour le stock de l'article
-        article_result = await db.execute(select(Article).where(Article.id == ligne_data.article_id))
-        article = article_result.scalar_one_or_none()
-        if article:
-            if data.type_mouvement in (TypeMouvement.ENTREE, TypeMouvement.RETOUR):
-                article.stock_actuel += ligne_data.quantite
-            elif data.type_mouvement == TypeMouvement.SORTIE:
-                article.stock_actuel -= ligne_data.quantite
-
     db.add(mouvement)
     await db.flush()
+    await disponibilite_service.mouvementer(db, ecritures)
+    if any(quantite > 0 for _, _, quantite in ecritures) and data.type_mouvement != TypeMouvement.TRANSFERT:
+        await allocation_service.allouer(db, {ligne.article_id for ligne in data.lignes})
     await db.refresh(mouvement, ["lignes"])
     return mouvement
 
 
+async def sortir_en_masse(
+    db: AsyncSession, sorties: Sequence[tuple[str, Sequence]], user_id: int | None = None, depuis_reserve: bool = False
+) -> list[str]:
+    """Enregistre une sortie de stock par document (référence, lignes) ; renvoie les numéros des mouvements.
+
+    Les lignes portent ``article_id``, ``quantite``, ``taille``, ``couleur`` et
+    ``emplacement`` (lignes de BL) ; elles sortent du dépôt principal.
+    Mouvements et lignes sont insérés en masse, numérotés en bloc ; le registre
+    du stock est mis à jour en une instruction par table. ``depuis_reserve`` :
+    les quantités sortent aussi du stock réservé (BL expédiés).
+    """
+    sorties = [(reference, lignes) for reference, lignes in sorties if lignes]
+    if not sorties:
+        return []
+    maintenant = datetime.now(timezone.utc)
+    numeros = await numerotation_service.numeros(db, MouvementStock, "MVT", len(sorties))
+    mouvements = [
+        {
+            "numero": numeros[rang],
+            "type_mouvement": TypeMouvement.SORTIE,
+            "date_mouvement": maintenant,
+            "depot_source": settings.DEPOT_PRINCIPAL,
+            "reference_document": reference,
+            "user_id": user_id,
+        }
+        for rang, (reference, _) in enumerate(sorties)
+    ]
+    table = MouvementStock.__table__
+    result = await db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), mouvements)
+    await db.execute(insert(LigneMouvementStock.__table__), [
+        {
+            "mouvement_id": mouvement_id,
+            "date_mouvement": maintenant,
+            "article_id": ligne.article_id,
+            "quantite": ligne.quantite,
+            "taille": ligne.taille,
+            "couleur": ligne.couleur,
+            "emplacement": ligne.emplacement,
+        }
+        for mouvement_id, (_, lignes) in zip(result.scalars().all(), sorties, strict=True)
+        for ligne in lignes
+    ])
+
+    cles = [
+        (disponibilite_service.cle(ligne.article_id, ligne.taille, ligne.couleur), ligne.quantite)
+        for _, lignes in sorties
+        for ligne in lignes
+    ]
+    await disponibilite_service.mouvementer(db, [(cle, settings.DEPOT_PRINCIPAL, -quantite) for cle, quantite in cles])
+    if depuis_reserve:
+        await disponibilite_service.appliquer(db, [(cle, 0, -quantite) for cle, quantite in cles])
+    return [m["numero"] for m in mouvements]
+
+
 async def create_inventaire(db: AsyncSession, data: InventaireCreate, user_id: int | None = None) -> Inventaire:
     numero = await _next_numero_inventaire(db)
     inventaire = Inventaire(
@@ -114,14 +191,14 @@ async def create_inventaire(db: AsyncSession, data: InventaireCreate, user_id: i
 
 
 async def valider_inventaire(db: AsyncSession, inventaire: Inventaire) -> Inventaire:
-    for ligne in inventaire.lignes:
-        article_result = await db.execute(select(Article).where(Article.id == ligne.article_id))
-        article = article_result.scalar_one_or_none()
-        if article:
-            article.stock_actuel = ligne.stock_physique
-
+    """Le stock compté de chaque variante remplace son stock dans le dépôt inventorié."""
     inventaire.statut = StatutInventaire.VALIDE
     await db.flush()
+    await disponibilite_service.fixer_depot(db, inventaire.depot, {
+        disponibilite_service.cle(ligne.article_id, ligne.taille, ligne.couleur): ligne.stock_physique
+        for ligne in inventaire.lignes
+    })
+    await allocation_service.allouer(db, {ligne.article_id for ligne in inventaire.lignes})
     await db.refresh(inventaire)
     return inventaire
 
@@ -0,0 +1,227 @@
+"""Résolution des prix de vente à partir des tarifs articles.
+
+Un tarif (ArticleTarif) s'applique aux clients dont le type (Client.type_client)
+est son ``nom_tarif``, entre ``date_debut`` et ``date_fin`` incluses (bornes
+vides = ouvertes). Parmi les tarifs applicables, le plus récemment ouvert
+l'emporte ; à défaut, l'article est vendu à son ``prix_vente_ht`` sans remise,
+ou au prix de la variante (ArticleVariante) commandée s'il est renseigné.
+
+Les tarifs sont tenus dans un index en mémoire (article, type de client) ->
+tarifs triés, chargé en une requête : une résolution ne coûte plus qu'une
+lecture de dictionnaire. L'index est invalidé à chaque modification de tarif
+faite par ce processus, et rechargé au plus tard après TARIFS_CACHE_SECONDES
+pour prendre en compte celles des autres processus.
+"""
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import event, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.article import Article, ArticleTarif, ArticleVariante
+from app.models.client import Client
+from app.schemas.commande import DevisCreate, DevisRead, LigneCommandeCreate, LigneDevisRead
+from app.utils.chiffrage import chiffrer
+
+TYPE_CLIENT_DEFAUT = "standard"
+
+
+@dataclass(frozen=True, slots=True)
+class _Tarif:
+    nom: str
+    prix_ht: Decimal
+    remise_pct: Decimal
+    debut: datetime | None
+    fin: datetime | None
+
+
+@dataclass(frozen=True, slots=True)
+class PrixResolu:
+    article_id: int
+    reference: str
+    designation: str
+    prix_unitaire_ht: Decimal
+    remise_pct: Decimal
+    tva_pct: Decimal
+    tarif: str | None
+
+
+_index: dict[tuple[int, str], list[_Tarif]] | None = None
+_charge_le = 0.0
+
+
+def invalider() -> None:
+    global _index
+    _index = None
+
+
+def invalider_apres_commit(db: AsyncSession) -> None:
+    """Invalide l'index tout de suite et à la validation de la transaction.
+
+    Un rechargement fait par une autre requête avant le commit relirait les
+    anciens tarifs : le second passage l'efface.
+    """
+    invalider()
+    event.listen(db.sync_session, "after_commit", lambda _session: invalider(), once=True)
+
+
+def _utc(valeur: datetime | None) -> datetime | None:
+    # SQLite restitue des dates naïves
+    if valeur is not None and valeur.tzinfo is None:
+        return valeur.replace(tzinfo=timezone.utc)
+    return valeur
+
+
+async def _get_index(db: AsyncSession) -> dict[tuple[int, str], list[_Tarif]]:
+    global _index, _charge_le
+    if _index is None or time.monotonic() - _charge_le > settings.TARIFS_CACHE_SECONDES:
+        result = await db.execute(select(
+            ArticleTarif.id, ArticleTarif.article_id, ArticleTarif.nom_tarif, ArticleTarif.prix_ht,
+            ArticleTarif.remise_pct, ArticleTarif.date_debut, ArticleTarif.date_fin,
+        ))
+        lignes = defaultdict(list)
+        for row in result.all():
+            lignes[(row.article_id, row.nom_tarif)].append((row.id, _Tarif(
+                row.nom_tarif, row.prix_ht, row.remise_pct or Decimal("0"), _utc(row.date_debut), _utc(row.date_fin),
+            )))
+        # Le tarif ouvert le plus récemment en tête ; les tarifs sans date de début en dernier
+        _index = {
+            cle: [t for _, t in sorted(tarifs, key=lambda e: (e[1].debut is not None, e[1].debut, e[0]), reverse=True)]
+            for cle, tarifs in lignes.items()
+        }
+        _charge_le = time.monotonic()
+    return _index
+
+
+def _applicable(tarifs: list[_Tarif], quand: datetime) -> _Tarif | None:
+    for tarif in tarifs:
+        if (tarif.debut is None or tarif.debut <= quand) and (tarif.fin is None or quand <= tarif.fin):
+            return tarif
+    return None
+
+
+async def get_type_client(db: AsyncSession, client_id: int | None) -> str:
+    if client_id is None:
+        return TYPE_CLIENT_DEFAUT
+    result = await db.execute(select(Client.type_client).where(Client.id == client_id))
+    return result.scalar() or TYPE_CLIENT_DEFAUT
+
+
+async def resoudre(
+    db: AsyncSession, article_ids: Iterable[int], type_client: str, quand: datetime | None = None
+) -> dict[int, PrixResolu]:
+    """Prix applicables des articles ; les articles inconnus sont absents du résultat."""
+    quand = _utc(quand) or datetime.now(timezone.utc)
+    index = await _get_index(db)
+    result = await db.execute(
+        select(Article.id, Article.reference, Article.designation, Article.prix_vente_ht, Article.tva)
+        .where(Article.id.in_(set(article_ids)))
+    )
+    prix = {}
+    for article in result.all():
+        tarif = _applicable(index.get((article.id, type_client), []), quand)
+        prix[article.id] = PrixResolu(
+            article_id=article.id,
+            reference=article.reference,
+            designation=article.designation,
+            prix_unitaire_ht=tarif.prix_ht if tarif else article.prix_vente_ht,
+            remise_pct=tarif.remise_pct if tarif else Decimal("0"),
+            tva_pct=article.tva,
+            tarif=tarif.nom if tarif else None,
+        )
+    return prix
+
+
+def _article_inconnu(article_ids: Iterable[int], prix: dict[int, PrixResolu]) -> None:
+    inconnus = sorted(set(article_ids) - prix.keys())
+    if inconnus:
+        raise ValueError(f"Article(s) introuvable(s) : {', '.join(map(str, inconnus))}")
+
+
+async def chiffrer_devis(db: AsyncSession, data: DevisCreate) -> DevisRead:
+    """Tarife et chiffre un panier complet (ValueError si un article est inconnu)."""
+    type_client = data.type_client or await get_type_client(db, data.client_id)
+    quand = _utc(data.date_tarif) or datetime.now(timezone.utc)
+    article_ids = [ligne.article_id for ligne in data.lignes]
+    prix = await resoudre(db, article_ids, type_client, quand)
+    _article_inconnu(article_ids, prix)
+
+    lignes = [
+        LigneDevisRead(
+            article_id=ligne.article_id,
+            reference=prix[ligne.article_id].reference,
+            designation=prix[ligne.article_id].designation,
+            quantite=ligne.quantite,
+            prix_unitaire_ht=prix[ligne.article_id].prix_unitaire_ht,
+            remise_pct=prix[ligne.article_id].remise_pct,
+            tva_pct=prix[ligne.article_id].tva_pct,
+            montant_ht=Decimal("0"),
+            tarif=prix[ligne.article_id].tarif,
+        )
+        for ligne in data.lignes
+    ]
+    chiffrage = chiffrer(lignes, data.remise_globale_pct)
+    for ligne, montant_ht in zip(lignes, chiffrage.montants_ht, strict=True):
+        ligne.montant_ht = montant_ht
+    return DevisRead(
+        type_client=type_client,
+        date_tarif=quand,
+        lignes=lignes,
+        total_ht=chiffrage.total_ht,
+        total_tva=chiffrage.total_tva,
+        total_ttc=chiffrage.total_ttc,
+        ventilation_tva=chiffrage.ventilation,
+    )
+
+
+async def prix_variantes(db: AsyncSession, cles: Iterable[tuple[int, str, str]]) -> dict[tuple[int, str, str], Decimal]:
+    """Prix propres des variantes (article, taille, couleur) qui en ont un, en une requête."""
+    cles = set(cles)
+    if not cles:
+        return {}
+    result = await db.execute(
+        select(
+            ArticleVariante.article_id, ArticleVariante.taille, ArticleVariante.couleur,
+            ArticleVariante.prix_vente_ht,
+        )
+        .where(
+            tuple_(ArticleVariante.article_id, ArticleVariante.taille, ArticleVariante.couleur).in_(cles),
+            ArticleVariante.prix_vente_ht.is_not(None),
+        )
+    )
+    return {(row.article_id, row.taille, row.couleur): row.prix_vente_ht for row in result.all()}
+
+
+async def completer_lignes(db: AsyncSession, client_id: int, lignes: list[LigneCommandeCreate]) -> None:
+    """Tarife les lignes de commande saisies sans prix (ValueError si un article est inconnu).
+
+    La remise et le taux de TVA envoyés explicitement sont conservés.
+    """
+    a_tarifer = [ligne for ligne in lignes if ligne.prix_unitaire_ht is None or ligne.designation is None]
+    if not a_tarifer:
+        return
+    article_ids = [ligne.article_id for ligne in a_tarifer]
+    prix = await resoudre(db, article_ids, await get_type_client(db, client_id))
+    _article_inconnu(article_ids, prix)
+    variantes = await prix_variantes(db, (
+        (ligne.article_id, ligne.taille or "", ligne.couleur or "")
+        for ligne in a_tarifer
+        if ligne.prix_unitaire_ht is None and (ligne.taille or ligne.couleur) and prix[ligne.article_id].tarif is None
+    ))
+    for ligne in a_tarifer:
+        resolu = prix[ligne.article_id]
+        if ligne.designation is None:
+            ligne.designation = resolu.designation
+        if ligne.prix_unitaire_ht is None:
+            ligne.prix_unitaire_ht = variantes.get(
+                (ligne.article_id, ligne.taille or "", ligne.couleur or ""), resolu.prix_unitaire_ht
+            )
+            if "remise_pct" not in ligne.model_fields_set:
+                ligne.remise_pct = resolu.remise_pct
+            if "tva_pct" not in ligne.model_fields_set:
+                ligne.tva_pct = resolu.tva_pct
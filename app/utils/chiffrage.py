@@ -0,0 +1,118 @@
+"""Chiffrage des pièces (commandes, factures) : lignes, remise globale, totaux et ventilation de la TVA.
+
+Règles communes à toutes les pièces :
+- montant HT d'une ligne = quantité × PU HT × (1 - remise de ligne), arrondi au centime ;
+- la remise globale s'applique à la base HT de chaque taux de TVA, arrondie au centime ;
+- la TVA est calculée par taux sur sa base remisée, arrondie au centime ;
+- total HT et total TVA sont les sommes des bases et des TVA par taux : la
+  ventilation retombe exactement sur les totaux.
+
+Les arrondis sont commerciaux (demi au-dessus, symétrique pour les montants
+négatifs). Le calcul se fait en une passe sur des entiers (centimes, prix au
+dix-millième, pourcentages au centième) : seules les entrées et les résultats
+sont des Decimal.
+
+Les totaux ne dépendent que des bases HT par taux : ``totaliser`` les refait à
+partir de ces seules bases (sommes par taux lues en base de données), sans
+recharger les lignes d'une pièce modifiée.
+"""
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+
+def _entier(valeur: Decimal, decimales: int) -> int:
+    return int(valeur.scaleb(decimales).to_integral_value(ROUND_HALF_UP))
+
+
+def _diviser(n: int, d: int) -> int:
+    """Quotient entier arrondi au plus proche, demi loin de zéro."""
+    q, r = divmod(abs(n), d)
+    if 2 * r >= d:
+        q += 1
+    return q if n >= 0 else -q
+
+
+def _euros(centimes: int) -> Decimal:
+    return Decimal(centimes).scaleb(-2)
+
+
+@dataclass(frozen=True, slots=True)
+class VentilationTVA:
+    taux: Decimal
+    base_ht: Decimal
+    montant_tva: Decimal
+
+
+@dataclass(frozen=True, slots=True)
+class Chiffrage:
+    montants_ht: list[Decimal]
+    total_ht: Decimal
+    total_tva: Decimal
+    total_ttc: Decimal
+    ventilation: list[VentilationTVA]
+
+    def appliquer(self, piece) -> None:
+        """Reporte les totaux sur une commande ou une facture."""
+        piece.total_ht = self.total_ht
+        piece.total_tva = self.total_tva
+        piece.total_ttc = self.total_ttc
+
+
+def _montant(ligne) -> int:
+    # centimes = quantité × PU (1e-4 €) × (10000 - remise en centièmes de %) / 1e6
+    return _diviser(
+        ligne.quantite * _entier(ligne.prix_unitaire_ht, 4) * (10000 - _entier(ligne.remise_pct, 2)),
+        1_000_000,
+    )
+
+
+def montant_ligne(ligne) -> Decimal:
+    """Montant HT d'une ligne, arrondi au centime."""
+    return _euros(_montant(ligne))
+
+
+def chiffrer(lignes: Iterable, remise_globale_pct: Decimal = Decimal("0")) -> Chiffrage:
+    """Chiffre des lignes portant ``quantite``, ``prix_unitaire_ht``, ``remise_pct`` et ``tva_pct``.
+
+    Accepte indifféremment les schémas de création et les lignes enregistrées.
+    """
+    montants = []
+    bases: dict[int, int] = {}  # taux (centièmes de %) -> base HT (centimes)
+    for ligne in lignes:
+        montant = _montant(ligne)
+        montants.append(montant)
+        taux = _entier(ligne.tva_pct, 2)
+        bases[taux] = bases.get(taux, 0) + montant
+    return _totaux([_euros(m) for m in montants], bases, remise_globale_pct)
+
+
+def totaliser(bases_ht: Mapping[Decimal, Decimal], remise_globale_pct: Decimal = Decimal("0")) -> Chiffrage:
+    """Totaux d'une pièce à partir de la somme des montants HT de ses lignes par taux de TVA.
+
+    Donne les mêmes totaux que ``chiffrer`` sur les lignes ; ``montants_ht`` est vide.
+    """
+    bases: dict[int, int] = {}
+    for taux, base in bases_ht.items():
+        bases[_entier(taux, 2)] = bases.get(_entier(taux, 2), 0) + _entier(base, 2)
+    return _totaux([], bases, remise_globale_pct)
+
+
+def _totaux(montants_ht: list[Decimal], bases: dict[int, int], remise_globale_pct: Decimal) -> Chiffrage:
+    coefficient = 10000 - _entier(remise_globale_pct, 2)
+    ventilation = []
+    total_ht = total_tva = 0
+    for taux in sorted(bases):
+        base = _diviser(bases[taux] * coefficient, 10000)
+        tva = _diviser(base * taux, 10000)
+        ventilation.append(VentilationTVA(_euros(taux), _euros(base), _euros(tva)))
+        total_ht += base
+        total_tva += tva
+
+    return Chiffrage(
+        montants_ht=montants_ht,
+        total_ht=_euros(total_ht),
+        total_tva=_euros(total_tva),
+        total_ttc=_euros(total_ht + total_tva),
+        ventilation=ventilation,
+    )
@@ -7,6 +7,7 @@ const STATUT_COLORS = {
   validee: 'bg-blue-100 text-blue-700',
   en_preparation: 'bg-yellow-100 text-yellow-700',
   preparee: 'bg-indigo-100 text-indigo-700',
+  expediee_partiellement: 'bg-orange-100 text-orange-700',
   expediee: 'bg-purple-100 text-purple-700',
   livree: 'bg-green-100 text-green-700',
   facturee: 'bg-teal-100 text-teal-700',
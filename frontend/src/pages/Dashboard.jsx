@@ -41,7 +41,7 @@ export default function Dashboard() {
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-6">
         <StatCard title="CA du mois" value={fmt(dashboard.ca_mois)} icon={TrendingUp} color="bg-green-500" />
         <StatCard title="Commandes du mois" value={dashboard.nb_commandes_mois} icon={ShoppingCart} color="bg-blue-500" />
-        <StatCard title="Factures impayées" value={`${dashboard.factures_impayees_count} (${fmt(dashboard.factures_impayees_montant)})`} icon={AlertTriangle} color="bg-orange-500" />
+        <StatCard title="Factures impayées" value={`${dashboard.factures_impayees_count} (${fmt(dashboard.factures_impayees_montant)}) · ${dashboard.factures_en_retard_count} en retard`} icon={AlertTriangle} color="bg-orange-500" />
         <StatCard title="Clients actifs" value={dashboard.nb_clients_actifs} icon={Users} color="bg-purple-500" />
       </div>
 
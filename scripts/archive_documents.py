@@ -0,0 +1,70 @@
+"""
+Archivage à froid des pièces closes.
+
+Déplace vers les tables d'archive les factures payées ou annulées, BL livrés,
+commandes facturées et inventaires validés de plus de --annees ans (voir
+app/services/archive_service.py). Chaque lot est validé séparément : le script
+peut être interrompu et relancé.
+
+Usage :
+    python scripts/archive_documents.py --annees 3 --dry-run
+    python scripts/archive_documents.py --annees 3 [--lot 1000]
+
+Les rapports annuels ne portant que sur les tables courantes, choisir un
+horizon au-delà des exercices encore consultés.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import async_session
+from app.services import archive_service
+
+
+async def archiver(avant: datetime, taille: int = 1000, dry_run: bool = False) -> dict[str, int]:
+    counts = {}
+    async with async_session() as db:
+        for archivage in archive_service.ARCHIVAGES:
+            table = archivage.modele.__tablename__
+            if dry_run:
+                counts[table] = await archive_service.compter_eligibles(db, archivage, avant)
+                continue
+            counts[table] = 0
+            while n := await archive_service.archiver_lot(db, archivage, avant, taille):
+                await db.commit()
+                counts[table] += n
+            print(f"  {table:<16} {counts[table]:>10,}")
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Archivage des pièces closes")
+    parser.add_argument("--annees", type=int, default=3, help="Archive les pièces de plus de N ans")
+    parser.add_argument("--lot", type=int, default=1000, help="Pièces par transaction")
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Compte les pièces éligibles sans rien déplacer "
+             "(hors commandes libérées par l'archivage de leurs factures)",
+    )
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    avant = now.replace(year=now.year - args.annees, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    print(f"Pièces closes antérieures au {avant:%d/%m/%Y}{' (simulation)' if args.dry_run else ''} :")
+    start = time.perf_counter()
+    counts = asyncio.run(archiver(avant, args.lot, args.dry_run))
+    if args.dry_run:
+        for table, count in counts.items():
+            print(f"  {table:<16} {count:>10,}")
+    else:
+        print(f"{sum(counts.values()):,} pièces archivées en {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Benchmarks des endpoints de l'API sur le jeu de données synthétique.
+
+Chaque cas est exécuté en mémoire (httpx + ASGI, sans serveur) contre la base
+configurée (DATABASE_URL), préalablement remplie par generate_dataset.py. Pour
+chaque cas sont mesurés :
+
+- la latence p50 / p95 (ms)
+- le nombre de requêtes SQL par appel
+- le pic mémoire Python pendant un appel (tracemalloc, Ko)
+
+Les résultats sont comparés à une référence (benchmarks/baseline_<sgbd>.json) :
+une latence p95 ou un pic mémoire en hausse de plus de --tolerance, ou une
+requête SQL de plus qu'en référence, est signalé comme régression.
+
+Usage :
+    python scripts/generate_dataset.py --reset --scale 0.1
+    python scripts/benchmark_api.py --save-baseline      # fixe la référence
+    python scripts/benchmark_api.py                      # compare (code 1 si régression)
+    python scripts/benchmark_api.py --only commande      # filtre sur le nom des cas
+
+Les cas d'écriture (commandes, factures, mouvements) ajoutent des données :
+régénérer le jeu avant de fixer une nouvelle référence. Les commandes sont
+passées avec ``forcer=true`` : le contrôle d'encours est mesuré, mais un
+client du jeu au-delà de son plafond ne fait pas échouer le cas.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, func, select
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import engine
+from app.main import app
+from app.models import Article, Client, Facture
+
+BASELINE_DIR = Path(__file__).parent.parent / "benchmarks"
+BENCH_USER = {"email": "bench@gescom.fr", "password": "bench123"}
+ANNEE = 2025
+COMMANDES = "/api/v1/commandes?forcer=true"
+
+# En dessous de ces écarts, une hausse relève du bruit de mesure.
+LATENCE_MIN_MS = 2.0
+MEMOIRE_MIN_KB = 256
+
+
+class QueryCounter:
+    """Compte les requêtes SQL émises par le moteur de l'application."""
+
+    def __init__(self, sync_engine):
+        self.count = 0
+        event.listen(sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *_args) -> None:
+        self.count += 1
+
+
+@dataclass
+class Dataset:
+    client_ids: int
+    articles: list[tuple[int, str, str]]
+    facture_id: int | None
+
+
+class Bench:
+    """Contexte partagé par les cas : client HTTP authentifié et bornes du jeu de données."""
+
+    def __init__(self, http: AsyncClient, headers: dict, dataset: Dataset, seed: int = 42):
+        self.http = http
+        self.headers = headers
+        self.dataset = dataset
+        self.rng = random.Random(seed)
+
+    def lignes(self, n: int) -> list[dict]:
+        return [
+            {"article_id": article_id, "designation": designation, "quantite": self.rng.randint(1, 12),
+             "prix_unitaire_ht": prix}
+            for article_id, designation, prix in self.rng.choices(self.dataset.articles, k=n)
+        ]
+
+    def commande(self, n_lignes: int) -> dict:
+        return {"client_id": self.rng.randint(1, self.dataset.client_ids), "lignes": self.lignes(n_lignes)}
+
+    async def request(self, method: str, url: str, body: dict | None = None):
+        response = await self.http.request(method, url, json=body, headers=self.headers)
+        response.raise_for_status()
+        return response
+
+
+Prepare = Callable[[Bench], Awaitable[tuple[str, str, dict | None]]]
+
+
+@dataclass(frozen=True)
+class Case:
+    """Un endpoint mesuré ; ``prepare`` fait la mise en place (non chronométrée) et renvoie la requête."""
+
+    name: str
+    prepare: Prepare
+
+
+def _get(url: str) -> Prepare:
+    async def prepare(_bench: Bench):
+        return "GET", url, None
+    return prepare
+
+
+async def _create_commande(bench: Bench):
+    return "POST", COMMANDES, bench.commande(50)
+
+
+async def _facturer(bench: Bench):
+    """Commande de 10 lignes expédiée (stock entré puis BL créé) : seule une commande expédiée est facturable."""
+    commande = bench.commande(10)
+    lignes = [{"article_id": ligne["article_id"], "quantite": ligne["quantite"]} for ligne in commande["lignes"]]
+    commande_id = (await bench.request("POST", COMMANDES, commande)).json()["id"]
+    await bench.request("POST", f"/api/v1/commandes/{commande_id}/valider?forcer=true")
+    await bench.request("POST", "/api/v1/stock/mouvements", {
+        "type_mouvement": "entree", "depot_destination": "Principal", "lignes": lignes,
+    })
+    await bench.request("POST", f"/api/v1/commandes/{commande_id}/livrer")
+    return "POST", f"/api/v1/commandes/{commande_id}/facturer", None
+
+
+async def _create_mouvement(bench: Bench):
+    lignes = [{"article_id": ligne["article_id"], "quantite": ligne["quantite"]} for ligne in bench.lignes(10)]
+    return "POST", "/api/v1/stock/mouvements", {
+        "type_mouvement": "entree", "depot_destination": "Principal", "lignes": lignes,
+    }
+
+
+async def _facture_pdf(bench: Bench):
+    return "GET", f"/api/v1/reporting/export/facture/{bench.dataset.facture_id}/pdf", None
+
+
+CASES = [
+    Case("articles_liste", _get("/api/v1/articles")),
+    Case("articles_recherche", _get("/api/v1/articles?search=Casque")),
+    Case("clients_liste", _get("/api/v1/clients")),
+    Case("clients_recherche", _get("/api/v1/clients?search=Lyon")),
+    Case("commande_creation_50_lignes", _create_commande),
+    Case("commande_facturer", _facturer),
+    Case("mouvement_creation", _create_mouvement),
+    Case("dashboard", _get("/api/v1/reporting/dashboard")),
+    Case("ca_mensuel", _get(f"/api/v1/reporting/ca-mensuel?annee={ANNEE}")),
+    Case("top_clients", _get(f"/api/v1/reporting/top-clients?annee={ANNEE}")),
+    Case("top_articles", _get(f"/api/v1/reporting/top-articles?annee={ANNEE}")),
+    Case("ca_par_famille", _get(f"/api/v1/reporting/ca-par-famille?annee={ANNEE}")),
+    Case("ca_par_region", _get(f"/api/v1/reporting/ca-par-region?annee={ANNEE}")),
+    Case("export_excel_top_clients", _get(f"/api/v1/reporting/export/top-clients?annee={ANNEE}")),
+    Case("export_excel_top_articles", _get(f"/api/v1/reporting/export/top-articles?annee={ANNEE}")),
+    Case("export_pdf_facture", _facture_pdf),
+]
+
+
+async def load_dataset() -> Dataset:
+    async with engine.connect() as conn:
+        client_ids = (await conn.execute(select(func.max(Client.id)))).scalar()
+        articles = (await conn.execute(
+            select(Article.id, Article.designation, Article.prix_vente_ht)
+            .where(Article.actif.is_(True)).order_by(Article.id).limit(2000)
+        )).all()
+        facture_id = (await conn.execute(select(func.max(Facture.id)))).scalar()
+    if not client_ids or not articles:
+        raise SystemExit("Base vide : lancer d'abord scripts/generate_dataset.py")
+    return Dataset(client_ids, [(a.id, a.designation, str(a.prix_vente_ht)) for a in articles], facture_id)
+
+
+def _percentile(values: list[float], pct: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+async def run_case(bench: Bench, counter: QueryCounter, case: Case, iterations: int, warmup: int) -> dict:
+    timings: list[float] = []
+    queries: list[int] = []
+    for i in range(warmup + iterations):
+        method, url, body = await case.prepare(bench)
+        counter.count = 0
+        start = time.perf_counter()
+        response = await bench.http.request(method, url, json=body, headers=bench.headers)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f"{case.name} : HTTP {response.status_code} {response.text[:200]}")
+        if i >= warmup:
+            timings.append(elapsed)
+            queries.append(counter.count)
+
+    # Mesure mémoire à part : tracemalloc ralentit fortement l'exécution.
+    method, url, body = await case.prepare(bench)
+    tracemalloc.start()
+    await bench.http.request(method, url, json=body, headers=bench.headers)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(_percentile(timings, 50), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+        "requetes": max(queries),
+        "memoire_kb": round(peak / 1024),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, mesure in results.items():
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        if mesure["p95_ms"] > ref["p95_ms"] * (1 + tolerance) and mesure["p95_ms"] - ref["p95_ms"] > LATENCE_MIN_MS:
+            regressions.append(f"{name} : p95 {ref['p95_ms']} -> {mesure['p95_ms']} ms")
+        if mesure["requetes"] > ref["requetes"]:
+            regressions.append(f"{name} : {ref['requetes']} -> {mesure['requetes']} requêtes SQL")
+        if (mesure["memoire_kb"] > ref["memoire_kb"] * (1 + tolerance)
+                and mesure["memoire_kb"] - ref["memoire_kb"] > MEMOIRE_MIN_KB):
+            regressions.append(f"{name} : mémoire {ref['memoire_kb']} -> {mesure['memoire_kb']} Ko")
+    return regressions
+
+
+async def authenticate(http: AsyncClient) -> dict:
+    response = await http.post("/auth/login", json=BENCH_USER)
+    if response.status_code != 200:
+        raise SystemExit("Connexion impossible : le compte bench@gescom.fr est créé par generate_dataset.py")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def benchmark(iterations: int = 30, warmup: int = 3, only: str | None = None) -> dict:
+    dataset = await load_dataset()
+    counter = QueryCounter(engine.sync_engine)
+    results = {}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as http:
+        bench = Bench(http, await authenticate(http), dataset)
+        for case in CASES:
+            if only and only not in case.name:
+                continue
+            if case.prepare is _facture_pdf and dataset.facture_id is None:
+                continue
+            results[case.name] = mesure = await run_case(bench, counter, case, iterations, warmup)
+            print(
+                f"  {case.name:<30} p50 {mesure['p50_ms']:>8.1f} ms   p95 {mesure['p95_ms']:>8.1f} ms   "
+                f"{mesure['requetes']:>4} req.   {mesure['memoire_kb']:>7} Ko"
+            )
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks des endpoints GesCom")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", help="Ne mesure que les cas dont le nom contient ce texte")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Hausse tolérée (0.25 = +25 %%)")
+    parser.add_argument("--baseline", type=Path, help="Fichier de référence (défaut : benchmarks/baseline_<sgbd>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistre les résultats comme référence")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or BASELINE_DIR / f"baseline_{engine.dialect.name}.json"
+    print(f"Benchmarks sur {engine.url.render_as_string(hide_password=True)}")
+    results = asyncio.run(benchmark(args.iterations, args.warmup, args.only))
+
+    if args.save_baseline:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+        baseline.update(results)
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\nRéférence enregistrée dans {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"\nAucune référence ({baseline_path}) : relancer avec --save-baseline")
+        return 0
+    regressions = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+    if regressions:
+        print("\nRégressions par rapport à la référence :")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("\nAucune régression par rapport à la référence")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
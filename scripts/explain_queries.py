@@ -0,0 +1,220 @@
+"""
+Contrôle des plans d'exécution des requêtes des services.
+
+Chaque cas appelle une fonction de app/services sur la base configurée
+(DATABASE_URL, remplie par generate_dataset.py) ; les SELECT émis sont capturés
+puis repassés sous EXPLAIN (PostgreSQL) ou EXPLAIN QUERY PLAN (SQLite).
+
+Sont signalés :
+- les parcours séquentiels d'une table volumineuse (plus de --min-rows lignes)
+- les plans différents de l'instantané enregistré
+  (benchmarks/query_plans_<sgbd>.json, mis à jour avec --update-snapshot)
+
+Usage :
+    python scripts/explain_queries.py [--update-snapshot] [--only rapport]
+
+Le code de sortie est 1 si une anomalie est détectée.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import event, text
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import async_session, engine
+from app.models.commande import StatutCommande
+from app.models.facture import StatutFacture
+from app.models.livraison import StatutLivraison
+from app.services import (
+    article_service,
+    client_service,
+    commande_service,
+    facture_service,
+    livraison_service,
+    reporting_service,
+    stock_service,
+)
+
+SNAPSHOT_DIR = Path(__file__).parent.parent / "benchmarks"
+ANNEE = 2025
+
+# Parcours complets attendus : agrégats sans filtre sélectif, où un index n'aiderait pas.
+SCANS_ADMIS = {
+    ("dashboard", "clients"),
+    ("dashboard", "articles"),
+    ("alertes_stock", "articles"),
+}
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    call: Callable[..., Awaitable]
+
+
+CASES = [
+    Case("articles_recherche", lambda db: article_service.get_articles(db, search="Casque")),
+    Case("articles_famille", lambda db: article_service.get_articles(db, famille="Casques")),
+    Case("article_detail", lambda db: article_service.get_article(db, 1)),
+    Case("clients_recherche", lambda db: client_service.get_clients(db, search="Lyon")),
+    Case("commandes_client", lambda db: commande_service.get_commandes(db, client_id=1)),
+    Case("commandes_statut", lambda db: commande_service.get_commandes(db, statut=StatutCommande.VALIDEE)),
+    Case("commande_detail", lambda db: commande_service.get_commande(db, 1)),
+    Case("factures_client", lambda db: facture_service.get_factures(db, client_id=1)),
+    Case("factures_statut", lambda db: facture_service.get_factures(db, statut=StatutFacture.EN_RETARD)),
+    Case("facture_detail", lambda db: facture_service.get_facture(db, 1)),
+    Case("bl_statut", lambda db: livraison_service.get_bons_livraison(db, statut=StatutLivraison.EN_PREPARATION)),
+    Case("mouvements", lambda db: stock_service.get_mouvements(db)),
+    Case("alertes_stock", lambda db: stock_service.get_articles_sous_stock(db)),
+    Case("dashboard", lambda db: reporting_service.get_dashboard(db)),
+    Case("ca_mensuel", lambda db: reporting_service.get_ca_par_mois(db, ANNEE)),
+    Case("top_clients", lambda db: reporting_service.get_top_clients(db, 10, ANNEE)),
+    Case("top_articles", lambda db: reporting_service.get_top_articles(db, 10, ANNEE)),
+    Case("ca_par_famille", lambda db: reporting_service.get_ca_par_famille(db, ANNEE)),
+    Case("ca_par_region", lambda db: reporting_service.get_ca_par_region(db, ANNEE)),
+]
+
+
+class StatementCapture:
+    """Enregistre les SELECT émis par le moteur pendant l'exécution d'un cas."""
+
+    def __init__(self, sync_engine):
+        self.active = False
+        self.statements: list[tuple[str, object]] = []
+        event.listen(sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, _conn, _cursor, statement, parameters, _context, _executemany) -> None:
+        if self.active and statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+
+# --- Lecture des plans -----------------------------------------------------------
+
+def _pg_nodes(node: dict, depth: int = 0):
+    label = node["Node Type"]
+    if "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    yield depth, label, node
+    for child in node.get("Plans", []):
+        yield from _pg_nodes(child, depth + 1)
+
+
+async def explain_pg(conn, statement: str, parameters) -> tuple[list[str], list[str]]:
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    plan = result.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    lines, scanned = [], []
+    for depth, label, node in _pg_nodes(plan[0]["Plan"]):
+        lines.append("  " * depth + label)
+        if node["Node Type"] == "Seq Scan":
+            scanned.append(node["Relation Name"])
+    return lines, scanned
+
+
+async def explain_sqlite(conn, statement: str, parameters) -> tuple[list[str], list[str]]:
+    result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    lines, scanned = [], []
+    for row in result:
+        detail = row[-1]
+        lines.append(detail)
+        words = detail.split()
+        if words[0] == "SCAN" and "INDEX" not in words:
+            scanned.append(words[1])
+    return lines, scanned
+
+
+async def table_sizes(conn) -> dict[str, int]:
+    if conn.dialect.name == "postgresql":
+        result = await conn.execute(text(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind IN ('r', 'p') "
+            "AND relnamespace = 'public'::regnamespace"
+        ))
+        return {name: count for name, count in result}
+    tables = [row[0] for row in await conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    return {t: (await conn.exec_driver_sql(f'SELECT count(*) FROM "{t}"')).scalar() for t in tables}
+
+
+async def check_plans(only: str | None = None, min_rows: int = 10_000) -> tuple[dict, list[str]]:
+    capture = StatementCapture(engine.sync_engine)
+    plans: dict[str, list[list[str]]] = {}
+    issues: list[str] = []
+
+    async with engine.connect() as conn:
+        sizes = await table_sizes(conn)
+        explain = explain_pg if conn.dialect.name == "postgresql" else explain_sqlite
+
+        for case in CASES:
+            if only and only not in case.name:
+                continue
+            capture.statements.clear()
+            capture.active = True
+            async with async_session() as db:
+                await case.call(db)
+            capture.active = False
+
+            plans[case.name] = []
+            for statement, parameters in capture.statements:
+                lines, scanned = await explain(conn, statement, parameters)
+                plans[case.name].append(lines)
+                for table in scanned:
+                    if sizes.get(table, 0) >= min_rows and (case.name, table) not in SCANS_ADMIS:
+                        issues.append(f"{case.name} : parcours séquentiel de {table} ({sizes[table]:,} lignes)")
+    return plans, issues
+
+
+def compare(plans: dict, snapshot: dict) -> list[str]:
+    changes = []
+    for name, case_plans in plans.items():
+        if name in snapshot and snapshot[name] != case_plans:
+            changes.append(f"{name} : plan modifié depuis l'instantané")
+    return changes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Contrôle des plans d'exécution des services")
+    parser.add_argument("--only", help="Ne contrôle que les cas dont le nom contient ce texte")
+    parser.add_argument(
+        "--min-rows", type=int, default=10_000, help="Taille à partir de laquelle un parcours complet est signalé"
+    )
+    parser.add_argument("--snapshot", type=Path, help="Instantané (défaut : benchmarks/query_plans_<sgbd>.json)")
+    parser.add_argument("--update-snapshot", action="store_true", help="Enregistre les plans comme référence")
+    args = parser.parse_args()
+
+    snapshot_path = args.snapshot or SNAPSHOT_DIR / f"query_plans_{engine.dialect.name}.json"
+    plans, issues = asyncio.run(check_plans(args.only, args.min_rows))
+
+    for name, case_plans in plans.items():
+        print(f"{name} ({len(case_plans)} requêtes)")
+        for lines in case_plans:
+            for line in lines:
+                print(f"    {line}")
+            print()
+
+    if args.update_snapshot:
+        snapshot = json.loads(snapshot_path.read_text(encoding="utf-8")) if snapshot_path.exists() else {}
+        snapshot.update(plans)
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        snapshot_path.write_text(json.dumps(snapshot, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Instantané enregistré dans {snapshot_path}")
+    elif snapshot_path.exists():
+        issues += compare(plans, json.loads(snapshot_path.read_text(encoding="utf-8")))
+
+    if issues:
+        print("Anomalies :")
+        for issue in issues:
+            print(f"  - {issue}")
+        return 1
+    print("Aucune anomalie")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
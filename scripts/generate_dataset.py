@@ -0,0 +1,454 @@
+"""
+Générateur de jeu de données volumineux pour les mesures de performance.
+
+Produit des données réalistes et cohérentes (clés étrangères valides, totaux
+recalculés à partir des lignes) à une échelle configurable. À l'échelle 1 :
+
+- 200 fournisseurs, 60 VRP, 20 000 clients
+- 50 000 articles, avec tailles et couleurs pour l'équipement
+- 600 000 commandes (~2,4 millions de lignes) sur 5 ans
+- une facture par commande facturée (~1,7 million de lignes)
+- 100 000 mouvements de stock (entrées fournisseurs, sorties, retours)
+
+Le tirage est piloté par une graine : deux exécutions avec les mêmes options
+produisent exactement les mêmes données, ce qui rend les mesures comparables.
+Les identifiants sont attribués par le script, la base doit donc être vide
+(--reset supprime et recrée toutes les tables).
+
+Le chargement réutilise celui de migrate_hyperfile.py : COPY sur PostgreSQL
+(asyncpg), INSERT multi-lignes ailleurs (SQLite).
+
+Usage :
+    python scripts/generate_dataset.py --reset [--scale 0.1] [--seed 42]
+
+Un compte bench@gescom.fr / bench123 (admin) est créé pour les benchmarks.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+from sqlalchemy import func, select, text
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.auth.service import hash_password
+from app.config import settings
+from app.database import Base, async_session, engine
+from app.models import (
+    VRP,
+    Article,
+    ArticleCouleur,
+    ArticleTaille,
+    Client,
+    Commande,
+    Facture,
+    FactureCommande,
+    LigneCommande,
+    LigneFacture,
+    LigneMouvementStock,
+    MouvementStock,
+    Paiement,
+    User,
+)
+from app.models.commande import StatutCommande
+from app.models.facture import StatutFacture
+from app.models.fournisseur import Fournisseur
+from app.models.stock import TypeMouvement
+from app.models.user import Role
+from app.services import client_service, disponibilite_service, partition_service
+from scripts.migrate_hyperfile import _copy_batch, _insert_batch
+
+BATCH_SIZE = 5000
+DATE_FIN = datetime(2025, 12, 31, 18, 0, tzinfo=timezone.utc)
+ANNEES = 5
+
+VOLUMES = {
+    "fournisseurs": 200,
+    "vrps": 60,
+    "clients": 20_000,
+    "articles": 50_000,
+    "commandes": 600_000,
+    "mouvements": 100_000,
+}
+
+FAMILLES = {
+    "Casques": ("Moto", "Scooter", "Touring", "Cross"),
+    "Gants": ("Moto", "Été", "Hiver", "Racing"),
+    "Blousons": ("Moto", "Touring", "Urbain"),
+    "Pantalons": ("Moto", "Touring", "Piste"),
+    "Bottes": ("Moto", "Racing", "Urbain"),
+    "Accessoires": ("Sécurité", "Bagagerie", "Entretien"),
+    "Écrans": ("Accessoires",),
+    "Pièces": ("Freinage", "Transmission", "Éclairage"),
+}
+AVEC_TAILLES = {"Casques": ("XS", "S", "M", "L", "XL", "XXL"), "Gants": ("S", "M", "L", "XL"),
+                "Blousons": ("S", "M", "L", "XL", "XXL", "3XL"), "Pantalons": ("38", "40", "42", "44", "46", "48"),
+                "Bottes": ("39", "40", "41", "42", "43", "44", "45", "46")}
+COULEURS = (("Noir", "#000000"), ("Blanc", "#FFFFFF"), ("Rouge", "#C00000"), ("Bleu", "#1F4E9A"),
+            ("Gris", "#808080"), ("Jaune fluo", "#DFFF00"), ("Vert", "#2E7D32"), ("Orange", "#FF6F00"))
+MARQUES = ("NKF Racing", "NKF City", "NKF Travel", "NKF Lock", "NKF Vision", "NKF Pro")
+VILLES = (("75011", "Paris"), ("69002", "Lyon"), ("13008", "Marseille"), ("31000", "Toulouse"),
+          ("44000", "Nantes"), ("33000", "Bordeaux"), ("59000", "Lille"), ("67000", "Strasbourg"),
+          ("06000", "Nice"), ("35000", "Rennes"), ("34000", "Montpellier"), ("21000", "Dijon"))
+DEPOTS = ("Principal", "Lyon", "Marseille")
+TYPES_CLIENT = ("magasin", "magasin", "magasin", "concession", "standard")
+MODES_REGLEMENT = ("virement", "cheque", "LCR", "prelevement")
+
+
+def _montant(centimes: int) -> Decimal:
+    return Decimal(centimes).scaleb(-2)
+
+
+def _skewed(rng: random.Random, n: int) -> int:
+    """Identifiant 1..n tiré avec une forte asymétrie : quelques clients ou articles font l'essentiel du volume."""
+    return int(n * rng.random() ** 2.5) + 1
+
+
+class Catalogue:
+    """Attributs des articles gardés en mémoire pour composer les lignes de pièces."""
+
+    def __init__(self):
+        self.designations: list[str] = []
+        self.prix: list[int] = []
+        self.tva: list[Decimal] = []
+        self.tailles: list[tuple] = []
+        self.couleurs: list[tuple] = []
+
+
+# --- Référentiels --------------------------------------------------------------------
+
+def gen_fournisseurs(rng: random.Random, n: int):
+    for i in range(1, n + 1):
+        cp, ville = rng.choice(VILLES)
+        yield {"id": i, "code": f"FOUR-{i:05d}", "raison_sociale": f"Fournisseur {i}", "code_postal": cp,
+               "ville": ville, "pays": "France", "actif": True}
+
+
+def gen_vrps(rng: random.Random, n: int):
+    for i in range(1, n + 1):
+        yield {"id": i, "code_vrp": f"VRP-{i:04d}", "nom": f"Commercial {i}", "secteur": f"Secteur {i % 12 + 1}",
+               "taux_commission": Decimal(rng.choice((4, 5, 6))),
+               "objectif_ca": _montant(rng.randint(80_000, 250_000) * 100), "actif": True}
+
+
+def gen_clients(rng: random.Random, n: int, n_vrps: int):
+    for i in range(1, n + 1):
+        cp, ville = rng.choice(VILLES)
+        yield {"id": i, "code_client": f"CLI-{i:06d}", "raison_sociale": f"Moto {ville} {i}",
+               "type_client": rng.choice(TYPES_CLIENT), "email": f"contact{i}@client.fr",
+               "adresse": f"{rng.randint(1, 200)} rue du Commerce", "code_postal": cp, "ville": ville,
+               "pays": "France", "vrp_id": i % n_vrps + 1,
+               "encours_max": _montant(rng.choice((0, 5_000, 20_000, 50_000)) * 100),
+               "mode_reglement": rng.choice(MODES_REGLEMENT), "delai_reglement": rng.choice((30, 30, 45, 60)),
+               "actif": rng.random() > 0.03}
+
+
+def gen_articles(rng: random.Random, n: int, n_fournisseurs: int, catalogue: Catalogue):
+    familles = list(FAMILLES)
+    for i in range(1, n + 1):
+        famille = rng.choice(familles)
+        gamme = rng.choice(FAMILLES[famille])
+        achat = rng.randint(200, 40_000)
+        vente = int(achat * rng.uniform(1.6, 2.4))
+        tva = Decimal("5.50") if rng.random() < 0.02 else Decimal("20.00")
+        designation = f"{famille[:-1] if famille.endswith('s') else famille} {gamme} {i}"
+        catalogue.designations.append(designation)
+        catalogue.prix.append(vente)
+        catalogue.tva.append(tva)
+        tailles = AVEC_TAILLES.get(famille, ())
+        couleurs = tuple(rng.sample(COULEURS, rng.randint(1, 4))) if tailles else ()
+        catalogue.tailles.append(tailles)
+        catalogue.couleurs.append(couleurs)
+        yield {"id": i, "reference": f"{famille[:4].upper()}-{i:06d}", "designation": designation,
+               "famille": famille, "gamme": gamme, "marque": rng.choice(MARQUES),
+               "fournisseur_id": rng.randint(1, n_fournisseurs), "prix_achat_ht": _montant(achat),
+               "prix_vente_ht": _montant(vente), "tva": tva, "stock_actuel": rng.randint(0, 500),
+               "stock_minimum": rng.choice((0, 5, 10, 20)), "code_barre": f"376{i:010d}",
+               "unite": "pièce", "ebusiness": rng.random() < 0.3, "actif": rng.random() > 0.05}
+
+
+def gen_variantes(rng: random.Random, catalogue: Catalogue):
+    """Tailles et couleurs des articles d'équipement, dans l'ordre des articles."""
+    tailles, couleurs = [], []
+    variantes = zip(catalogue.tailles, catalogue.couleurs, strict=True)
+    for article_id, (article_tailles, article_couleurs) in enumerate(variantes, 1):
+        tailles.extend({"article_id": article_id, "taille": t, "stock": rng.randint(0, 60)} for t in article_tailles)
+        couleurs.extend({"article_id": article_id, "couleur": c, "code_hex": h, "stock": rng.randint(0, 80)}
+                        for c, h in article_couleurs)
+        if len(tailles) >= BATCH_SIZE:
+            yield {ArticleTaille: tailles, ArticleCouleur: couleurs}
+            tailles, couleurs = [], []
+    if tailles or couleurs:
+        yield {ArticleTaille: tailles, ArticleCouleur: couleurs}
+
+
+# --- Pièces ---------------------------------------------------------------------------
+
+def _statut_commande(rng: random.Random, age: timedelta) -> StatutCommande:
+    if age > timedelta(days=60):
+        tirage = rng.random()
+        if tirage < 0.85:
+            return StatutCommande.FACTUREE
+        return StatutCommande.ANNULEE if tirage < 0.9 else StatutCommande.LIVREE
+    return rng.choice((StatutCommande.BROUILLON, StatutCommande.VALIDEE, StatutCommande.EN_PREPARATION,
+                       StatutCommande.EXPEDIEE, StatutCommande.LIVREE, StatutCommande.FACTUREE))
+
+
+def _statut_facture(rng: random.Random, echeance: datetime) -> tuple[StatutFacture, float]:
+    """Statut et part réglée d'une facture selon son échéance."""
+    retard = DATE_FIN - echeance
+    if retard > timedelta(days=90):
+        return (StatutFacture.PAYEE, 1.0) if rng.random() < 0.97 else (StatutFacture.EN_RETARD, 0.0)
+    if retard > timedelta(0):
+        tirage = rng.random()
+        if tirage < 0.7:
+            return StatutFacture.PAYEE, 1.0
+        return (StatutFacture.PAYEE_PARTIELLEMENT, 0.5) if tirage < 0.8 else (StatutFacture.EN_RETARD, 0.0)
+    return rng.choice(((StatutFacture.EMISE, 0.0), (StatutFacture.ENVOYEE, 0.0), (StatutFacture.PAYEE, 1.0)))
+
+
+def _lots_pieces() -> dict:
+    return {Commande: [], LigneCommande: [], Facture: [], FactureCommande: [], LigneFacture: [], Paiement: []}
+
+
+def gen_pieces(rng: random.Random, volumes: dict, catalogue: Catalogue):
+    """Commandes, factures, leurs lignes, liens factures-commandes et paiements, par lots (ordre des clés étrangères).
+
+    Les commandes sont réparties chronologiquement sur la période : les numéros
+    croissent avec les dates, comme dans l'application.
+    """
+    n_commandes = volumes["commandes"]
+    n_articles = volumes["articles"]
+    debut = DATE_FIN - timedelta(days=365 * ANNEES)
+    periode = (DATE_FIN - debut).total_seconds()
+    facture_id = 0
+    ligne_facture_id = 0
+    ligne_commande_id = 0
+    lots = _lots_pieces()
+
+    for commande_id in range(1, n_commandes + 1):
+        date = debut + timedelta(seconds=periode * (commande_id - rng.random()) / n_commandes)
+        client_id = _skewed(rng, volumes["clients"])
+        vrp_id = client_id % volumes["vrps"] + 1
+        statut = _statut_commande(rng, DATE_FIN - date)
+        remise = Decimal(rng.choice((0, 0, 0, 2, 5, 10)))
+
+        lignes = []
+        total_ht = 0
+        total_tva = Decimal(0)
+        for numero_ligne in range(1, min(1 + int(rng.expovariate(1 / 3)), 30) + 1):
+            index = _skewed(rng, n_articles) - 1
+            quantite = rng.choice((1, 1, 2, 2, 3, 5, 6, 10, 12, 24))
+            prix = catalogue.prix[index]
+            remise_ligne = rng.choice((0, 0, 0, 5, 10, 15))
+            montant = round(quantite * prix * (100 - remise_ligne) / 100)
+            total_ht += montant
+            total_tva += _montant(montant) * catalogue.tva[index] / 100
+            lignes.append({
+                "article_id": index + 1, "ligne_numero": numero_ligne, "designation": catalogue.designations[index],
+                "quantite": quantite, "prix_unitaire_ht": _montant(prix), "remise_pct": Decimal(remise_ligne),
+                "tva_pct": catalogue.tva[index], "montant_ht": _montant(montant),
+                "taille": rng.choice(catalogue.tailles[index]) if catalogue.tailles[index] else None,
+                "couleur": rng.choice(catalogue.couleurs[index])[0] if catalogue.couleurs[index] else None,
+            })
+
+        ht = _montant(total_ht) * (100 - remise) / 100
+        tva = (total_tva * (100 - remise) / 100).quantize(Decimal("0.01"))
+        ht = ht.quantize(Decimal("0.01"))
+        livree = statut in (StatutCommande.LIVREE, StatutCommande.FACTUREE)
+        lots[Commande].append({
+            "id": commande_id, "numero": f"CMD-{commande_id:06d}", "client_id": client_id, "vrp_id": vrp_id,
+            "statut": statut, "date_commande": date, "date_livraison_souhaitee": date + timedelta(days=10),
+            "pays_livraison": "France", "total_ht": ht, "total_tva": tva, "total_ttc": ht + tva,
+            "remise_globale_pct": remise,
+        })
+        for ligne in lignes:
+            ligne_commande_id += 1
+            lots[LigneCommande].append({"id": ligne_commande_id, "commande_id": commande_id,
+                                        "quantite_livree": ligne["quantite"] if livree else 0, **ligne})
+
+        if statut == StatutCommande.FACTUREE:
+            facture_id += 1
+            date_facture = date + timedelta(days=rng.randint(1, 10))
+            echeance = date_facture + timedelta(days=30)
+            statut_facture, part_reglee = _statut_facture(rng, echeance)
+            lots[Facture].append({
+                "id": facture_id, "numero": f"FAC-{facture_id:06d}", "client_id": client_id,
+                "commande_id": commande_id, "vrp_id": vrp_id, "statut": statut_facture,
+                "date_facture": date_facture, "date_echeance": echeance, "mode_reglement": rng.choice(MODES_REGLEMENT),
+                "total_ht": ht, "total_tva": tva, "total_ttc": ht + tva, "remise_globale_pct": remise,
+                "montant_regle": ((ht + tva) * Decimal(part_reglee)).quantize(Decimal("0.01")),
+            })
+            lots[FactureCommande].append({"facture_id": facture_id, "commande_id": commande_id})
+            if part_reglee:
+                lots[Paiement].append({
+                    "id": facture_id, "facture_id": facture_id, "montant": lots[Facture][-1]["montant_regle"],
+                    "date_paiement": min(echeance + timedelta(days=rng.randint(-25, 20)), DATE_FIN),
+                    "mode_reglement": lots[Facture][-1]["mode_reglement"],
+                })
+            for ligne in lignes:
+                ligne_facture_id += 1
+                lots[LigneFacture].append({
+                    "id": ligne_facture_id, "facture_id": facture_id, "date_facture": date_facture, **ligne,
+                })
+
+        if len(lots[LigneCommande]) >= BATCH_SIZE:
+            yield lots
+            lots = _lots_pieces()
+    yield lots
+
+
+def gen_mouvements(rng: random.Random, volumes: dict, catalogue: Catalogue):
+    n_mouvements = volumes["mouvements"]
+    debut = DATE_FIN - timedelta(days=365 * ANNEES)
+    periode = (DATE_FIN - debut).total_seconds()
+    ligne_id = 0
+    lots = {MouvementStock: [], LigneMouvementStock: []}
+
+    for mouvement_id in range(1, n_mouvements + 1):
+        tirage = rng.random()
+        if tirage < 0.6:
+            type_mouvement, source, destination = TypeMouvement.ENTREE, None, rng.choice(DEPOTS)
+            document = f"FOUR-{rng.randint(1, volumes['fournisseurs']):05d}"
+        elif tirage < 0.9:
+            type_mouvement, source, destination = TypeMouvement.SORTIE, rng.choice(DEPOTS), None
+            document = f"CMD-{rng.randint(1, volumes['commandes']):06d}"
+        elif tirage < 0.97:
+            type_mouvement, source, destination = TypeMouvement.RETOUR, None, "Principal"
+            document = None
+        else:
+            type_mouvement, source, document = TypeMouvement.TRANSFERT, "Principal", None
+            destination = rng.choice(DEPOTS[1:])
+        date_mouvement = debut + timedelta(seconds=periode * (mouvement_id - rng.random()) / n_mouvements)
+        lots[MouvementStock].append({
+            "id": mouvement_id, "numero": f"MVT-{mouvement_id:06d}", "type_mouvement": type_mouvement,
+            "date_mouvement": date_mouvement,
+            "depot_source": source, "depot_destination": destination, "reference_document": document,
+        })
+        for _ in range(rng.randint(1, 10)):
+            index = _skewed(rng, volumes["articles"]) - 1
+            ligne_id += 1
+            lots[LigneMouvementStock].append({
+                "id": ligne_id, "mouvement_id": mouvement_id, "date_mouvement": date_mouvement, "article_id": index + 1,
+                "quantite": rng.choice((1, 5, 10, 24, 50, 100)), "prix_unitaire": _montant(catalogue.prix[index] // 2),
+                "taille": rng.choice(catalogue.tailles[index]) if catalogue.tailles[index] else None,
+                "couleur": rng.choice(catalogue.couleurs[index])[0] if catalogue.couleurs[index] else None,
+            })
+
+        if len(lots[LigneMouvementStock]) >= BATCH_SIZE:
+            yield lots
+            lots = {MouvementStock: [], LigneMouvementStock: []}
+    yield lots
+
+
+# --- Chargement -----------------------------------------------------------------------
+
+def _batched(rows, size: int = BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Loader:
+    def __init__(self, conn):
+        self.conn = conn
+        use_copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "asyncpg"
+        self._load_batch = _copy_batch if use_copy else _insert_batch
+        self.counts: dict[str, int] = {}
+
+    async def load(self, model_class, rows: list[dict]) -> None:
+        if not rows:
+            return
+        table = model_class.__table__
+        await self._load_batch(self.conn, table, list(rows[0]), rows, None)
+        await self.conn.commit()
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    async def load_all(self, model_class, rows) -> None:
+        for batch in _batched(rows):
+            await self.load(model_class, batch)
+
+    async def load_lots(self, lots) -> None:
+        for lot in lots:
+            for model_class, rows in lot.items():
+                await self.load(model_class, rows)
+            print(f"    {sum(self.counts.values()):,} lignes chargées", end="\r")
+
+    async def reset_sequences(self) -> None:
+        """Les identifiants ayant été fournis, les séquences PostgreSQL sont recalées."""
+        if self.conn.dialect.name != "postgresql":
+            return
+        for table in self.counts:
+            if "id" not in Base.metadata.tables[table].c:
+                continue
+            await self.conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+            ))
+        await self.conn.commit()
+
+
+async def generate(scale: float = 1.0, seed: int = 42, reset: bool = False) -> dict[str, int]:
+    volumes = {name: max(1, int(n * scale)) for name, n in VOLUMES.items()}
+    rng = random.Random(seed)
+    catalogue = Catalogue()
+
+    async with engine.begin() as conn:
+        if reset:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    start = time.perf_counter()
+    async with engine.connect() as conn:
+        if (await conn.execute(select(func.count()).select_from(Article.__table__))).scalar():
+            raise SystemExit("La base contient déjà des articles : relancer avec --reset.")
+
+        loader = Loader(conn)
+        await loader.load(User, [{
+            "email": "bench@gescom.fr", "nom": "Bench", "prenom": "GesCom",
+            "hashed_password": hash_password("bench123"), "role": Role.ADMIN, "is_active": True,
+        }])
+        await loader.load_all(Fournisseur, gen_fournisseurs(rng, volumes["fournisseurs"]))
+        await loader.load_all(VRP, gen_vrps(rng, volumes["vrps"]))
+        await loader.load_all(Client, gen_clients(rng, volumes["clients"], volumes["vrps"]))
+        await loader.load_all(Article, gen_articles(rng, volumes["articles"], volumes["fournisseurs"], catalogue))
+        await loader.load_lots(gen_variantes(rng, catalogue))
+        await loader.load_lots(gen_pieces(rng, volumes, catalogue))
+        await loader.load_lots(gen_mouvements(rng, volumes, catalogue))
+        await loader.reset_sequences()
+
+        if (settings.PARTITIONNEMENT_ANNUEL and conn.dialect.name == "postgresql"
+                and not await conn.run_sync(partition_service.is_partitioned, "factures")):
+            print("\n  Partitionnement annuel des factures et mouvements...")
+            await conn.run_sync(partition_service.partition_tables)
+            await conn.commit()
+
+    async with async_session() as db:
+        await client_service.recalculer_encours(db)
+        await disponibilite_service.initialiser(db)
+        await db.commit()
+
+    elapsed = time.perf_counter() - start
+    total = sum(loader.counts.values())
+    print(f"\nJeu de données généré en {elapsed:.1f}s ({total / elapsed:,.0f} lignes/s) :")
+    for table, count in loader.counts.items():
+        print(f"  {table:<24} {count:>10,}")
+    return loader.counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génération d'un jeu de données volumineux")
+    parser.add_argument("--scale", type=float, default=1.0, help="Facteur appliqué aux volumes (1 = 50 000 articles)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du tirage (données reproductibles)")
+    parser.add_argument("--reset", action="store_true", help="Supprime et recrée toutes les tables")
+    args = parser.parse_args()
+    asyncio.run(generate(args.scale, args.seed, args.reset))
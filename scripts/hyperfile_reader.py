@@ -0,0 +1,170 @@
+"""
+Lecteur natif des fichiers de données HyperFile (.fic / .mmo).
+
+Évite l'étape d'export CSV depuis WinDev : les fichiers .fic sont projetés en
+mémoire (mmap) et parcourus enregistrement par enregistrement. Chaque champ
+n'est décodé qu'au moment où il est lu, et les mémos (.mmo) ne sont chargés
+que s'ils sont demandés.
+
+HyperFile étant un format propriétaire, la structure d'un fichier est décrite
+par un fichier JSON (data/layouts/<fichier>.json) reprenant l'analyse WinDev :
+
+    {
+        "header_size": 512,
+        "record_size": 128,
+        "encoding": "cp1252",
+        "fields": [
+            {"name": "REFERENCE", "type": "texte", "offset": 1, "size": 20},
+            {"name": "PRIX_VENTE_HT", "type": "monetaire", "offset": 21, "size": 8},
+            {"name": "DESCRIPTION", "type": "memo", "offset": 29, "size": 4}
+        ]
+    }
+
+Les noms de champs sont ceux de l'analyse, c'est-à-dire les en-têtes des
+exports CSV : les mappings de migrate_hyperfile.py s'appliquent tels quels.
+Les valeurs sont restituées sous forme de texte, comme une cellule CSV.
+"""
+import json
+import mmap
+import struct
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+
+FIELD_TYPES = ("texte", "entier", "reel", "monetaire", "date", "heure", "booleen", "memo")
+
+
+@dataclass(frozen=True)
+class FicField:
+    name: str
+    type: str
+    offset: int
+    size: int
+
+    def __post_init__(self):
+        if self.type not in FIELD_TYPES:
+            raise ValueError(f"Type de champ HyperFile inconnu : {self.type}")
+
+
+@dataclass(frozen=True)
+class FicLayout:
+    """Description d'un fichier .fic : en-tête, taille d'enregistrement et champs.
+
+    Le premier octet de chaque enregistrement porte son état ; les valeurs de
+    ``deleted_markers`` désignent les enregistrements supprimés, qui sont ignorés.
+    """
+
+    record_size: int
+    fields: tuple[FicField, ...]
+    header_size: int = 0
+    encoding: str = "cp1252"
+    deleted_markers: bytes = b"\x01X"
+    money_scale: int = 4
+    _by_name: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_by_name", {f.name: f for f in self.fields})
+
+    @classmethod
+    def from_json(cls, path: Path) -> "FicLayout":
+        spec = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(
+            record_size=spec["record_size"],
+            header_size=spec.get("header_size", 0),
+            encoding=spec.get("encoding", "cp1252"),
+            deleted_markers=spec.get("deleted_markers", "\x01X").encode("latin-1"),
+            money_scale=spec.get("money_scale", 4),
+            fields=tuple(FicField(**f) for f in spec["fields"]),
+        )
+
+    def get_field(self, name: str) -> FicField | None:
+        return self._by_name.get(name)
+
+
+class MemoFile:
+    """Accès aux mémos (.mmo) : un bloc = longueur sur 4 octets + contenu."""
+
+    def __init__(self, mm: mmap.mmap | None, encoding: str):
+        self._mm = mm
+        self._encoding = encoding
+
+    def read(self, offset: int) -> str:
+        if self._mm is None or offset <= 0 or offset + 4 > len(self._mm):
+            return ""
+        (length,) = struct.unpack_from("<I", self._mm, offset)
+        return self._mm[offset + 4:offset + 4 + length].decode(self._encoding, errors="replace")
+
+
+class FicRecord(Mapping):
+    """Enregistrement brut : les champs sont décodés à la demande."""
+
+    __slots__ = ("_raw", "_layout", "_memos")
+
+    def __init__(self, raw: bytes, layout: FicLayout, memos: MemoFile):
+        self._raw = raw
+        self._layout = layout
+        self._memos = memos
+
+    def __getitem__(self, name: str) -> str:
+        fic_field = self._layout.get_field(name)
+        if fic_field is None:
+            raise KeyError(name)
+        raw = self._raw[fic_field.offset:fic_field.offset + fic_field.size]
+        return _decode(raw, fic_field, self._layout, self._memos)
+
+    def __iter__(self):
+        return (f.name for f in self._layout.fields)
+
+    def __len__(self) -> int:
+        return len(self._layout.fields)
+
+
+def _decode(data: bytes, fic_field: FicField, layout: FicLayout, memos: MemoFile) -> str:
+    kind = fic_field.type
+    if kind in ("texte", "date", "heure"):
+        return data.split(b"\x00", 1)[0].decode(layout.encoding, errors="replace").strip()
+    if kind == "entier":
+        return str(int.from_bytes(data, "little", signed=True))
+    if kind == "reel":
+        return repr(struct.unpack("<d" if fic_field.size == 8 else "<f", data)[0])
+    if kind == "monetaire":
+        return str(Decimal(int.from_bytes(data, "little", signed=True)).scaleb(-layout.money_scale))
+    if kind == "booleen":
+        return "1" if any(data) else "0"
+    # memo : le champ contient l'offset du bloc dans le fichier .mmo
+    return memos.read(int.from_bytes(data, "little"))
+
+
+def read_fic(filepath: Path, layout: FicLayout, start_offset: int = 0) -> Iterator[tuple[int, FicRecord]]:
+    """Parcourt un fichier .fic et produit ``(offset, enregistrement)``.
+
+    Même contrat que la lecture CSV de migrate_hyperfile : ``offset`` est la
+    position en octets juste après l'enregistrement, utilisable comme point de reprise.
+    """
+    filepath = Path(filepath)
+    memo_path = filepath.with_suffix(".mmo")
+    with open(filepath, "rb") as f, _open_mmap(memo_path) as memo_mm:
+        if f.seek(0, 2) <= layout.header_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            memos = MemoFile(memo_mm, layout.encoding)
+            position = max(start_offset, layout.header_size)
+            end = len(mm) - layout.record_size
+            while position <= end:
+                raw = mm[position:position + layout.record_size]
+                position += layout.record_size
+                if raw[0] in layout.deleted_markers:
+                    continue
+                yield position, FicRecord(raw, layout, memos)
+
+
+@contextmanager
+def _open_mmap(path: Path):
+    """Projection optionnelle : un fichier .mmo absent ou vide donne ``None``."""
+    if not path.exists() or path.stat().st_size == 0:
+        yield None
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        yield mm
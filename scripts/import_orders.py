@@ -0,0 +1,57 @@
+"""
+Import de fichiers de commandes (EDI des grands comptes, CSV ou JSON lines).
+
+Même traitement que POST /api/v1/commandes/import (voir
+app/services/import_service.py) : chaque lot est validé séparément et un
+fichier déjà importé peut être rechargé sans doublon.
+
+Usage :
+    python scripts/import_orders.py commandes.csv --dry-run
+    python scripts/import_orders.py commandes.csv [--lot 500]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import async_session
+from app.schemas.commande import ImportCommandesRead
+from app.services import import_service
+
+
+async def importer(chemin: Path, taille: int = 500, dry_run: bool = False) -> ImportCommandesRead:
+    with chemin.open("rb") as fichier:
+        async with async_session() as db:
+            return await import_service.importer(db, import_service.ouvrir(fichier), dry_run, taille)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import de commandes par fichier")
+    parser.add_argument("fichier", type=Path, help="Fichier CSV ou JSON lines")
+    parser.add_argument("--lot", type=int, default=500, help="Commandes par transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Contrôle le fichier sans rien enregistrer")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        resultat = asyncio.run(importer(args.fichier, args.lot, args.dry_run))
+    except ValueError as exc:
+        print(f"Fichier illisible : {exc}", file=sys.stderr)
+        return 1
+    for erreur in resultat.erreurs:
+        print(f"  ligne {erreur.ligne} [{erreur.reference_client or '-'}] : {erreur.motif}")
+    verbe = "à importer" if args.dry_run else "importées"
+    print(
+        f"{resultat.commandes:,} commandes {verbe} sur {resultat.lues:,} lues, {resultat.rejetees:,} rejetées"
+        f" en {time.perf_counter() - start:.1f}s"
+    )
+    if resultat.premier_numero:
+        print(f"Numéros {resultat.premier_numero} à {resultat.dernier_numero}")
+    return 0 if not resultat.rejetees else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Facturation en masse des commandes (fin de mois).
+
+Facture les commandes expédiées ou livrées non facturées, par lots validés
+séparément : le script peut être interrompu et relancé (voir
+app/services/facturation_service.py).
+
+Usage :
+    python scripts/invoice_orders.py --jusqu-au 2026-10-31 --dry-run
+    python scripts/invoice_orders.py --jusqu-au 2026-10-31 [--grouper] [--client 42] [--lot 500]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import async_session
+from app.schemas.facture import FacturationCreate
+from app.services import facturation_service
+
+
+async def facturer(filtre: FacturationCreate, taille: int = 500, dry_run: bool = False) -> tuple[int, int]:
+    async with async_session() as db:
+        eligibles = await facturation_service.compter_eligibles(db, filtre)
+        print(f"{eligibles:,} commandes à facturer")
+        if dry_run:
+            return eligibles, 0
+        commandes = factures = 0
+        while (lot := await facturation_service.facturer_lot(db, filtre, taille)).commandes:
+            await db.commit()
+            commandes += lot.commandes
+            factures += len(lot.numeros)
+            print(f"  {commandes:>10,} / {eligibles:,} commandes, {factures:,} factures ({lot.numeros[-1]})")
+    return commandes, factures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Facturation en masse des commandes")
+    parser.add_argument("--jusqu-au", type=datetime.fromisoformat, help="Commandes passées jusqu'à cette date incluse")
+    parser.add_argument("--client", type=int, help="Limite à un client")
+    parser.add_argument("--vrp", type=int, help="Limite aux commandes d'un VRP")
+    parser.add_argument("--grouper", action="store_true", help="Une facture par client (et par remise globale)")
+    parser.add_argument("--lot", type=int, default=500, help="Commandes (ou clients avec --grouper) par transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Compte les commandes éligibles sans facturer")
+    args = parser.parse_args()
+
+    date_max = args.jusqu_au
+    if date_max is not None:
+        date_max = date_max.replace(hour=23, minute=59, second=59, tzinfo=date_max.tzinfo or timezone.utc)
+    filtre = FacturationCreate(
+        client_id=args.client, vrp_id=args.vrp, date_commande_max=date_max, grouper_par_client=args.grouper,
+    )
+    start = time.perf_counter()
+    commandes, factures = asyncio.run(facturer(filtre, args.lot, args.dry_run))
+    if not args.dry_run:
+        print(f"{commandes:,} commandes facturées sur {factures:,} factures en {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Test de charge : simulation de la saisie de commandes du matin.
+
+Des utilisateurs virtuels enchaînent des scénarios pondérés pendant une durée
+donnée : les commerciaux recherchent des articles, saisissent et valident des
+commandes, facturent et consultent le tableau de bord ; les magasiniers
+créent et expédient les BL des commandes validées.
+
+L'application est pilotée en mémoire (ASGI, base configurée par DATABASE_URL)
+ou via HTTP avec --url. Le rapport donne, par étape : nombre d'appels, taux
+d'erreur, débit et latences p50 / p95 / p99.
+
+Usage :
+    python scripts/load_test.py --commerciaux 40 --magasiniers 5 --duree 120
+    python scripts/load_test.py --url http://localhost:8000 --output charge.json
+
+Le compte bench@gescom.fr créé par generate_dataset.py est utilisé. Les
+commandes sont saisies avec ``forcer=true`` : le contrôle d'encours est
+exécuté, mais un client du jeu au-delà de son plafond ne bloque pas la saisie.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+BENCH_USER = {"email": "bench@gescom.fr", "password": "bench123"}
+
+
+class Stats:
+    """Latences et erreurs collectées par étape."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, step: str, elapsed_ms: float, status: int | None) -> None:
+        self.latencies[step].append(elapsed_ms)
+        if status is None or status >= 400:
+            self.errors[step][str(status or "exception")] += 1
+
+    def report(self, duration: float) -> dict:
+        report = {}
+        for step, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            q = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+            report[step] = {
+                "appels": len(values),
+                "erreurs": dict(self.errors[step]),
+                "taux_erreur_pct": round(100 * sum(self.errors[step].values()) / len(values), 2),
+                "debit_par_s": round(len(values) / duration, 2),
+                "p50_ms": round(q[49], 1),
+                "p95_ms": round(q[94], 1),
+                "p99_ms": round(q[98], 1),
+            }
+        return report
+
+
+class Session:
+    """Un utilisateur virtuel : son client HTTP, son jeton et les files partagées."""
+
+    def __init__(self, http: AsyncClient, stats: Stats, shared: "Shared", rng: random.Random):
+        self.http = http
+        self.stats = stats
+        self.shared = shared
+        self.rng = rng
+        self.headers: dict = {}
+
+    async def step(self, name: str, method: str, url: str, body: dict | None = None) -> dict | None:
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, json=body, headers=self.headers)
+        except Exception:
+            self.stats.record(name, (time.perf_counter() - start) * 1000, None)
+            return None
+        self.stats.record(name, (time.perf_counter() - start) * 1000, response.status_code)
+        if response.status_code >= 400 or not response.headers.get("content-type", "").startswith("application/json"):
+            return None
+        return response.json()
+
+    async def login(self) -> bool:
+        token = await self.step("login", "POST", "/auth/login", BENCH_USER)
+        if token:
+            self.headers = {"Authorization": f"Bearer {token['access_token']}"}
+        return token is not None
+
+
+class Shared:
+    """Données de référence et pièces en attente de traitement, partagées entre utilisateurs."""
+
+    def __init__(self, articles: list[dict], clients: list[dict]):
+        self.articles = articles
+        self.clients = clients
+        self.a_livrer: asyncio.Queue[int] = asyncio.Queue()
+        self.a_facturer: asyncio.Queue[int] = asyncio.Queue()
+
+
+# --- Scénarios -------------------------------------------------------------------------
+
+async def recherche(s: Session) -> None:
+    article = s.rng.choice(s.shared.articles)
+    client = s.rng.choice(s.shared.clients)
+    await s.step("recherche_articles", "GET", f"/api/v1/articles?search={article['designation'].split()[0]}")
+    await s.step("recherche_clients", "GET", f"/api/v1/clients?search={client['raison_sociale'].split()[0]}")
+
+
+async def saisie_commande(s: Session) -> None:
+    article = s.rng.choice(s.shared.articles)
+    await s.step("recherche_articles", "GET", f"/api/v1/articles?search={article['designation'].split()[0]}")
+    lignes = [
+        {"article_id": a["id"], "designation": a["designation"], "quantite": s.rng.randint(1, 12),
+         "prix_unitaire_ht": a["prix_vente_ht"]}
+        for a in s.rng.choices(s.shared.articles, k=s.rng.randint(3, 25))
+    ]
+    commande = await s.step("creer_commande", "POST", "/api/v1/commandes?forcer=true",
+                            {"client_id": s.rng.choice(s.shared.clients)["id"], "lignes": lignes})
+    if commande and await s.step("valider_commande", "POST", f"/api/v1/commandes/{commande['id']}/valider?forcer=true"):
+        s.shared.a_livrer.put_nowait(commande["id"])
+
+
+async def facturation(s: Session) -> None:
+    try:
+        commande_id = s.shared.a_facturer.get_nowait()
+    except asyncio.QueueEmpty:
+        return await recherche(s)
+    await s.step("facturer", "POST", f"/api/v1/commandes/{commande_id}/facturer")
+
+
+async def expedition(s: Session) -> None:
+    try:
+        commande_id = s.shared.a_livrer.get_nowait()
+    except asyncio.QueueEmpty:
+        return await tableau_de_bord(s)
+    bl = await s.step("livrer_commande", "POST", f"/api/v1/commandes/{commande_id}/livrer")
+    if not bl or not await s.step("expedier_bl", "POST", f"/api/v1/livraisons/{bl['bl_id']}/expedier"):
+        return
+    # Seule une commande entièrement expédiée est facturable ; un reliquat attend le réassort
+    commande = await s.step("consulter_commande", "GET", f"/api/v1/commandes/{commande_id}")
+    if commande and commande["statut"] == "expediee":
+        s.shared.a_facturer.put_nowait(commande_id)
+
+
+async def tableau_de_bord(s: Session) -> None:
+    await s.step("dashboard", "GET", "/api/v1/reporting/dashboard")
+
+
+Scenario = Callable[[Session], Awaitable[None]]
+
+PROFILS: dict[str, dict[Scenario, int]] = {
+    "commercial": {saisie_commande: 60, recherche: 20, facturation: 10, tableau_de_bord: 10},
+    "magasinier": {expedition: 85, tableau_de_bord: 15},
+}
+
+
+async def virtual_user(session: Session, profil: str, deadline: float, think_time: float) -> None:
+    scenarios = list(PROFILS[profil])
+    weights = list(PROFILS[profil].values())
+    if not await session.login():
+        return
+    while time.monotonic() < deadline:
+        await session.rng.choices(scenarios, weights)[0](session)
+        if think_time:
+            await asyncio.sleep(session.rng.expovariate(1 / think_time))
+
+
+async def _reference_data(http: AsyncClient) -> Shared:
+    response = await http.post("/auth/login", json=BENCH_USER)
+    if response.status_code != 200:
+        raise SystemExit("Connexion impossible : le compte bench@gescom.fr est créé par generate_dataset.py")
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    articles = (await http.get("/api/v1/articles?actif=true&page_size=200", headers=headers)).json()["items"]
+    clients = (await http.get("/api/v1/clients?page_size=200", headers=headers)).json()["items"]
+    if not articles or not clients:
+        raise SystemExit("Base vide : lancer d'abord scripts/generate_dataset.py")
+    return Shared(articles, clients)
+
+
+async def run(commerciaux: int, magasiniers: int, duree: float, think_time: float,
+              url: str | None = None, seed: int = 42) -> dict:
+    if url:
+        http = AsyncClient(base_url=url, timeout=30)
+    else:
+        from app.main import app
+        # Les exceptions de l'application deviennent des réponses 500, comme derrière uvicorn.
+        transport = ASGITransport(app=app, raise_app_exceptions=False)
+        http = AsyncClient(transport=transport, base_url="http://charge", timeout=30)
+
+    stats = Stats()
+    async with http:
+        shared = await _reference_data(http)
+        rng = random.Random(seed)
+        profils = ["commercial"] * commerciaux + ["magasinier"] * magasiniers
+        start = time.monotonic()
+        deadline = start + duree
+        await asyncio.gather(*(
+            virtual_user(Session(http, stats, shared, random.Random(rng.random())), profil, deadline, think_time)
+            for profil in profils
+        ))
+        elapsed = time.monotonic() - start
+    return {"duree_s": round(elapsed, 1), "utilisateurs": len(profils), "etapes": stats.report(elapsed)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Test de charge GesCom (saisie de commandes)")
+    parser.add_argument("--commerciaux", type=int, default=40)
+    parser.add_argument("--magasiniers", type=int, default=5)
+    parser.add_argument("--duree", type=float, default=60, help="Durée en secondes")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Pause moyenne entre scénarios (s)")
+    parser.add_argument("--url", help="URL d'une instance lancée (sinon exécution en mémoire)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Écrit le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.commerciaux, args.magasiniers, args.duree, args.think_time, args.url, args.seed))
+
+    print(f"{report['utilisateurs']} utilisateurs pendant {report['duree_s']}s\n")
+    print(f"  {'étape':<20} {'appels':>7} {'erreurs':>8} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for step, m in report["etapes"].items():
+        print(
+            f"  {step:<20} {m['appels']:>7} {m['taux_erreur_pct']:>7.1f}% {m['debit_par_s']:>7.1f} "
+            f"{m['p50_ms']:>6.0f}ms {m['p95_ms']:>6.0f}ms {m['p99_ms']:>6.0f}ms  {m['erreurs'] or ''}"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
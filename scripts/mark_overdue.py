@@ -0,0 +1,40 @@
+"""
+Passage des factures échues en retard.
+
+Les factures émises ou envoyées dont l'échéance est dépassée passent au statut
+en_retard (voir facture_service.marquer_retards). Les ids des factures
+concernées sont écrits sur la sortie standard, un par ligne, pour la relance ;
+le résumé va sur la sortie d'erreur.
+
+Usage (cron, chaque nuit) :
+    python scripts/mark_overdue.py > relances_$(date +%F).txt
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import async_session
+from app.services import facture_service
+
+
+async def marquer() -> list[int]:
+    async with async_session() as db:
+        ids = await facture_service.marquer_retards(db)
+        await db.commit()
+    return ids
+
+
+def main() -> int:
+    start = time.perf_counter()
+    ids = asyncio.run(marquer())
+    for facture_id in ids:
+        print(facture_id)
+    print(f"{len(ids):,} factures passées en retard en {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,47 +11,359 @@ Usage :
     1. Exporter les données depuis WinDev en CSV (UTF-8, séparateur ;)
     2. Placer les fichiers CSV dans le dossier data/
     3. Exécuter : python scripts/migrate_hyperfile.py
+
+Sans export CSV : copier les .fic/.mmo dans data/, décrire leur structure dans
+data/layouts/<fichier>.json et exécuter avec --fic (voir hyperfile_reader.py).
+
+L'import est rejouable : les lignes sont fusionnées sur leur clé naturelle et
+un point de reprise est conservé par fichier (data/.migration_checkpoints.json).
+Un import interrompu reprend là où il s'était arrêté ; un nouvel export des
+mêmes fichiers (import delta) ne réécrit que les lignes modifiées.
+Option --reset : oublie les points de reprise et relit tous les fichiers.
+
+Fichiers attendus : fournisseurs, articles, clients, vrp (référentiels) puis
+commandes, factures, bons_livraison et leurs lignes (lignes_commande,
+lignes_facture, lignes_bon_livraison), reliés par code client, référence
+article et numéro de pièce.
 """
+import argparse
 import asyncio
 import csv
+import enum
+import json
 import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
 from pathlib import Path
 from decimal import Decimal
 
+from sqlalchemy import Column, MetaData, Table, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.database import engine, async_session, Base
-from app.models import *  # noqa
+from app.config import settings
+from app.database import async_session, engine, Base
+from app.models import (
+    VRP, Article, BonLivraison, Client, Commande, Facture, Fournisseur, LigneBonLivraison, LigneCommande, LigneFacture,
+)
+from app.models.commande import StatutCommande
+from app.models.facture import StatutFacture
+from app.models.livraison import StatutLivraison
+from app.services import client_service, disponibilite_service, numerotation_service
+from app.services.partition_service import TABLES as TABLES_PARTITIONNEES
+from scripts.hyperfile_reader import FicLayout, read_fic
 
 DATA_DIR = Path(__file__).parent.parent / "data"
+LAYOUTS_DIR = DATA_DIR / "layouts"
+SOURCE = "csv"
+
+BATCH_SIZE = 5000
+CHECKPOINT_FILE = DATA_DIR / ".migration_checkpoints.json"
+
+
+# --- Points de reprise ---------------------------------------------------------
+
+def _load_checkpoints() -> dict:
+    if CHECKPOINT_FILE.exists():
+        return json.loads(CHECKPOINT_FILE.read_text(encoding="utf-8"))
+    return {}
+
+
+def _save_checkpoints(checkpoints: dict) -> None:
+    """Écriture atomique : un arrêt brutal ne laisse jamais un fichier de reprise tronqué."""
+    tmp = CHECKPOINT_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoints, indent=2), encoding="utf-8")
+    tmp.replace(CHECKPOINT_FILE)
+
+
+def _file_signature(filepath: Path) -> dict:
+    stat = filepath.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+# --- Lecture ---------------------------------------------------------------------
+
+def _source(filename: str):
+    """Fichier à lire et fonction de lecture, selon la source choisie (CSV exporté ou .fic natif)."""
+    if SOURCE == "fic":
+        stem = Path(filename).stem
+        layout_path = LAYOUTS_DIR / f"{stem}.json"
+        if not layout_path.exists():
+            return None, None
+        layout = FicLayout.from_json(layout_path)
+        return DATA_DIR / f"{stem}.fic", lambda path, offset: read_fic(path, layout, offset)
+    return DATA_DIR / filename, _read_csv
+
+
+def _column_defaults(table, columns: list[str]) -> dict:
+    """Valeurs par défaut côté Python des colonnes importées (appliquées aux cellules vides)."""
+    defaults = {}
+    for name in columns:
+        column = table.c[name]
+        if column.default is not None and column.default.is_scalar:
+            defaults[name] = column.default.arg
+        else:
+            defaults[name] = None
+    return defaults
+
+
+def _insert_defaults(table, columns: list[str]) -> dict:
+    """Valeurs par défaut côté Python des autres colonnes, sans défaut côté serveur."""
+    return {
+        column.name: column.default.arg
+        for column in table.columns
+        if column.name not in columns and not column.primary_key and column.server_default is None
+        and column.default is not None and column.default.is_scalar
+    }
+
+
+def _read_csv(filepath: Path, start_offset: int = 0):
+    """Lit le CSV en flux et produit ``(offset, ligne)``.
+
+    ``offset`` est la position en octets juste après l'enregistrement : c'est la
+    valeur à sauvegarder pour reprendre l'import à l'enregistrement suivant.
+    """
+    with open(filepath, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")], delimiter=";"))
+        if start_offset > f.tell():
+            f.seek(start_offset)
+        position = f.tell()
+
+        def lines():
+            nonlocal position
+            for raw in iter(f.readline, b""):
+                position = f.tell()
+                yield raw.decode("utf-8")
+
+        for values in csv.reader(lines(), delimiter=";"):
+            if values:
+                # Ligne courte : les colonnes finales absentes restent vides
+                yield position, dict(zip(header, values, strict=False))
+
+
+def _iter_rows(records, field_mapping: dict, transforms: dict | None, defaults: dict, required: list[str], stats: dict):
+    """Applique le mapping et les transformations aux lignes lues.
+
+    Les lignes dont une colonne obligatoire reste vide (ex. code client inconnu,
+    numéro de ligne absent) sont écartées et comptées dans ``stats["rejets"]``,
+    par colonne dans ``stats["vides"]``, au lieu de faire échouer le lot.
+    Une colonne CSV peut alimenter plusieurs colonnes (tuple), chacune avec sa transformation.
+    """
+    for offset, row in records:
+        data = {}
+        for csv_col, db_cols in field_mapping.items():
+            raw = (row.get(csv_col) or "").strip()
+            for db_col in db_cols if isinstance(db_cols, tuple) else (db_cols,):
+                value = transforms[db_col](raw) if transforms and db_col in transforms else raw
+                data[db_col] = defaults[db_col] if value == "" else value
+        vides = [c for c in required if data[c] is None]
+        if vides:
+            stats["rejets"] += 1
+            stats["vides"].update(vides)
+            continue
+        yield offset, data
+
+
+def _batched(rows, size: int):
+    """Regroupe les lignes par lots ; renvoie ``(offset du dernier enregistrement, lot)``."""
+    batch = []
+    offset = 0
+    for offset, row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield offset, batch
+            batch = []
+    if batch:
+        yield offset, batch
+
+
+def _dedupe(batch: list[dict], natural_key: list[str]) -> list[dict]:
+    """Un même lot ne peut pas mettre à jour deux fois la même ligne : la dernière occurrence gagne."""
+    unique = {tuple(row[k] for k in natural_key): row for row in batch}
+    return list(unique.values())
+
+
+class KeyResolver:
+    """Résout un code métier (code client, référence article, numéro de pièce) en identifiant.
+
+    La table de correspondance est pré-chargée une fois pour tout le fichier :
+    les clés étrangères sont résolues en mémoire, sans requête par ligne.
+    """
+
+    def __init__(self, mapping: dict[str, int], label: str):
+        self.mapping = mapping
+        self.label = label
+        self.missing = 0
+
+    def __call__(self, code: str) -> int | None:
+        if not code:
+            return None
+        ident = self.mapping.get(code)
+        if ident is None:
+            self.missing += 1
+        return ident
+
+
+async def load_keys(code_column, id_column) -> dict[str, int]:
+    """Charge la correspondance code -> id d'une table en une seule requête."""
+    async with engine.connect() as conn:
+        result = await conn.execute(select(code_column, id_column))
+        return {code: ident for code, ident in result}
+
+
+# --- Chargement ------------------------------------------------------------------
+
+def _copy_value(value):
+    """Les Enum SQLAlchemy sont stockés par nom : COPY attend donc le nom du membre."""
+    return value.name if isinstance(value, enum.Enum) else value
+
+
+def _upsert_statement(insert_fn, table, columns: list[str], natural_key: list[str], insert_only=()):
+    """INSERT ... ON CONFLICT (clé naturelle) DO UPDATE, limité aux lignes réellement modifiées.
+
+    Les colonnes ``insert_only`` ne sont écrites qu'à la création de la ligne.
+    """
+    stmt = insert_fn(table)
+    updatable = [c for c in columns if c not in natural_key and c not in insert_only]
+    if not updatable:
+        return stmt.on_conflict_do_nothing(index_elements=natural_key)
+    return stmt.on_conflict_do_update(
+        index_elements=natural_key,
+        set_={c: stmt.excluded[c] for c in updatable},
+        where=or_(*[table.c[c].is_distinct_from(stmt.excluded[c]) for c in updatable]),
+    )
+
+
+async def _copy_batch(conn, table, columns: list[str], batch: list[dict], natural_key: list[str] | None) -> int:
+    """Chargement via COPY (asyncpg) : le plus rapide sur PostgreSQL.
+
+    Avec une clé naturelle, le lot est copié dans une table temporaire puis
+    fusionné par un seul ``INSERT ... SELECT ... ON CONFLICT``.
 
+    COPY n'applique pas les défauts côté Python du modèle : ceux des colonnes
+    absentes du lot (``actif``, ``pays``...) sont ajoutés aux enregistrements,
+    à la création seulement (une réimportation ne les remet pas à leur défaut).
+    """
+    raw = (await conn.get_raw_connection()).driver_connection
+    defaults = _insert_defaults(table, columns)
+    records = [tuple(_copy_value(row[c]) for c in columns) + tuple(defaults.values()) for row in batch]
+    columns = columns + list(defaults)
+    if natural_key is None:
+        await raw.copy_records_to_table(table.name, records=records, columns=columns)
+        return len(records)
 
-async def import_csv(filename: str, model_class, field_mapping: dict, transforms: dict | None = None):
-    """Importe un fichier CSV dans une table SQLAlchemy."""
-    filepath = DATA_DIR / filename
-    if not filepath.exists():
-        print(f"  [SKIP] {filename} non trouvé")
+    stage_name = f"_stage_{table.name}"
+    column_list = ", ".join(columns)
+    await conn.execute(text(
+        f"CREATE TEMP TABLE {stage_name} ON COMMIT DROP AS "
+        f"SELECT {column_list} FROM {table.name} WITH NO DATA"
+    ))
+    await raw.copy_records_to_table(stage_name, records=records, columns=columns)
+    stage = Table(stage_name, MetaData(), *[Column(c, table.c[c].type) for c in columns])
+    stmt = _upsert_statement(pg_insert, table, columns, natural_key, insert_only=defaults)
+    stmt = stmt.from_select(columns, select(*[stage.c[c] for c in columns]))
+    result = await conn.execute(stmt)
+    return result.rowcount
+
+
+async def _insert_batch(conn, table, columns: list[str], batch: list[dict], natural_key: list[str] | None) -> int:
+    """Chargement via INSERT multi-lignes (autres SGBD, ex. SQLite)."""
+    if natural_key is None:
+        await conn.execute(table.insert(), batch)
+        return len(batch)
+    insert_fn = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+    result = await conn.execute(_upsert_statement(insert_fn, table, columns, natural_key), batch)
+    return result.rowcount
+
+
+async def import_csv(
+    filename: str,
+    model_class,
+    field_mapping: dict,
+    transforms: dict | None = None,
+    natural_key: str | list[str] | None = None,
+    batch_size: int = BATCH_SIZE,
+):
+    """Importe un fichier CSV (ou son .fic d'origine) dans une table SQLAlchemy par lots.
+
+    Les lignes sont lues en flux et chargées sans passer par l'ORM : la mémoire
+    consommée reste bornée par ``batch_size`` quelle que soit la taille du fichier.
+
+    Avec ``natural_key``, les lignes sont fusionnées (upsert) sur cette clé : seules
+    les lignes nouvelles ou modifiées sont écrites, ce qui rend l'import rejouable.
+    Un point de reprise (offset en octets) est enregistré après chaque lot validé ;
+    un fichier déjà importé et inchangé depuis est ignoré.
+
+    En mode ``--fic``, le fichier .fic de même nom est lu directement (voir
+    hyperfile_reader.py) avec les mêmes mappings et transformations.
+    """
+    filepath, read_records = _source(filename)
+    if filepath is None or not filepath.exists():
+        print(f"  [SKIP] {filepath.name if filepath else filename} non trouvé")
         return 0
+    filename = filepath.name
+
+    if isinstance(natural_key, str):
+        natural_key = [natural_key]
+    table = model_class.__table__
+    if natural_key and settings.PARTITIONNEMENT_ANNUEL and table.name in TABLES_PARTITIONNEES:
+        # Sur une table partitionnée, l'unicité inclut la clé de partitionnement.
+        natural_key = natural_key + [TABLES_PARTITIONNEES[table.name]]
+
+    checkpoints = _load_checkpoints()
+    signature = _file_signature(filepath)
+    checkpoint = checkpoints.get(filename)
+    start_offset = 0
+    if checkpoint and all(checkpoint.get(k) == v for k, v in signature.items()):
+        if checkpoint.get("termine"):
+            print(f"  [À JOUR] {filename} inchangé depuis le dernier import")
+            return 0
+        start_offset = checkpoint["offset"]
+        print(f"  [REPRISE] {filename} à l'octet {start_offset}")
+
+    columns = [c for cols in field_mapping.values() for c in (cols if isinstance(cols, tuple) else (cols,))]
+    defaults = _column_defaults(table, columns)
+    required = [c for c in columns if not table.c[c].nullable and defaults[c] is None]
+    stats = {"rejets": 0, "vides": Counter()}
+    records = read_records(filepath, start_offset)
+    rows = _iter_rows(records, field_mapping, transforms, defaults, required, stats)
 
     count = 0
-    async with async_session() as db:
-        with open(filepath, encoding="utf-8-sig") as f:
-            reader = csv.DictReader(f, delimiter=";")
-            for row in reader:
-                data = {}
-                for csv_col, db_col in field_mapping.items():
-                    value = row.get(csv_col, "").strip()
-                    if transforms and db_col in transforms:
-                        value = transforms[db_col](value)
-                    if value != "":
-                        data[db_col] = value
-                obj = model_class(**data)
-                db.add(obj)
-                count += 1
-        await db.commit()
+    written = 0
+    start = time.perf_counter()
+    async with engine.connect() as conn:
+        use_copy = conn.dialect.name == "postgresql" and conn.dialect.driver == "asyncpg"
+        load_batch = _copy_batch if use_copy else _insert_batch
+        for offset, batch in _batched(rows, batch_size):
+            count += len(batch)
+            if natural_key:
+                batch = _dedupe(batch, natural_key)
+            written += await load_batch(conn, table, columns, batch, natural_key)
+            await conn.commit()
+            checkpoints[filename] = {**signature, "offset": offset, "termine": False}
+            _save_checkpoints(checkpoints)
+            elapsed = time.perf_counter() - start
+            print(f"    {filename} : {count} lignes ({count / elapsed:,.0f} lignes/s)", end="\r")
 
-    print(f"  [OK] {filename} : {count} enregistrements importés")
-    return count
+    checkpoints[filename] = {**signature, "offset": signature["size"], "termine": True}
+    _save_checkpoints(checkpoints)
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0
+    print(
+        f"  [OK] {filename} : {count} lignes lues, {written} insérées ou modifiées "
+        f"en {elapsed:.1f}s ({rate:,.0f} lignes/s)"
+    )
+    if stats["rejets"]:
+        vides = ", ".join(f"{colonne} : {n}" for colonne, n in stats["vides"].most_common())
+        print(f"  [ATTENTION] {filename} : {stats['rejets']} lignes rejetées (colonne obligatoire vide, {vides})")
+    for transform in (transforms or {}).values():
+        if isinstance(transform, KeyResolver) and transform.missing:
+            print(f"  [ATTENTION] {filename} : {transform.missing} {transform.label} introuvables")
+    return written
 
 
 def to_decimal(v):
@@ -68,16 +380,59 @@ def to_int(v):
         return 0
 
 
+def to_numero(v):
+    """Numéro de ligne : vide ou invalide donne None, et la ligne est rejetée.
+
+    Jamais 0 par défaut : toutes les lignes sans numéro d'une pièce seraient
+    fusionnées en une seule par la clé naturelle (pièce, numéro de ligne).
+    """
+    try:
+        numero = int(float(v.replace(",", "."))) if v else None
+    except (ValueError, OverflowError):
+        return None
+    return numero if numero and numero > 0 else None
+
+
 def to_bool(v):
     return v.lower() in ("1", "true", "oui", "o", "yes")
 
 
-async def migrate():
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%Y%m%d", "%d/%m/%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y%m%d%H%M%S")
+
+
+def to_datetime(v):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(v, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def to_enum(enum_class, default=None):
+    """Convertit un statut exporté (valeur ou nom, insensible à la casse) en membre d'Enum."""
+    members = {m.value: m for m in enum_class} | {m.name.lower(): m for m in enum_class}
+
+    def convert(v):
+        return members.get(v.lower(), default) if v else default
+
+    return convert
+
+
+async def migrate(reset: bool = False, source: str = "csv"):
+    global SOURCE
+    SOURCE = source
+
     print("=== Migration HyperFile -> PostgreSQL ===\n")
-    print("Prérequis : exporter les tables HyperFile en CSV (UTF-8, séparateur ;)")
+    if source == "fic":
+        print(f"Lecture native des fichiers .fic, structures décrites dans : {LAYOUTS_DIR}")
+    else:
+        print("Prérequis : exporter les tables HyperFile en CSV (UTF-8, séparateur ;)")
     print(f"Placer les fichiers dans : {DATA_DIR}\n")
 
     DATA_DIR.mkdir(exist_ok=True)
+    if reset and CHECKPOINT_FILE.exists():
+        CHECKPOINT_FILE.unlink()
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -89,7 +444,7 @@ async def migrate():
         "CODE": "code", "RAISON_SOCIALE": "raison_sociale",
         "CONTACT": "contact", "TELEPHONE": "telephone", "EMAIL": "email",
         "ADRESSE": "adresse", "CODE_POSTAL": "code_postal", "VILLE": "ville",
-    })
+    }, natural_key="code")
 
     # Articles
     total += await import_csv("articles.csv", Article, {
@@ -103,7 +458,7 @@ async def migrate():
         "prix_achat_ht": to_decimal, "prix_vente_ht": to_decimal,
         "tva": to_decimal, "stock_actuel": to_int, "stock_minimum": to_int,
         "poids": to_decimal,
-    })
+    }, natural_key="reference")
 
     # Clients
     total += await import_csv("clients.csv", Client, {
@@ -115,7 +470,7 @@ async def migrate():
         "DELAI_REGLEMENT": "delai_reglement",
     }, transforms={
         "delai_reglement": to_int,
-    })
+    }, natural_key="code_client")
 
     # VRP
     total += await import_csv("vrp.csv", VRP, {
@@ -125,12 +480,131 @@ async def migrate():
         "TAUX_COMMISSION": "taux_commission", "OBJECTIF_CA": "objectif_ca",
     }, transforms={
         "taux_commission": to_decimal, "objectif_ca": to_decimal,
-    })
+    }, natural_key="code_vrp")
+
+    total += await import_documents()
+
+    async with async_session() as db:
+        ecarts = await client_service.recalculer_encours(db)
+        await disponibilite_service.initialiser(db)
+        # Pièces chargées sans passer par les compteurs : ils repartent du nombre de pièces
+        await numerotation_service.reinitialiser(db)
+        await db.commit()
+    print(f"  Encours recalculé pour {len(ecarts)} clients")
+
+    print(f"\n=== Migration terminée : {total} enregistrements insérés ou modifiés ===")
+
+
+async def import_documents() -> int:
+    """Importe les pièces historiques (commandes, factures, BL) et leurs lignes.
+
+    Les codes client, VRP, références article et numéros de pièce sont résolus
+    via des dictionnaires pré-chargés ; les en-têtes sont importés avant leurs
+    lignes pour que la correspondance numéro -> id soit disponible.
+    """
+    total = 0
+    clients = await load_keys(Client.code_client, Client.id)
+    vrps = await load_keys(VRP.code_vrp, VRP.id)
+    articles = await load_keys(Article.reference, Article.id)
+    montants = {
+        "total_ht": to_decimal, "total_tva": to_decimal, "total_ttc": to_decimal,
+        "remise_globale_pct": to_decimal,
+    }
+    lignes = {
+        "quantite": to_int, "prix_unitaire_ht": to_decimal, "remise_pct": to_decimal,
+        "tva_pct": to_decimal, "montant_ht": to_decimal, "ligne_numero": to_numero,
+    }
+
+    # Commandes
+    total += await import_csv("commandes.csv", Commande, {
+        "NUMERO": "numero", "CODE_CLIENT": "client_id", "CODE_VRP": "vrp_id",
+        "STATUT": "statut", "DATE": "date_commande", "DATE_LIVRAISON": "date_livraison_souhaitee",
+        "REF_CLIENT": "reference_client", "ADRESSE_LIVRAISON": "adresse_livraison",
+        "CP_LIVRAISON": "cp_livraison", "VILLE_LIVRAISON": "ville_livraison", "PAYS_LIVRAISON": "pays_livraison",
+        "TOTAL_HT": "total_ht", "TOTAL_TVA": "total_tva", "TOTAL_TTC": "total_ttc", "REMISE": "remise_globale_pct",
+    }, transforms={
+        "client_id": KeyResolver(clients, "codes client"), "vrp_id": KeyResolver(vrps, "codes VRP"),
+        "statut": to_enum(StatutCommande, StatutCommande.LIVREE),
+        "date_commande": to_datetime, "date_livraison_souhaitee": to_datetime, **montants,
+    }, natural_key="numero")
+
+    commandes = await load_keys(Commande.numero, Commande.id)
+    total += await import_csv("lignes_commande.csv", LigneCommande, {
+        "NUMERO_COMMANDE": "commande_id", "LIGNE": "ligne_numero", "REFERENCE": "article_id",
+        "DESIGNATION": "designation", "QUANTITE": "quantite", "QUANTITE_LIVREE": "quantite_livree",
+        "PRIX_UNITAIRE_HT": "prix_unitaire_ht", "REMISE": "remise_pct", "TVA": "tva_pct",
+        "MONTANT_HT": "montant_ht", "TAILLE": "taille", "COULEUR": "couleur",
+    }, transforms={
+        "commande_id": KeyResolver(commandes, "numéros de commande"),
+        "article_id": KeyResolver(articles, "références article"),
+        "quantite_livree": to_int, **lignes,
+    }, natural_key=["commande_id", "ligne_numero"])
+
+    # Factures
+    total += await import_csv("factures.csv", Facture, {
+        "NUMERO": "numero", "CODE_CLIENT": "client_id", "NUMERO_COMMANDE": "commande_id",
+        "CODE_VRP": "vrp_id", "STATUT": "statut", "DATE": "date_facture", "ECHEANCE": "date_echeance",
+        "MODE_REGLEMENT": "mode_reglement", "REF_CLIENT": "reference_client",
+        "ADRESSE_FACTURATION": "adresse_facturation", "CP_FACTURATION": "cp_facturation",
+        "VILLE_FACTURATION": "ville_facturation",
+        "TOTAL_HT": "total_ht", "TOTAL_TVA": "total_tva", "TOTAL_TTC": "total_ttc",
+        "MONTANT_REGLE": "montant_regle", "REMISE": "remise_globale_pct",
+    }, transforms={
+        "client_id": KeyResolver(clients, "codes client"),
+        "commande_id": KeyResolver(commandes, "numéros de commande"),
+        "vrp_id": KeyResolver(vrps, "codes VRP"),
+        "statut": to_enum(StatutFacture, StatutFacture.PAYEE),
+        "date_facture": to_datetime, "date_echeance": to_datetime, "montant_regle": to_decimal, **montants,
+    }, natural_key="numero")
+
+    factures = await load_keys(Facture.numero, Facture.id)
+    dates_factures = await load_keys(Facture.numero, Facture.date_facture)
+    total += await import_csv("lignes_facture.csv", LigneFacture, {
+        "NUMERO_FACTURE": ("facture_id", "date_facture"), "LIGNE": "ligne_numero", "REFERENCE": "article_id",
+        "DESIGNATION": "designation", "QUANTITE": "quantite", "PRIX_UNITAIRE_HT": "prix_unitaire_ht",
+        "REMISE": "remise_pct", "TVA": "tva_pct", "MONTANT_HT": "montant_ht",
+        "TAILLE": "taille", "COULEUR": "couleur",
+    }, transforms={
+        "facture_id": KeyResolver(factures, "numéros de facture"),
+        "date_facture": dates_factures.get,
+        "article_id": KeyResolver(articles, "références article"),
+        **lignes,
+    }, natural_key=["facture_id", "ligne_numero"])
+
+    # Bons de livraison
+    total += await import_csv("bons_livraison.csv", BonLivraison, {
+        "NUMERO": "numero", "CODE_CLIENT": "client_id", "NUMERO_COMMANDE": "commande_id",
+        "CODE_VRP": "vrp_id", "STATUT": "statut", "DATE": "date_bl",
+        "DATE_EXPEDITION": "date_expedition", "DATE_LIVRAISON": "date_livraison",
+        "ADRESSE_LIVRAISON": "adresse_livraison", "CP_LIVRAISON": "cp_livraison",
+        "VILLE_LIVRAISON": "ville_livraison", "PAYS_LIVRAISON": "pays_livraison",
+        "POIDS": "poids_total", "NB_COLIS": "nb_colis",
+    }, transforms={
+        "client_id": KeyResolver(clients, "codes client"),
+        "commande_id": KeyResolver(commandes, "numéros de commande"),
+        "vrp_id": KeyResolver(vrps, "codes VRP"),
+        "statut": to_enum(StatutLivraison, StatutLivraison.LIVREE),
+        "date_bl": to_datetime, "date_expedition": to_datetime, "date_livraison": to_datetime,
+        "poids_total": to_decimal, "nb_colis": to_int,
+    }, natural_key="numero")
+
+    bons_livraison = await load_keys(BonLivraison.numero, BonLivraison.id)
+    total += await import_csv("lignes_bon_livraison.csv", LigneBonLivraison, {
+        "NUMERO_BL": "bon_livraison_id", "LIGNE": "ligne_numero", "REFERENCE": "article_id",
+        "DESIGNATION": "designation", "QUANTITE": "quantite",
+        "TAILLE": "taille", "COULEUR": "couleur", "EMPLACEMENT": "emplacement",
+    }, transforms={
+        "bon_livraison_id": KeyResolver(bons_livraison, "numéros de BL"),
+        "article_id": KeyResolver(articles, "références article"),
+        "quantite": to_int, "ligne_numero": to_numero,
+    }, natural_key=["bon_livraison_id", "ligne_numero"])
 
-    print(f"\n=== Migration terminée : {total} enregistrements au total ===")
-    print("\nPour les commandes, factures et BL historiques,")
-    print("utilisez le même pattern avec les fichiers CSV correspondants.")
+    return total
 
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    parser = argparse.ArgumentParser(description="Migration HyperFile -> PostgreSQL")
+    parser.add_argument("--reset", action="store_true", help="ignorer les points de reprise existants")
+    parser.add_argument("--fic", action="store_true", help="lire directement les fichiers .fic (sans export CSV)")
+    args = parser.parse_args()
+    asyncio.run(migrate(reset=args.reset, source="fic" if args.fic else "csv"))
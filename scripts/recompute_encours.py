@@ -0,0 +1,45 @@
+"""
+Recalcul de l'encours des clients.
+
+L'encours (reste dû des factures non annulées) est tenu à jour à chaque
+émission, règlement et annulation de facture. Ce script le recalcule depuis
+les factures et corrige les écarts : à lancer après un import en base ou une
+correction manuelle des factures.
+
+Usage :
+    python scripts/recompute_encours.py [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.database import async_session
+from app.services import client_service
+
+
+async def recalculer(dry_run: bool = False) -> list[tuple[int, Decimal, Decimal]]:
+    async with async_session() as db:
+        ecarts = await client_service.recalculer_encours(db)
+        if not dry_run:
+            await db.commit()
+    return ecarts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Recalcul de l'encours des clients")
+    parser.add_argument("--dry-run", action="store_true", help="Affiche les écarts sans les corriger")
+    args = parser.parse_args()
+
+    ecarts = asyncio.run(recalculer(args.dry_run))
+    for client_id, encours, calcule in ecarts:
+        print(f"  client {client_id:>8} : {encours:>14} -> {calcule:>14}")
+    print(f"{len(ecarts):,} encours {'à corriger' if args.dry_run else 'corrigés'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
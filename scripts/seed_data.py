@@ -9,6 +9,7 @@ from app.config import settings
 from app.database import engine, async_session, Base
 from app.models import *  # noqa
 from app.auth.service import hash_password
+from app.services import disponibilite_service
 
 
 ARTICLES_DEMO = [
@@ -89,6 +90,8 @@ async def seed():
         transport2 = Transport(code="TNT", nom="TNT Express", tarif_base=12.00, tarif_kg=0.28, delai_moyen_jours=1)
         db.add(transport2)
 
+        await db.flush()
+        await disponibilite_service.initialiser(db)
         await db.commit()
         print("Seed terminé : 2 users, 12 articles, 8 clients, 3 VRP, 1 fournisseur, 2 transporteurs")
 
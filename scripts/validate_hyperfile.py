@@ -0,0 +1,370 @@
+"""
+Contrôle qualité des exports HyperFile avant migration.
+
+Les convertisseurs de migrate_hyperfile.py sont volontairement tolérants (une
+valeur illisible devient 0 ou False) : ce script repère ces valeurs avant le
+chargement, sans jamais se connecter à la base.
+
+Contrôles effectués :
+- encodage (octets non UTF-8, typiquement du Windows-1252, et double encodage)
+- nombre de colonnes, champs obligatoires vides
+- types (décimaux, entiers, dates, booléens, statuts)
+- doublons sur la clé naturelle
+- références orphelines (code client, référence article, numéro de pièce)
+
+Les fichiers sont découpés en blocs traités en parallèle par un pool de
+processus ; seul le rapprochement final (doublons entre blocs, orphelins) est
+fait dans le processus principal.
+
+Usage :
+    python scripts/validate_hyperfile.py [--workers N] [--output rapport.json]
+
+Le rapport JSON est écrit dans data/validation_report.json par défaut ; le code
+de sortie est 1 si au moins une anomalie est détectée.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.commande import StatutCommande
+from app.models.facture import StatutFacture
+from app.models.livraison import StatutLivraison
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+CHUNK_SIZE = 8 * 1024 * 1024
+MAX_EXEMPLES = 20
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%Y%m%d", "%d/%m/%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y%m%d%H%M%S")
+# UTF-8 relu en Windows-1252 puis réencodé : "é" devient "Ã©"
+MOJIBAKE = re.compile("[ÃÂ][\u0080-\u00bf]")
+BOOLEENS = {"1", "0", "true", "false", "oui", "non", "o", "n", "yes", "no", ""}
+
+
+# --- Contrôles de type stricts -----------------------------------------------------
+
+def parse_decimal(v: str) -> Decimal:
+    value = Decimal(v.replace(",", "."))
+    if not value.is_finite():
+        raise InvalidOperation(v)
+    return value
+
+
+def parse_int(v: str) -> int:
+    value = parse_decimal(v)
+    if value != value.to_integral_value():
+        raise ValueError(v)
+    return int(value)
+
+
+def parse_date(v: str) -> datetime:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(v, fmt)
+        except ValueError:
+            continue
+    raise ValueError(v)
+
+
+def parse_bool(v: str) -> bool:
+    if v.lower() not in BOOLEENS:
+        raise ValueError(v)
+    return v.lower() in ("1", "true", "oui", "o", "yes")
+
+
+def enum_parser(enum_class):
+    members = {m.value for m in enum_class} | {m.name.lower() for m in enum_class}
+
+    def parse(v: str):
+        if v.lower() not in members:
+            raise ValueError(v)
+        return v
+
+    return parse
+
+
+@dataclass(frozen=True)
+class FileSpec:
+    key: tuple[str, ...]
+    required: tuple[str, ...] = ()
+    types: dict = field(default_factory=dict)
+    references: dict = field(default_factory=dict)
+
+
+MONTANTS = {"TOTAL_HT": parse_decimal, "TOTAL_TVA": parse_decimal, "TOTAL_TTC": parse_decimal, "REMISE": parse_decimal}
+LIGNES = {
+    "LIGNE": parse_int, "QUANTITE": parse_int, "PRIX_UNITAIRE_HT": parse_decimal,
+    "REMISE": parse_decimal, "TVA": parse_decimal, "MONTANT_HT": parse_decimal,
+}
+
+# Ordre significatif : les référentiels sont contrôlés avant les pièces qui les citent.
+SPECS: dict[str, FileSpec] = {
+    "fournisseurs.csv": FileSpec(key=("CODE",), required=("RAISON_SOCIALE",)),
+    "articles.csv": FileSpec(
+        key=("REFERENCE",),
+        required=("DESIGNATION",),
+        types={
+            "PRIX_ACHAT_HT": parse_decimal, "PRIX_VENTE_HT": parse_decimal, "TVA": parse_decimal,
+            "STOCK": parse_int, "STOCK_MIN": parse_int, "POIDS": parse_decimal,
+        },
+    ),
+    "clients.csv": FileSpec(key=("CODE_CLIENT",), required=("RAISON_SOCIALE",), types={"DELAI_REGLEMENT": parse_int}),
+    "vrp.csv": FileSpec(
+        key=("CODE_VRP",), required=("NOM",),
+        types={"TAUX_COMMISSION": parse_decimal, "OBJECTIF_CA": parse_decimal},
+    ),
+    "commandes.csv": FileSpec(
+        key=("NUMERO",),
+        required=("CODE_CLIENT", "DATE"),
+        types={"DATE": parse_date, "DATE_LIVRAISON": parse_date, "STATUT": enum_parser(StatutCommande), **MONTANTS},
+        references={"CODE_CLIENT": ("clients.csv", "CODE_CLIENT"), "CODE_VRP": ("vrp.csv", "CODE_VRP")},
+    ),
+    "lignes_commande.csv": FileSpec(
+        key=("NUMERO_COMMANDE", "LIGNE"),
+        required=("REFERENCE", "DESIGNATION", "PRIX_UNITAIRE_HT"),
+        types={"QUANTITE_LIVREE": parse_int, **LIGNES},
+        references={"NUMERO_COMMANDE": ("commandes.csv", "NUMERO"), "REFERENCE": ("articles.csv", "REFERENCE")},
+    ),
+    "factures.csv": FileSpec(
+        key=("NUMERO",),
+        required=("CODE_CLIENT", "DATE"),
+        types={
+            "DATE": parse_date, "ECHEANCE": parse_date, "STATUT": enum_parser(StatutFacture),
+            "MONTANT_REGLE": parse_decimal, **MONTANTS,
+        },
+        references={
+            "CODE_CLIENT": ("clients.csv", "CODE_CLIENT"), "CODE_VRP": ("vrp.csv", "CODE_VRP"),
+            "NUMERO_COMMANDE": ("commandes.csv", "NUMERO"),
+        },
+    ),
+    "lignes_facture.csv": FileSpec(
+        key=("NUMERO_FACTURE", "LIGNE"),
+        required=("REFERENCE", "DESIGNATION", "PRIX_UNITAIRE_HT"),
+        types=LIGNES,
+        references={"NUMERO_FACTURE": ("factures.csv", "NUMERO"), "REFERENCE": ("articles.csv", "REFERENCE")},
+    ),
+    "bons_livraison.csv": FileSpec(
+        key=("NUMERO",),
+        required=("CODE_CLIENT", "DATE"),
+        types={
+            "DATE": parse_date, "DATE_EXPEDITION": parse_date, "DATE_LIVRAISON": parse_date,
+            "STATUT": enum_parser(StatutLivraison), "POIDS": parse_decimal, "NB_COLIS": parse_int,
+        },
+        references={
+            "CODE_CLIENT": ("clients.csv", "CODE_CLIENT"), "CODE_VRP": ("vrp.csv", "CODE_VRP"),
+            "NUMERO_COMMANDE": ("commandes.csv", "NUMERO"),
+        },
+    ),
+    "lignes_bon_livraison.csv": FileSpec(
+        key=("NUMERO_BL", "LIGNE"),
+        required=("REFERENCE", "DESIGNATION"),
+        types={"LIGNE": parse_int, "QUANTITE": parse_int},
+        references={"NUMERO_BL": ("bons_livraison.csv", "NUMERO"), "REFERENCE": ("articles.csv", "REFERENCE")},
+    ),
+}
+
+
+# --- Traitement d'un bloc (processus fils) ----------------------------------------
+
+def _decode(data: bytes, first_line: int, anomalies: list) -> str:
+    """Décode un bloc en UTF-8 ; les lignes invalides sont relues en Windows-1252 et signalées."""
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        lines = []
+        for offset, raw in enumerate(data.splitlines(keepends=True)):
+            try:
+                lines.append(raw.decode("utf-8"))
+            except UnicodeDecodeError:
+                lines.append(raw.decode("cp1252", errors="replace"))
+                anomalies.append(("encodage", first_line + offset, "octets non UTF-8 (Windows-1252 ?)"))
+        text = "".join(lines)
+    if MOJIBAKE.search(text):
+        for offset, line in enumerate(text.splitlines()):
+            if MOJIBAKE.search(line):
+                anomalies.append(("double_encodage", first_line + offset, line[:80]))
+    return text
+
+
+def validate_chunk(filename: str, header: list[str], data: bytes, first_line: int) -> dict:
+    """Contrôle un bloc de lignes ; renvoie anomalies, clés vues et codes référencés."""
+    spec = SPECS[filename]
+    anomalies: list[tuple[str, int, str]] = []
+    keys: dict[tuple, int] = {}
+    references: dict[str, dict[str, int]] = {col: {} for col in spec.references}
+    rows = 0
+
+    reader = csv.reader(io.StringIO(_decode(data, first_line, anomalies), newline=""), delimiter=";")
+    index = {name: i for i, name in enumerate(header)}
+    line = first_line
+    for values in reader:
+        line = first_line + reader.line_num - 1
+        if not values:
+            continue
+        rows += 1
+        if len(values) != len(header):
+            anomalies.append(("colonnes", line, f"{len(values)} colonnes au lieu de {len(header)}"))
+            continue
+        row = {name: values[i].strip() for name, i in index.items()}
+
+        for col in spec.required + spec.key:
+            if col in row and not row[col]:
+                anomalies.append(("obligatoire", line, col))
+        for col, parse in spec.types.items():
+            value = row.get(col, "")
+            if value:
+                try:
+                    parse(value)
+                except (ValueError, ArithmeticError):
+                    anomalies.append(("type", line, f"{col}={value!r}"))
+
+        key = tuple(row.get(col, "") for col in spec.key)
+        if key in keys:
+            anomalies.append(("doublon", line, f"{'/'.join(key)} (déjà ligne {keys[key]})"))
+        else:
+            keys[key] = line
+        for col in spec.references:
+            value = row.get(col, "")
+            if value:
+                references[col].setdefault(value, line)
+
+    return {"rows": rows, "anomalies": anomalies, "keys": keys, "references": references}
+
+
+# --- Découpage et consolidation (processus principal) -----------------------------
+
+def _chunks(filepath: Path, chunk_size: int):
+    """Découpe le fichier en blocs de lignes complètes.
+
+    Une coupure n'intervient qu'après un nombre pair de guillemets, pour ne jamais
+    séparer un champ multi-lignes. Produit ``(numéro de première ligne, octets)``.
+    """
+    with open(filepath, "rb") as f:
+        f.readline()
+        line_no = 2
+        buffer = []
+        size = 0
+        quotes = 0
+        start = line_no
+        for raw in f:
+            buffer.append(raw)
+            size += len(raw)
+            quotes += raw.count(b'"')
+            line_no += 1
+            if size >= chunk_size and quotes % 2 == 0:
+                yield start, b"".join(buffer)
+                buffer, size, quotes, start = [], 0, 0, line_no
+        if buffer:
+            yield start, b"".join(buffer)
+
+
+def _read_header(filepath: Path) -> list[str]:
+    with open(filepath, "rb") as f:
+        first = f.readline().decode("utf-8-sig", errors="replace")
+    return next(csv.reader([first], delimiter=";"), [])
+
+
+class FileReport:
+    def __init__(self):
+        self.rows = 0
+        self.counts: Counter = Counter()
+        self.examples: list[dict] = []
+
+    def add(self, kind: str, line: int, detail: str) -> None:
+        self.counts[kind] += 1
+        if len(self.examples) < MAX_EXEMPLES:
+            self.examples.append({"type": kind, "ligne": line, "detail": detail})
+
+    def as_dict(self) -> dict:
+        return {"lignes": self.rows, "anomalies": dict(self.counts), "exemples": self.examples}
+
+
+def validate(data_dir: Path = DATA_DIR, workers: int | None = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    start = time.perf_counter()
+    known_keys: dict[str, set[str]] = {}
+    reports: dict[str, FileReport] = {}
+    unchecked: list[str] = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for filename, spec in SPECS.items():
+            filepath = data_dir / filename
+            if not filepath.exists():
+                continue
+            header = _read_header(filepath)
+            report = reports[filename] = FileReport()
+            missing = [col for col in spec.key if col not in header]
+            if missing:
+                report.add("colonnes", 1, f"colonnes de clé absentes : {', '.join(missing)}")
+                continue
+
+            futures = [
+                pool.submit(validate_chunk, filename, header, data, first_line)
+                for first_line, data in _chunks(filepath, chunk_size)
+            ]
+            keys: dict[tuple, int] = {}
+            references: dict[str, dict[str, int]] = {col: {} for col in spec.references}
+            for future in futures:
+                result = future.result()
+                report.rows += result["rows"]
+                for kind, line, detail in result["anomalies"]:
+                    report.add(kind, line, detail)
+                for key, line in result["keys"].items():
+                    if key in keys:
+                        report.add("doublon", line, f"{'/'.join(key)} (déjà ligne {keys[key]})")
+                    else:
+                        keys[key] = line
+                for col, values in result["references"].items():
+                    for value, line in values.items():
+                        references[col].setdefault(value, line)
+
+            if len(spec.key) == 1:
+                known_keys[filename] = {key[0] for key in keys}
+            for col, (target, _target_col) in spec.references.items():
+                if target not in known_keys:
+                    unchecked.append(f"{filename}:{col}")
+                    continue
+                for value, line in references[col].items():
+                    if value not in known_keys[target]:
+                        report.add("orphelin", line, f"{col}={value!r} absent de {target}")
+
+    files = {name: report.as_dict() for name, report in reports.items()}
+    return {
+        "genere_le": datetime.now(timezone.utc).isoformat(),
+        "duree_s": round(time.perf_counter() - start, 2),
+        "valide": all(not report.counts for report in reports.values()),
+        "references_non_verifiees": unchecked,
+        "fichiers": files,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Contrôle qualité des exports HyperFile")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", type=Path, default=DATA_DIR / "validation_report.json")
+    args = parser.parse_args()
+
+    report = validate(args.data_dir, args.workers)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for name, details in report["fichiers"].items():
+        statut = "OK" if not details["anomalies"] else "ANOMALIES"
+        print(f"  [{statut}] {name} : {details['lignes']} lignes {details['anomalies'] or ''}")
+    print(f"\nRapport écrit dans {args.output} ({report['duree_s']}s)")
+    return 0 if report["valide"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
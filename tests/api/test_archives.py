@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+
+from app.services import archive_service
+from tests.api.test_commandes import expedier
+from tests.api.test_factures import setup_auth_and_data
+from tests.conftest import async_session_test
+
+
+async def archiver_tout() -> dict[str, int]:
+    avant = datetime.now(timezone.utc) + timedelta(days=1)
+    counts = {}
+    async with async_session_test() as db:
+        for archivage in archive_service.ARCHIVAGES:
+            counts[archivage.modele.__tablename__] = await archive_service.archiver_lot(db, archivage, avant)
+        await db.commit()
+    return counts
+
+
+async def commande_facturee_payee(
+    client: AsyncClient, headers: dict, client_id: int, article_id: int
+) -> tuple[int, int]:
+    cmd_resp = await client.post(
+        "/api/v1/commandes",
+        json={
+            "client_id": client_id,
+            "lignes": [
+                {"article_id": article_id, "designation": "Casque", "quantite": 2, "prix_unitaire_ht": "45.50"}
+            ],
+        },
+        headers=headers,
+    )
+    cmd_id = cmd_resp.json()["id"]
+    bl_id = await expedier(client, headers, cmd_id, article_id, 2)
+    await client.post(f"/api/v1/livraisons/{bl_id}/livrer", headers=headers)
+    fac_id = (await client.post(f"/api/v1/commandes/{cmd_id}/facturer", headers=headers)).json()["facture_id"]
+    await client.post(f"/api/v1/factures/{fac_id}/paiement", json={"montant": "109.20"}, headers=headers)
+    return cmd_id, fac_id
+
+
+@pytest.mark.asyncio
+async def test_archives_lecture_transparente(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    cmd_id, fac_id = await commande_facturee_payee(client, headers, client_id, article_id)
+
+    counts = await archiver_tout()
+    assert counts["factures"] == 1
+    assert counts["commandes"] == 1
+
+    # Les listes ne portent plus que sur les pièces courantes
+    assert (await client.get("/api/v1/factures", headers=headers)).json()["total"] == 0
+    assert (await client.get("/api/v1/commandes", headers=headers)).json()["total"] == 0
+
+    # Le détail reste accessible, lignes comprises
+    response = await client.get(f"/api/v1/factures/{fac_id}", headers=headers)
+    assert response.status_code == 200
+    facture = response.json()
+    assert facture["statut"] == "payee"
+    assert float(facture["total_ttc"]) == 109.20
+    assert facture["lignes"][0]["quantite"] == 2
+    assert float(facture["lignes"][0]["prix_unitaire_ht"]) == 45.50
+
+    response = await client.get(f"/api/v1/commandes/{cmd_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["statut"] == "facturee"
+
+    response = await client.get(f"/api/v1/reporting/export/facture/{fac_id}/pdf", headers=headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_archives_lecture_seule_et_numerotation(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    cmd_id, fac_id = await commande_facturee_payee(client, headers, client_id, article_id)
+
+    # Une facture encore due n'est pas archivée
+    ouverte = await client.post(
+        "/api/v1/factures",
+        json={
+            "client_id": client_id,
+            "lignes": [{"article_id": article_id, "designation": "Item", "quantite": 1, "prix_unitaire_ht": "50.00"}],
+        },
+        headers=headers,
+    )
+    await archiver_tout()
+    assert (await client.get("/api/v1/factures", headers=headers)).json()["total"] == 1
+
+    response = await client.post(f"/api/v1/factures/{fac_id}/paiement", json={"montant": "1.00"}, headers=headers)
+    assert response.status_code == 400
+    response = await client.post(f"/api/v1/commandes/{cmd_id}/livrer", headers=headers)
+    assert response.status_code == 400
+
+    # La numérotation tient compte des pièces archivées
+    response = await client.post(
+        "/api/v1/factures",
+        json={
+            "client_id": client_id,
+            "lignes": [{"article_id": article_id, "designation": "Item", "quantite": 1, "prix_unitaire_ht": "50.00"}],
+        },
+        headers=headers,
+    )
+    assert ouverte.json()["numero"] == "FAC-000002"
+    assert response.json()["numero"] == "FAC-000003"
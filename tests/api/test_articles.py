@@ -28,7 +28,7 @@ async def test_create_article(client: AsyncClient):
             "stock_actuel": 50,
             "stock_minimum": 10,
             "tailles": [{"taille": "S", "stock": 10}, {"taille": "M", "stock": 20}, {"taille": "L", "stock": 20}],
-            "couleurs": [{"couleur": "Noir", "code_hex": "#000000", "stock": 30}],
+            "couleurs": [{"couleur": "Noir", "code_hex": "#000000"}],
         },
         headers=headers,
     )
@@ -39,6 +39,20 @@ async def test_create_article(client: AsyncClient):
     assert len(data["tailles"]) == 3
     assert len(data["couleurs"]) == 1
 
+    # Stock par taille et par couleur : le registre ne saurait pas le répartir
+    response = await client.post(
+        "/api/v1/articles",
+        json={
+            "reference": "ART-002",
+            "designation": "Casque moto jet",
+            "prix_vente_ht": "59.90",
+            "tailles": [{"taille": "M", "stock": 10}],
+            "couleurs": [{"couleur": "Noir", "stock": 10}],
+        },
+        headers=headers,
+    )
+    assert response.status_code == 400
+
 
 @pytest.mark.asyncio
 async def test_list_articles(client: AsyncClient):
@@ -132,3 +146,60 @@ async def test_duplicate_reference_rejected(client: AsyncClient):
         headers=headers,
     )
     assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_variantes_et_grille(client: AsyncClient):
+    token = await get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    article_id = (await client.post(
+        "/api/v1/articles",
+        json={
+            "reference": "ART-VAR-001",
+            "designation": "Gant été",
+            "prix_vente_ht": "30.00",
+            "tailles": [{"taille": "S"}, {"taille": "M"}],
+            "couleurs": [{"couleur": "Noir"}, {"couleur": "Rouge"}],
+        },
+        headers=headers,
+    )).json()["id"]
+
+    response = await client.put(f"/api/v1/articles/{article_id}/variantes", json=[
+        {"taille": "S", "couleur": "Noir", "ean": "3760000000011"},
+        {"taille": "M", "couleur": "Noir", "ean": "3760000000028", "prix_vente_ht": "32.00"},
+        {"taille": "M", "couleur": "Rouge", "ean": "3760000000035"},
+    ], headers=headers)
+    assert response.status_code == 200
+    assert [(v["taille"], v["couleur"]) for v in response.json()] == [("S", "Noir"), ("M", "Noir"), ("M", "Rouge")]
+    doublon = [{"taille": "S", "couleur": "Rouge", "ean": "3760000000011"}]
+    response = await client.put(f"/api/v1/articles/{article_id}/variantes", json=doublon, headers=headers)
+    assert response.status_code == 400
+
+    await client.post("/api/v1/stock/mouvements", json={
+        "type_mouvement": "entree",
+        "lignes": [{"article_id": article_id, "taille": "M", "couleur": "Noir", "quantite": 4}],
+    }, headers=headers)
+    grille = (await client.get(f"/api/v1/articles/{article_id}/grille", headers=headers)).json()
+    assert grille["tailles"] == ["S", "M"]
+    assert grille["couleurs"] == ["Noir", "Rouge"]
+    assert grille["colonnes"] == ["variante_id", "ean", "physique", "reserve", "disponible", "prix_vente_ht"]
+    (s_noir, s_rouge), (m_noir, m_rouge) = grille["cellules"]
+    assert s_rouge is None
+    assert m_noir[1:5] == ["3760000000028", 4, 0, 4]
+    assert float(m_noir[5]) == 32.0
+    assert float(s_noir[5]) == 30.0
+    article = (await client.get(f"/api/v1/articles/{article_id}", headers=headers)).json()
+    assert [v["stock"] for v in article["variantes"]] == [0, 4, 0]
+
+    # Sans tarif client, une ligne de commande de la variante est vendue à son prix propre
+    client_id = (await client.post(
+        "/api/v1/clients", json={"code_client": "VAR-CLI", "raison_sociale": "Client Variantes"}, headers=headers,
+    )).json()["id"]
+    commande = (await client.post("/api/v1/commandes", json={
+        "client_id": client_id,
+        "lignes": [
+            {"article_id": article_id, "quantite": 1, "taille": "M", "couleur": "Noir"},
+            {"article_id": article_id, "quantite": 1, "taille": "M", "couleur": "Rouge"},
+        ],
+    }, headers=headers)).json()
+    assert [float(ligne["prix_unitaire_ht"]) for ligne in commande["lignes"]] == [32.0, 30.0]
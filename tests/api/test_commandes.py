@@ -1,5 +1,13 @@
+import json
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event, select
+
+from app.models import FactureCommande, LigneCommande
+from app.services import client_service
+from tests.conftest import async_session_test
 
 
 async def setup_auth_and_data(client: AsyncClient) -> tuple[dict, int, int]:
@@ -29,6 +37,25 @@ async def setup_auth_and_data(client: AsyncClient) -> tuple[dict, int, int]:
     return headers, client_id, article_id
 
 
+async def entree_stock(client: AsyncClient, headers: dict, article_id: int, quantite: int) -> None:
+    response = await client.post(
+        "/api/v1/stock/mouvements",
+        json={"type_mouvement": "entree", "lignes": [{"article_id": article_id, "quantite": quantite}]},
+        headers=headers,
+    )
+    assert response.status_code == 201
+
+
+async def expedier(client: AsyncClient, headers: dict, cmd_id: int, article_id: int, quantite: int) -> int:
+    """Valide et expédie une commande (après entrée de son stock) : elle devient facturable. Renvoie le BL."""
+    await entree_stock(client, headers, article_id, quantite)
+    response = await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
+    assert response.status_code == 200
+    response = await client.post(f"/api/v1/commandes/{cmd_id}/livrer", headers=headers)
+    assert response.status_code == 200
+    return response.json()["bl_id"]
+
+
 @pytest.mark.asyncio
 async def test_create_commande(client: AsyncClient):
     headers, client_id, article_id = await setup_auth_and_data(client)
@@ -49,6 +76,7 @@ async def test_create_commande(client: AsyncClient):
     assert data["statut"] == "brouillon"
     assert len(data["lignes"]) == 1
     assert float(data["total_ht"]) == 179.80
+    assert data["ventilation_tva"] == [{"taux": "20.00", "base_ht": "179.80", "montant_tva": "35.96"}]
 
 
 @pytest.mark.asyncio
@@ -88,10 +116,21 @@ async def test_facturer_commande(client: AsyncClient):
     )
     cmd_id = cmd_resp.json()["id"]
 
+    # Une commande non expédiée n'est pas facturable
+    response = await client.post(f"/api/v1/commandes/{cmd_id}/facturer", headers=headers)
+    assert response.status_code == 400
+
+    await expedier(client, headers, cmd_id, article_id, 3)
     response = await client.post(f"/api/v1/commandes/{cmd_id}/facturer", headers=headers)
     assert response.status_code == 200
     assert response.json()["facture_numero"].startswith("FAC-")
 
+    # Ni facturée deux fois : l'encours n'est compté qu'une fois
+    response = await client.post(f"/api/v1/commandes/{cmd_id}/facturer", headers=headers)
+    assert response.status_code == 400
+    response = await client.get(f"/api/v1/clients/{client_id}", headers=headers)
+    assert float(response.json()["encours"]) == 360.00
+
 
 @pytest.mark.asyncio
 async def test_livrer_commande(client: AsyncClient):
@@ -110,7 +149,454 @@ async def test_livrer_commande(client: AsyncClient):
         headers=headers,
     )
     cmd_id = cmd_resp.json()["id"]
+    await entree_stock(client, headers, article_id, 5)
+    await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
 
     response = await client.post(f"/api/v1/commandes/{cmd_id}/livrer", headers=headers)
     assert response.status_code == 200
     assert response.json()["bl_numero"].startswith("BL-")
+    response = await client.get(f"/api/v1/commandes/{cmd_id}", headers=headers)
+    assert response.json()["statut"] == "expediee"
+
+
+@pytest.mark.asyncio
+async def test_controle_encours(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    await client.put(f"/api/v1/clients/{client_id}", json={"encours_max": "200.00"}, headers=headers)
+    commande = {
+        "client_id": client_id,
+        "lignes": [{"article_id": article_id, "designation": "Casque", "quantite": 1, "prix_unitaire_ht": "100.00"}],
+    }
+
+    cmd_id = (await client.post("/api/v1/commandes", json=commande, headers=headers)).json()["id"]
+    await expedier(client, headers, cmd_id, article_id, 1)
+    fac_id = (await client.post(f"/api/v1/commandes/{cmd_id}/facturer", headers=headers)).json()["facture_id"]
+    response = await client.get(f"/api/v1/clients/{client_id}", headers=headers)
+    assert float(response.json()["encours"]) == 120.00
+
+    # 120 + 120 > 200 : bloqué, sauf à forcer
+    response = await client.post("/api/v1/commandes", json=commande, headers=headers)
+    assert response.status_code == 400
+    assert "Encours client dépassé" in response.json()["detail"]
+    response = await client.post("/api/v1/commandes", json=commande, params={"forcer": True}, headers=headers)
+    assert response.status_code == 201
+    assert response.headers["X-Encours-Depasse"] == "true"
+    cmd_id = response.json()["id"]
+    response = await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
+    assert response.status_code == 400
+
+    # Le règlement libère l'encours
+    await client.post(f"/api/v1/factures/{fac_id}/paiement", json={"montant": "120.00"}, headers=headers)
+    response = await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
+    assert response.status_code == 200
+
+    # L'annulation aussi
+    response = await client.post("/api/v1/factures", json=commande, headers=headers)
+    facture_id = response.json()["id"]
+    response = await client.get(f"/api/v1/clients/{client_id}", headers=headers)
+    assert float(response.json()["encours"]) == 120.00
+    response = await client.post(f"/api/v1/factures/{facture_id}/annuler", headers=headers)
+    assert response.json()["statut"] == "annulee"
+    response = await client.get(f"/api/v1/clients/{client_id}", headers=headers)
+    assert float(response.json()["encours"]) == 0
+    response = await client.post(f"/api/v1/factures/{fac_id}/annuler", headers=headers)
+    assert response.status_code == 400
+
+    async with async_session_test() as db:
+        assert await client_service.recalculer_encours(db) == []
+
+
+@pytest.mark.asyncio
+async def test_devis_et_tarifs(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    revendeur_id = (await client.post(
+        "/api/v1/clients",
+        json={"code_client": "CMD-REV", "raison_sociale": "Revendeur", "type_client": "revendeur"},
+        headers=headers,
+    )).json()["id"]
+    now = datetime.now(timezone.utc)
+    await client.post(
+        f"/api/v1/articles/{article_id}/tarifs",
+        json={"nom_tarif": "revendeur", "prix_ht": "80.00", "remise_pct": "5"},
+        headers=headers,
+    )
+    await client.post(
+        f"/api/v1/articles/{article_id}/tarifs",
+        json={
+            "nom_tarif": "revendeur", "prix_ht": "70.00",
+            "date_debut": (now - timedelta(days=1)).isoformat(), "date_fin": (now + timedelta(days=1)).isoformat(),
+        },
+        headers=headers,
+    )
+    panier = {"lignes": [{"article_id": article_id, "quantite": 2}]}
+
+    response = await client.post("/api/v1/commandes/devis", json={"client_id": revendeur_id, **panier}, headers=headers)
+    assert response.status_code == 200
+    devis = response.json()
+    assert devis["type_client"] == "revendeur"
+    assert devis["lignes"][0]["prix_unitaire_ht"] == "70.0000"
+    assert float(devis["total_ttc"]) == 168.00
+
+    # Hors période de la promotion : tarif permanent et sa remise
+    response = await client.post(
+        "/api/v1/commandes/devis",
+        json={"client_id": revendeur_id, "date_tarif": (now + timedelta(days=10)).isoformat(), **panier},
+        headers=headers,
+    )
+    ligne = response.json()["lignes"][0]
+    assert (float(ligne["prix_unitaire_ht"]), float(ligne["remise_pct"]), ligne["montant_ht"]) == (80, 5, "152.00")
+
+    # Sans tarif pour son type, le client paie le prix de vente de l'article
+    response = await client.post("/api/v1/commandes/devis", json={"client_id": client_id, **panier}, headers=headers)
+    assert response.json()["lignes"][0]["tarif"] is None
+    assert float(response.json()["total_ht"]) == 179.80
+
+    response = await client.post(
+        "/api/v1/commandes/devis", json={"lignes": [{"article_id": 999999}]}, headers=headers
+    )
+    assert response.status_code == 400
+
+    # Commande saisie sans prix : tarifée par le serveur
+    response = await client.post(
+        "/api/v1/commandes", json={"client_id": revendeur_id, **panier}, headers=headers
+    )
+    assert response.status_code == 201
+    assert response.json()["lignes"][0]["designation"] == "Article Cmd"
+    assert float(response.json()["total_ht"]) == 140.00
+
+
+@pytest.mark.asyncio
+async def test_facturation_en_masse(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    autre_id = (await client.post(
+        "/api/v1/clients", json={"code_client": "CMD-AUTRE", "raison_sociale": "Autre client"}, headers=headers,
+    )).json()["id"]
+    ids = []
+    for cli, quantite in ((client_id, 1), (client_id, 2), (autre_id, 1), (client_id, 1)):
+        cmd_id = (await client.post("/api/v1/commandes", json={
+            "client_id": cli,
+            "lignes": [
+                {"article_id": article_id, "designation": "Casque", "quantite": quantite, "prix_unitaire_ht": "100.00"}
+            ],
+        }, headers=headers)).json()["id"]
+        ids.append(cmd_id)
+    for cmd_id, quantite in zip(ids[:3], (1, 2, 1), strict=True):
+        await expedier(client, headers, cmd_id, article_id, quantite)
+    await client.post(f"/api/v1/commandes/{ids[3]}/valider", headers=headers)
+
+    # Les commandes non expédiées ne sont pas facturées ; une facture par client
+    response = await client.post("/api/v1/commandes/facturation", json={"grouper_par_client": True}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["commandes"], data["factures"]) == (3, 2)
+    assert float(data["total_ttc"]) == 480.00
+    assert (data["premier_numero"], data["dernier_numero"]) == ("FAC-000001", "FAC-000002")
+
+    factures = (await client.get("/api/v1/factures", params={"client_id": client_id}, headers=headers)).json()["items"]
+    facture = (await client.get(f"/api/v1/factures/{factures[0]['id']}", headers=headers)).json()
+    assert facture["statut"] == "emise"
+    assert float(facture["total_ttc"]) == 360.00
+    assert [ligne["ligne_numero"] for ligne in facture["lignes"]] == [1, 2]
+    async with async_session_test() as db:
+        liens = await db.execute(select(FactureCommande.commande_id).where(FactureCommande.facture_id == facture["id"]))
+        assert sorted(liens.scalars()) == ids[:2]
+    response = await client.get(f"/api/v1/commandes/{ids[0]}", headers=headers)
+    assert response.json()["statut"] == "facturee"
+    response = await client.get(f"/api/v1/clients/{client_id}", headers=headers)
+    assert float(response.json()["encours"]) == 360.00
+
+    # Sans regroupement : une facture par commande, numérotée à la suite
+    await entree_stock(client, headers, article_id, 1)
+    await client.post(f"/api/v1/commandes/{ids[3]}/livrer", headers=headers)
+    response = await client.post("/api/v1/commandes/facturation", json={}, headers=headers)
+    assert (response.json()["commandes"], response.json()["premier_numero"]) == (1, "FAC-000003")
+    response = await client.post("/api/v1/commandes/facturation", json={}, headers=headers)
+    assert response.json()["factures"] == 0
+
+    async with async_session_test() as db:
+        assert await client_service.recalculer_encours(db) == []
+
+
+@pytest.mark.asyncio
+async def test_import_commandes(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    code_client = f"CMD-CLI-{id(client)}"
+    reference = f"CMD-ART-{id(client)}"
+    fichier = (
+        "Code client;Commande;Référence;Qté;Prix HT;Date livraison\n"
+        f"{code_client};PO-1;{reference};2;;15/11/2026\n"
+        f"{code_client};PO-1;{reference};1;50,00;15/11/2026\n"
+        f"{code_client};PO-2;{reference};3;;\n"
+        f"{code_client};PO-3;INCONNU;1;;\n"
+        f"INCONNU;PO-4;{reference};1;;\n"
+        f"{code_client};PO-5;{reference};0;;\n"
+    )
+
+    async def importer(contenu: str, simulation: bool = False) -> dict:
+        response = await client.post(
+            "/api/v1/commandes/import",
+            params={"simulation": simulation},
+            files={"fichier": ("commandes.csv", contenu.encode())},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    resultat = await importer(fichier, simulation=True)
+    assert (resultat["lues"], resultat["commandes"], resultat["rejetees"]) == (5, 2, 3)
+    assert (await client.get("/api/v1/commandes", headers=headers)).json()["total"] == 0
+
+    resultat = await importer(fichier)
+    assert (resultat["premier_numero"], resultat["dernier_numero"]) == ("CMD-000001", "CMD-000002")
+    assert [(e["ligne"], e["motif"]) for e in resultat["erreurs"][:2]] == [
+        (5, "Article inconnu : INCONNU"), (6, "Client inconnu : INCONNU"),
+    ]
+    assert resultat["erreurs"][2]["ligne"] == 7
+    commandes = (await client.get("/api/v1/commandes", headers=headers)).json()["items"]
+    commande = (await client.get(f"/api/v1/commandes/{min(c['id'] for c in commandes)}", headers=headers)).json()
+    assert (commande["statut"], commande["reference_client"]) == ("brouillon", "PO-1")
+    assert commande["date_livraison_souhaitee"].startswith("2026-11-15")
+    assert [(ligne["ligne_numero"], ligne["prix_unitaire_ht"]) for ligne in commande["lignes"]] == [
+        (1, "89.9000"), (2, "50.0000"),
+    ]
+    assert float(commande["total_ht"]) == 229.80
+
+    # Rechargement : rien n'est importé deux fois ; format JSON lines
+    resultat = await importer(fichier)
+    assert resultat["commandes"] == 0
+    assert resultat["erreurs"][0]["motif"] == "Commande déjà importée"
+    ligne = {
+        "code_client": code_client, "reference_client": "PO-6", "lignes": [{"reference": reference, "quantite": 1}],
+    }
+    resultat = await importer(f"{json.dumps(ligne)}\n{{invalide\n")
+    assert (resultat["commandes"], resultat["dernier_numero"], resultat["erreurs"][0]["ligne"]) == (1, "CMD-000003", 2)
+
+    response = await client.post(
+        "/api/v1/commandes/import", files={"fichier": ("vide.csv", b"a;b\n1;2\n")}, headers=headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_edition_des_lignes(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    cmd_id = (await client.post("/api/v1/commandes", json={
+        "client_id": client_id,
+        "remise_globale_pct": "5",
+        "lignes": [{"article_id": article_id, "designation": "Casque", "quantite": 3, "prix_unitaire_ht": "19.99"}],
+    }, headers=headers)).json()["id"]
+
+    response = await client.post(
+        f"/api/v1/commandes/{cmd_id}/lignes",
+        json={"article_id": article_id, "quantite": 2, "tva_pct": "5.50"},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    ligne = response.json()["ligne"]
+    assert (ligne["ligne_numero"], ligne["prix_unitaire_ht"], ligne["montant_ht"]) == (2, "89.9000", "179.80")
+
+    response = await client.patch(
+        f"/api/v1/commandes/{cmd_id}/lignes/{ligne['id']}", json={"quantite": 1, "remise_pct": "10"}, headers=headers
+    )
+    assert response.json()["ligne"]["montant_ht"] == "80.91"
+    totaux = response.json()
+    commande = (await client.get(f"/api/v1/commandes/{cmd_id}", headers=headers)).json()
+    # Totaux tenus ligne à ligne = chiffrage complet de la commande
+    assert sum(float(t["base_ht"]) for t in commande["ventilation_tva"]) == pytest.approx(float(totaux["total_ht"]))
+    assert [totaux[k] for k in ("total_ht", "total_tva", "total_ttc")] == [
+        commande[k] for k in ("total_ht", "total_tva", "total_ttc")
+    ]
+
+    premiere = commande["lignes"][0]["id"]
+    response = await client.delete(f"/api/v1/commandes/{cmd_id}/lignes/{premiere}", headers=headers)
+    # 80,91 × 0,95 = 76,86 ; TVA 5,5 % = 4,23
+    assert (response.json()["ligne"], response.json()["total_ht"], response.json()["total_ttc"]) == (
+        None, "76.86", "81.09",
+    )
+    response = await client.delete(f"/api/v1/commandes/{cmd_id}/lignes/{premiere}", headers=headers)
+    assert response.status_code == 404
+
+    await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
+    response = await client.patch(
+        f"/api/v1/commandes/{cmd_id}/lignes/{ligne['id']}", json={"quantite": 5}, headers=headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_edition_d_une_grosse_commande_sans_charger_ses_lignes(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    cmd_id = (await client.post("/api/v1/commandes", json={
+        "client_id": client_id,
+        "lignes": [
+            {"article_id": article_id, "designation": f"Article {i}", "quantite": 1, "prix_unitaire_ht": "10.00",
+             "tva_pct": "5.50" if i % 2 else "20.00"}
+            for i in range(300)
+        ],
+    }, headers=headers)).json()["id"]
+    ligne_id = (await client.get(f"/api/v1/commandes/{cmd_id}", headers=headers)).json()["lignes"][0]["id"]
+
+    chargees = []
+
+    def compter(cible, _context):
+        chargees.append(cible.id)
+
+    event.listen(LigneCommande, "load", compter)
+    try:
+        response = await client.patch(
+            f"/api/v1/commandes/{cmd_id}/lignes/{ligne_id}", json={"quantite": 3}, headers=headers
+        )
+        ajout = await client.post(
+            f"/api/v1/commandes/{cmd_id}/lignes", json={"article_id": article_id, "quantite": 1}, headers=headers
+        )
+    finally:
+        event.remove(LigneCommande, "load", compter)
+
+    # Seule la ligne modifiée est lue ; les totaux viennent des sous-totaux par taux calculés en base
+    assert response.status_code == 200 and ajout.status_code == 201
+    assert chargees == [ligne_id]
+    commande = (await client.get(f"/api/v1/commandes/{cmd_id}", headers=headers)).json()
+    assert [ajout.json()[k] for k in ("total_ht", "total_tva", "total_ttc")] == [
+        commande[k] for k in ("total_ht", "total_tva", "total_ttc")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_livraisons_partielles_et_reliquats(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    await entree_stock(client, headers, article_id, 3)
+    ids = []
+    for quantite, priorite in ((5, 0), (2, 5)):
+        cmd_id = (await client.post("/api/v1/commandes", json={
+            "client_id": client_id,
+            "priorite": priorite,
+            "lignes": [{"article_id": article_id, "quantite": quantite}],
+        }, headers=headers)).json()["id"]
+        await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
+        ids.append(cmd_id)
+
+    async def commande(cmd_id: int) -> tuple:
+        data = (await client.get(f"/api/v1/commandes/{cmd_id}", headers=headers)).json()
+        return data["statut"], data["lignes"][0]["quantite_livree"], data["lignes"][0]["quantite_allouee"]
+
+    # Seules 3 pièces sur 5 partent : le reste est en reliquat
+    response = await client.post(f"/api/v1/commandes/{ids[0]}/livrer", headers=headers)
+    bl = (await client.get(f"/api/v1/livraisons/{response.json()['bl_id']}", headers=headers)).json()
+    assert bl["lignes"][0]["quantite"] == 3
+    assert await commande(ids[0]) == ("expediee_partiellement", 3, 0)
+    response = await client.post(f"/api/v1/commandes/{ids[0]}/livrer", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Aucun stock disponible pour cette commande"
+
+    # L'arrivée de stock sert d'abord la commande prioritaire
+    await entree_stock(client, headers, article_id, 3)
+    assert await commande(ids[1]) == ("validee", 0, 2)
+    assert await commande(ids[0]) == ("expediee_partiellement", 3, 1)
+    response = await client.post("/api/v1/commandes/reliquats/allouer", headers=headers)
+    assert response.json() == {"lignes": 0, "quantite": 0}
+
+    await client.post(f"/api/v1/commandes/{ids[0]}/livrer", headers=headers)
+    assert await commande(ids[0]) == ("expediee_partiellement", 4, 0)
+    response = await client.post(f"/api/v1/commandes/{ids[1]}/livrer", headers=headers)
+    assert await commande(ids[1]) == ("expediee", 2, 0)
+
+    # Le BL annulé redevient un reliquat, aussitôt réalloué
+    bl_id = response.json()["bl_id"]
+    response = await client.post(f"/api/v1/livraisons/{bl_id}/annuler", headers=headers)
+    assert response.json()["statut"] == "annulee"
+    assert await commande(ids[1]) == ("validee", 0, 2)
+    response = await client.post(f"/api/v1/livraisons/{bl_id}/annuler", headers=headers)
+    assert response.status_code == 400
+
+    # Une commande en brouillon ou annulée ne part pas
+    await client.post(f"/api/v1/commandes/{ids[1]}/annuler", headers=headers)
+    brouillon = (await client.post("/api/v1/commandes", json={
+        "client_id": client_id, "lignes": [{"article_id": article_id, "quantite": 1}],
+    }, headers=headers)).json()["id"]
+    for cmd_id in (ids[1], brouillon):
+        response = await client.post(f"/api/v1/commandes/{cmd_id}/livrer", headers=headers)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Commande non livrable"
+
+
+@pytest.mark.asyncio
+async def test_reservation_et_disponibilite(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    await entree_stock(client, headers, article_id, 3)
+    ids = []
+    for _ in range(2):
+        cmd_id = (await client.post("/api/v1/commandes", json={
+            "client_id": client_id,
+            "lignes": [{"article_id": article_id, "quantite": 2}],
+        }, headers=headers)).json()["id"]
+        response = await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
+        ids.append(cmd_id)
+
+    # Les 3 derniers casques : 2 réservés par la première commande, 1 par la seconde
+    assert response.json()["lignes"][0]["quantite_allouee"] == 1
+    panier = {"lignes": [{"article_id": article_id, "quantite": 1}, {"article_id": article_id, "taille": "M"}]}
+    response = await client.post("/api/v1/stock/disponibilite", json=panier, headers=headers)
+    data = response.json()
+    assert data["livrable"] is False
+    assert [(ligne["physique"], ligne["reserve"], ligne["disponible"]) for ligne in data["lignes"]] == [
+        (3, 3, 0), (0, 0, 0),
+    ]
+
+    # L'annulation rend le stock, aussitôt alloué au reliquat de la seconde commande
+    response = await client.post(f"/api/v1/commandes/{ids[0]}/annuler", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["statut"] == "annulee"
+    assert response.json()["lignes"][0]["quantite_allouee"] == 0
+    data = (await client.get(f"/api/v1/commandes/{ids[1]}", headers=headers)).json()
+    assert data["lignes"][0]["quantite_allouee"] == 2
+    response = await client.get(f"/api/v1/stock/disponibilite/{article_id}", headers=headers)
+    assert response.json() == [
+        {"article_id": article_id, "taille": "", "couleur": "", "physique": 3, "reserve": 2, "disponible": 1},
+    ]
+    response = await client.post(f"/api/v1/commandes/{ids[0]}/annuler", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Commande non annulable"
+
+    # Une commande annulée (ou déjà validée) ne se revalide pas : rien n'est réservé à nouveau
+    for cmd_id in ids:
+        response = await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
+        assert response.status_code == 400
+    response = await client.get(f"/api/v1/stock/disponibilite/{article_id}", headers=headers)
+    assert response.json()[0]["reserve"] == 2
+
+
+@pytest.mark.asyncio
+async def test_expedition_en_masse(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    await entree_stock(client, headers, article_id, 5)
+    bl_ids = []
+    for _ in range(2):
+        cmd_id = (await client.post("/api/v1/commandes", json={
+            "client_id": client_id,
+            "lignes": [{"article_id": article_id, "quantite": 2}],
+        }, headers=headers)).json()["id"]
+        await client.post(f"/api/v1/commandes/{cmd_id}/valider", headers=headers)
+        bl_ids.append((await client.post(f"/api/v1/commandes/{cmd_id}/livrer", headers=headers)).json()["bl_id"])
+
+    response = await client.post("/api/v1/livraisons/expedier", json={"bl_ids": [*bl_ids, 9999]}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["bls"]) == 2 and len(data["mouvements"]) == 2
+    assert data["quantite"] == 4
+    assert data["ignores"] == [9999]
+
+    # Une sortie de stock par BL ; le stock physique et le réservé baissent ensemble
+    mouvements = (await client.get("/api/v1/stock/mouvements?type_mouvement=sortie", headers=headers)).json()
+    assert sorted(m["reference_document"] for m in mouvements["items"]) == sorted(data["bls"])
+    article = (await client.get(f"/api/v1/articles/{article_id}", headers=headers)).json()
+    assert article["stock_actuel"] == 1
+    stocks = (await client.get(f"/api/v1/stock/disponibilite/{article_id}", headers=headers)).json()
+    assert (stocks[0]["physique"], stocks[0]["reserve"]) == (1, 0)
+    bl = (await client.get(f"/api/v1/livraisons/{bl_ids[0]}", headers=headers)).json()
+    assert bl["statut"] == "expediee" and bl["date_expedition"]
+
+    # Déjà expédiés : rien ne ressort
+    response = await client.post("/api/v1/livraisons/expedier", json={"bl_ids": bl_ids}, headers=headers)
+    assert response.json()["bls"] == [] and response.json()["ignores"] == sorted(bl_ids)
+    response = await client.post("/api/v1/livraisons/expedier", json={}, headers=headers)
+    assert response.status_code == 400
@@ -1,5 +1,13 @@
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import update
+
+from app.models.facture import Facture
+from app.services import facture_service
+from tests.api.test_commandes import expedier
+from tests.conftest import async_session_test
 
 
 async def setup_auth_and_data(client: AsyncClient) -> tuple[dict, int, int]:
@@ -103,3 +111,40 @@ async def test_list_factures(client: AsyncClient):
     response = await client.get("/api/v1/factures", headers=headers)
     assert response.status_code == 200
     assert response.json()["total"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_marquer_retards(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    now = datetime.now(timezone.utc)
+
+    ids = []
+    for _ in range(2):
+        cmd_resp = await client.post(
+            "/api/v1/commandes",
+            json={
+                "client_id": client_id,
+                "lignes": [
+                    {"article_id": article_id, "designation": "Item", "quantite": 1, "prix_unitaire_ht": "10.00"}
+                ],
+            },
+            headers=headers,
+        )
+        cmd_id = cmd_resp.json()["id"]
+        await expedier(client, headers, cmd_id, article_id, 1)
+        ids.append((await client.post(f"/api/v1/commandes/{cmd_id}/facturer", headers=headers)).json()["facture_id"])
+    echue, a_echoir = ids
+
+    async with async_session_test() as db:
+        for facture_id, echeance in ((echue, now - timedelta(days=1)), (a_echoir, now + timedelta(days=1))):
+            await db.execute(update(Facture).where(Facture.id == facture_id).values(date_echeance=echeance))
+        assert await facture_service.marquer_retards(db) == [echue]
+        assert await facture_service.marquer_retards(db) == []
+        await db.commit()
+
+    response = await client.get(f"/api/v1/factures/{echue}", headers=headers)
+    assert response.json()["statut"] == "en_retard"
+    response = await client.get(f"/api/v1/factures/{a_echoir}", headers=headers)
+    assert response.json()["statut"] == "emise"
+    response = await client.get("/api/v1/reporting/dashboard", headers=headers)
+    assert response.json()["factures_en_retard_count"] == 1
@@ -0,0 +1,59 @@
+import pytest
+from httpx import AsyncClient
+
+from tests.api.test_factures import setup_auth_and_data
+
+
+@pytest.mark.asyncio
+async def test_commande_rejouee(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    body = {
+        "client_id": client_id,
+        "lignes": [{"article_id": article_id, "designation": "Gant", "quantite": 3, "prix_unitaire_ht": "12.00"}],
+    }
+
+    first = await client.post("/api/v1/commandes", json=body, headers={**headers, "Idempotency-Key": "cmd-1"})
+    retry = await client.post("/api/v1/commandes", json=body, headers={**headers, "Idempotency-Key": "cmd-1"})
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotency-Replayed"] == "true"
+    assert (await client.get("/api/v1/commandes", headers=headers)).json()["total"] == 1
+
+    # Même clé, autre contenu : refusé
+    body["lignes"][0]["quantite"] = 4
+    response = await client.post("/api/v1/commandes", json=body, headers={**headers, "Idempotency-Key": "cmd-1"})
+    assert response.status_code == 400
+
+    # Sans clé, chaque requête crée une pièce
+    await client.post("/api/v1/commandes", json=body, headers=headers)
+    await client.post("/api/v1/commandes", json=body, headers=headers)
+    assert (await client.get("/api/v1/commandes", headers=headers)).json()["total"] == 3
+
+
+@pytest.mark.asyncio
+async def test_paiement_et_mouvement_rejoues(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    fac_resp = await client.post(
+        "/api/v1/factures",
+        json={
+            "client_id": client_id,
+            "lignes": [{"article_id": article_id, "designation": "Item", "quantite": 1, "prix_unitaire_ht": "100.00"}],
+        },
+        headers=headers,
+    )
+    fac_id = fac_resp.json()["id"]
+
+    for _ in range(3):
+        response = await client.post(
+            f"/api/v1/factures/{fac_id}/paiement", json={"montant": "50.00"},
+            headers={**headers, "Idempotency-Key": "paiement-1"},
+        )
+        assert response.status_code == 200
+    assert float(response.json()["montant_regle"]) == 50.00
+
+    mouvement = {"type_mouvement": "entree", "depot_destination": "Principal",
+                 "lignes": [{"article_id": article_id, "quantite": 10}]}
+    for _ in range(2):
+        await client.post("/api/v1/stock/mouvements", json=mouvement, headers={**headers, "Idempotency-Key": "mvt-1"})
+    article = (await client.get(f"/api/v1/articles/{article_id}", headers=headers)).json()
+    assert article["stock_actuel"] == 10
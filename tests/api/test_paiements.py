@@ -0,0 +1,188 @@
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select, update
+
+from app.models.facture import Facture, Paiement, StatutFacture
+from app.services import facture_service, rapprochement_service
+from tests.api.test_commandes import expedier
+from tests.api.test_factures import setup_auth_and_data
+from tests.conftest import async_session_test
+
+
+async def creer_facture(client: AsyncClient, headers: dict, client_id: int, article_id: int, prix: str) -> dict:
+    """Facture émise depuis une commande (les brouillons ne sont pas rapprochés)."""
+    response = await client.post(
+        "/api/v1/commandes",
+        json={
+            "client_id": client_id,
+            "lignes": [{"article_id": article_id, "designation": "Item", "quantite": 1, "prix_unitaire_ht": prix}],
+        },
+        headers=headers,
+    )
+    cmd_id = response.json()["id"]
+    await expedier(client, headers, cmd_id, article_id, 1)
+    fac_id = (await client.post(f"/api/v1/commandes/{cmd_id}/facturer", headers=headers)).json()["facture_id"]
+    return (await client.get(f"/api/v1/factures/{fac_id}", headers=headers)).json()
+
+
+async def rapprocher(client: AsyncClient, headers: dict, contenu: str, nom: str, simulation: bool = False) -> dict:
+    response = await client.post(
+        "/api/v1/factures/rapprochement",
+        params={"simulation": simulation},
+        files={"releve": (nom, contenu.encode())},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_journal_des_paiements(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    facture = await creer_facture(client, headers, client_id, article_id, "100.00")
+
+    for montant, reference in (("50.00", "CHQ-1"), ("70.00", None)):
+        response = await client.post(
+            f"/api/v1/factures/{facture['id']}/paiement",
+            json={"montant": montant, "mode_reglement": "cheque", "reference": reference},
+            headers=headers,
+        )
+        assert response.status_code == 200
+    assert response.json()["statut"] == "payee"
+    assert float(response.json()["montant_regle"]) == 120.00
+
+    response = await client.get(f"/api/v1/factures/{facture['id']}/paiements", headers=headers)
+    paiements = response.json()
+    assert [float(p["montant"]) for p in paiements] == [50.00, 70.00]
+    assert paiements[0]["reference"] == "CHQ-1"
+
+    response = await client.post(
+        f"/api/v1/factures/{facture['id']}/paiement", json={"montant": "0"}, headers=headers
+    )
+    assert response.status_code == 422
+
+    # Facture soldée : plus de règlement
+    response = await client.post(
+        f"/api/v1/factures/{facture['id']}/paiement", json={"montant": "10.00"}, headers=headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_paiement_facture_annulee_entre_temps(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    facture = await creer_facture(client, headers, client_id, article_id, "100.00")
+
+    async with async_session_test() as db:
+        lue = await facture_service.get_facture(db, facture["id"])
+        await db.execute(update(Facture).where(Facture.id == lue.id).values(statut=StatutFacture.ANNULEE))
+        with pytest.raises(ValueError, match="non réglable"):
+            await facture_service.enregistrer_paiement(db, lue, Decimal("100.00"))
+        assert (await db.execute(select(func.count(Paiement.id)))).scalar() == 0
+        assert (await db.execute(select(Facture.statut).where(Facture.id == lue.id))).scalar() == StatutFacture.ANNULEE
+
+
+@pytest.mark.asyncio
+async def test_rapprochement_csv(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    f1 = await creer_facture(client, headers, client_id, article_id, "50.00")
+    f2 = await creer_facture(client, headers, client_id, article_id, "100.00")
+    releve = (
+        "Date;Libellé;Montant;Référence\n"
+        f"02/03/2026;VIR CLIENT TEST {f1['numero']};30,00;BQ-1\n"
+        "03/03/2026;VIREMENT CLIENT TEST;120,00;BQ-2\n"
+        "03/03/2026;FRAIS BANCAIRES;-4,90;BQ-3\n"
+        "04/03/2026;VIREMENT INCONNU;999,00;BQ-4\n"
+    )
+
+    resultat = await rapprocher(client, headers, releve, "releve.csv", simulation=True)
+    assert resultat["rapprochees"] == 2
+    factures = (await client.get("/api/v1/factures", headers=headers)).json()["items"]
+    assert all(float(f["montant_regle"]) == 0 for f in factures)
+
+    resultat = await rapprocher(client, headers, releve, "releve.csv")
+    assert resultat["lignes"] == 3
+    assert resultat["rapprochees"] == 2
+    assert float(resultat["montant_rapproche"]) == 150.00
+    methodes = {d["facture_numero"]: d["methode"] for d in resultat["details"] if d["facture_id"]}
+    assert methodes == {f1["numero"]: "numero", f2["numero"]: "montant"}
+
+    response = await client.get(f"/api/v1/factures/{f1['id']}", headers=headers)
+    assert response.json()["statut"] == "payee_partiellement"
+    response = await client.get(f"/api/v1/factures/{f2['id']}", headers=headers)
+    assert response.json()["statut"] == "payee"
+
+    # Relevé rechargé : aucune double imputation
+    resultat = await rapprocher(client, headers, releve, "releve.csv")
+    assert resultat["rapprochees"] == 0
+    response = await client.get(f"/api/v1/factures/{f1['id']}/paiements", headers=headers)
+    assert len(response.json()) == 1
+
+    response = await client.post(
+        "/api/v1/factures/rapprochement", files={"releve": ("vide.csv", b"Date;Libelle\n")}, headers=headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_rapprochement_camt(client: AsyncClient):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    f1 = await creer_facture(client, headers, client_id, article_id, "50.00")
+    f2 = await creer_facture(client, headers, client_id, article_id, "100.00")
+    releve = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02">
+  <BkToCstmrStmt><Stmt>
+    <Ntry>
+      <Amt Ccy="EUR">180.00</Amt><CdtDbtInd>CRDT</CdtDbtInd>
+      <BookgDt><Dt>2026-03-05</Dt></BookgDt><AcctSvcrRef>CAMT-1</AcctSvcrRef>
+      <NtryDtls><TxDtls><RmtInf><Ustrd>REGLEMENT {f1['numero']} {f2['numero']}</Ustrd></RmtInf></TxDtls></NtryDtls>
+    </Ntry>
+    <Ntry>
+      <Amt Ccy="EUR">12.00</Amt><CdtDbtInd>DBIT</CdtDbtInd>
+      <BookgDt><Dt>2026-03-05</Dt></BookgDt><AcctSvcrRef>CAMT-2</AcctSvcrRef>
+    </Ntry>
+  </Stmt></BkToCstmrStmt>
+</Document>"""
+
+    resultat = await rapprocher(client, headers, releve, "releve.xml")
+    assert resultat["lignes"] == 1
+    assert resultat["rapprochees"] == 1
+    assert float(resultat["montant_rapproche"]) == 180.00
+    for facture in (f1, f2):
+        response = await client.get(f"/api/v1/factures/{facture['id']}", headers=headers)
+        assert response.json()["statut"] == "payee"
+
+
+@pytest.mark.asyncio
+async def test_rapprochement_facture_close(client: AsyncClient, monkeypatch):
+    headers, client_id, article_id = await setup_auth_and_data(client)
+    f1 = await creer_facture(client, headers, client_id, article_id, "50.00")
+    f2 = await creer_facture(client, headers, client_id, article_id, "100.00")
+    releve = (
+        "Date;Libellé;Montant;Référence\n"
+        f"02/03/2026;VIR {f1['numero']};60,00;BQ-1\n"
+        f"03/03/2026;VIR {f1['numero']};10,00;BQ-2\n"
+        f"04/03/2026;VIR {f2['numero']};120,00;BQ-3\n"
+    )
+
+    # f2 est annulée entre la lecture des factures ouvertes et l'imputation
+    references_connues = rapprochement_service._references_connues
+
+    async def annuler_f2(db, references):
+        await db.execute(update(Facture).where(Facture.id == f2["id"]).values(statut=StatutFacture.ANNULEE))
+        return await references_connues(db, references)
+
+    monkeypatch.setattr(rapprochement_service, "_references_connues", annuler_f2)
+    resultat = await rapprocher(client, headers, releve, "releve.csv")
+
+    assert resultat["rapprochees"] == 1
+    assert [(d["ligne"], d["facture_id"], d["motif"]) for d in resultat["details"]] == [
+        (2, f1["id"], None),
+        (3, None, "facture citée déjà soldée"),
+        (4, None, "facture soldée ou annulée entre-temps"),
+    ]
+    response = await client.get(f"/api/v1/factures/{f2['id']}", headers=headers)
+    assert response.json()["statut"] == "annulee"
+    assert float(response.json()["montant_regle"]) == 0
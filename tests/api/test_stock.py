@@ -137,3 +137,64 @@ async def test_alertes_stock(client: AsyncClient):
     response = await client.get("/api/v1/stock/alertes", headers=headers)
     assert response.status_code == 200
     assert any(a["reference"] == "STK-ALERT-001" for a in response.json())
+
+
+@pytest.mark.asyncio
+async def test_registre_par_depot_et_variante(client: AsyncClient):
+    token, _ = await get_token_and_article(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    article_id = (await client.post(
+        "/api/v1/articles",
+        json={
+            "reference": "STK-VAR-001",
+            "designation": "Blouson par taille",
+            "prix_vente_ht": "100.00",
+            "stock_actuel": 50,
+            "tailles": [{"taille": "S", "stock": 10}, {"taille": "M", "stock": 20}, {"taille": "L", "stock": 20}],
+        },
+        headers=headers,
+    )).json()["id"]
+
+    async def etat() -> tuple:
+        article = (await client.get(f"/api/v1/articles/{article_id}", headers=headers)).json()
+        return (
+            article["stock_actuel"],
+            {t["taille"]: t["stock"] for t in article["tailles"]},
+            {d["depot"]: d["stock"] for d in article["depots"]},
+        )
+
+    async def mouvement(**data) -> int:
+        response = await client.post("/api/v1/stock/mouvements", json=data, headers=headers)
+        return response.status_code
+
+    assert await etat() == (50, {"S": 10, "M": 20, "L": 20}, {"Principal": 50})
+    ligne_m = {"article_id": article_id, "taille": "M", "quantite": 5}
+    assert await mouvement(type_mouvement="entree", depot_destination="Annexe", lignes=[ligne_m]) == 201
+    assert await etat() == (55, {"S": 10, "M": 25, "L": 20}, {"Principal": 50, "Annexe": 5})
+
+    # Le transfert déplace le stock sans changer le stock de l'article
+    ligne_m["quantite"] = 3
+    assert await mouvement(
+        type_mouvement="transfert", depot_source="Annexe", depot_destination="Principal", lignes=[ligne_m],
+    ) == 201
+    assert await etat() == (55, {"S": 10, "M": 25, "L": 20}, {"Principal": 53, "Annexe": 2})
+    assert await mouvement(type_mouvement="transfert", depot_source="Annexe", lignes=[ligne_m]) == 400
+
+    # L'inventaire d'un dépôt ne touche que ce dépôt
+    inventaire_id = (await client.post("/api/v1/stock/inventaires", json={
+        "depot": "Annexe",
+        "lignes": [{"article_id": article_id, "taille": "M", "stock_theorique": 2, "stock_physique": 0}],
+    }, headers=headers)).json()["id"]
+    await client.post(f"/api/v1/stock/inventaires/{inventaire_id}/valider", headers=headers)
+    assert await etat() == (53, {"S": 10, "M": 23, "L": 20}, {"Principal": 53, "Annexe": 0})
+    stocks = (await client.get(f"/api/v1/stock/depots/{article_id}", headers=headers)).json()
+    assert [(s["depot"], s["taille"], s["quantite"]) for s in stocks] == [
+        ("Annexe", "M", 0), ("Principal", "L", 20), ("Principal", "M", 23), ("Principal", "S", 10),
+    ]
+
+    # Le stock saisi avec une nouvelle taille ou un nouveau dépôt entre au registre
+    await client.post(f"/api/v1/articles/{article_id}/tailles", json={"taille": "XL", "stock": 4}, headers=headers)
+    await client.post(f"/api/v1/articles/{article_id}/depots", json={"depot": "Atelier", "stock": 6}, headers=headers)
+    assert await etat() == (
+        63, {"S": 10, "M": 23, "L": 20, "XL": 4}, {"Principal": 57, "Annexe": 0, "Atelier": 6},
+    )
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 
 from app.database import Base, get_db
 from app.main import app
+from app.services import tarif_service
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
@@ -28,6 +29,7 @@ async def setup_db():
     yield
     async with engine_test.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+    tarif_service.invalider()
 
 
 async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
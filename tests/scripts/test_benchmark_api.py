@@ -0,0 +1,18 @@
+from scripts.benchmark_api import compare
+
+BASELINE = {"dashboard": {"p50_ms": 10.0, "p95_ms": 12.0, "requetes": 6, "memoire_kb": 90}}
+
+
+def test_compare_sans_regression():
+    results = {"dashboard": {"p50_ms": 11.0, "p95_ms": 13.5, "requetes": 6, "memoire_kb": 300}}
+    assert compare(results, BASELINE, tolerance=0.25) == []
+
+
+def test_compare_detecte_les_regressions():
+    results = {
+        "dashboard": {"p50_ms": 20.0, "p95_ms": 30.0, "requetes": 7, "memoire_kb": 900},
+        "nouveau_cas": {"p50_ms": 1.0, "p95_ms": 1.0, "requetes": 1, "memoire_kb": 1},
+    }
+    regressions = compare(results, BASELINE, tolerance=0.25)
+    assert len(regressions) == 3
+    assert all(r.startswith("dashboard") for r in regressions)
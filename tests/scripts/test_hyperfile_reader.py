@@ -0,0 +1,81 @@
+import json
+import struct
+
+from scripts.hyperfile_reader import FicLayout, read_fic
+
+LAYOUT = {
+    "header_size": 16,
+    "record_size": 48,
+    "fields": [
+        {"name": "REFERENCE", "type": "texte", "offset": 1, "size": 12},
+        {"name": "STOCK", "type": "entier", "offset": 13, "size": 4},
+        {"name": "PRIX_VENTE_HT", "type": "monetaire", "offset": 17, "size": 8},
+        {"name": "DATE_CREATION", "type": "date", "offset": 25, "size": 8},
+        {"name": "ACTIF", "type": "booleen", "offset": 33, "size": 1},
+        {"name": "POIDS", "type": "reel", "offset": 34, "size": 8},
+        {"name": "DESCRIPTION", "type": "memo", "offset": 42, "size": 4},
+    ],
+}
+
+
+def _record(
+    etat: bytes, reference: str, stock: int, prix_centimes: int, date: str, actif: bool, poids: float, memo: int
+) -> bytes:
+    raw = (
+        etat
+        + reference.encode("cp1252").ljust(12, b"\x00")
+        + struct.pack("<i", stock)
+        + struct.pack("<q", prix_centimes * 100)
+        + date.encode("ascii")
+        + (b"\x01" if actif else b"\x00")
+        + struct.pack("<d", poids)
+        + struct.pack("<I", memo)
+    )
+    return raw.ljust(48, b"\x00")
+
+
+def _write_fixture(tmp_path):
+    memo_text = "Casque intégral homologué ECE".encode("cp1252")
+    (tmp_path / "articles.mmo").write_bytes(b"\x00" * 8 + struct.pack("<I", len(memo_text)) + memo_text)
+    (tmp_path / "articles.fic").write_bytes(
+        b"\x00" * 16
+        + _record(b"\x00", "CASQ-001", 45, 18990, "20240115", True, 1.5, 8)
+        + _record(b"X", "SUPPRIME", 1, 100, "20200101", False, 0.0, 0)
+        + _record(b"\x00", "GANT-Été", -2, 7990, "20231201", False, 0.25, 0)
+    )
+    (tmp_path / "articles.json").write_text(json.dumps(LAYOUT), encoding="utf-8")
+    return FicLayout.from_json(tmp_path / "articles.json")
+
+
+def test_read_fic_decode_les_champs(tmp_path):
+    layout = _write_fixture(tmp_path)
+
+    rows = [dict(row) for _, row in read_fic(tmp_path / "articles.fic", layout)]
+
+    assert [r["REFERENCE"] for r in rows] == ["CASQ-001", "GANT-Été"]
+    assert rows[0]["STOCK"] == "45"
+    assert rows[1]["STOCK"] == "-2"
+    assert rows[0]["PRIX_VENTE_HT"] == "189.9000"
+    assert rows[0]["DATE_CREATION"] == "20240115"
+    assert rows[0]["ACTIF"] == "1"
+    assert rows[1]["ACTIF"] == "0"
+    assert float(rows[1]["POIDS"]) == 0.25
+    assert rows[0]["DESCRIPTION"] == "Casque intégral homologué ECE"
+    assert rows[1]["DESCRIPTION"] == ""
+
+
+def test_read_fic_reprise_a_l_offset(tmp_path):
+    layout = _write_fixture(tmp_path)
+
+    offsets = [offset for offset, _ in read_fic(tmp_path / "articles.fic", layout)]
+    reprise = [row["REFERENCE"] for _, row in read_fic(tmp_path / "articles.fic", layout, offsets[0])]
+
+    assert offsets == [16 + 48, 16 + 3 * 48]
+    assert reprise == ["GANT-Été"]
+
+
+def test_read_fic_fichier_vide(tmp_path):
+    layout = _write_fixture(tmp_path)
+    (tmp_path / "vide.fic").write_bytes(b"\x00" * 16)
+
+    assert list(read_fic(tmp_path / "vide.fic", layout)) == []
@@ -0,0 +1,74 @@
+from collections import Counter
+from types import SimpleNamespace
+
+from sqlalchemy import select, text
+
+from app.models import Fournisseur
+from scripts import migrate_hyperfile
+from tests.conftest import async_session_test, engine_test
+
+
+class _CopieSansDefauts:
+    """Simule COPY : seules les colonnes transmises sont écrites, sans défaut côté Python."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def copy_records_to_table(self, table_name, records, columns):
+        noms = ", ".join(columns)
+        valeurs = ", ".join(f":c{i}" for i in range(len(columns)))
+        await self.conn.execute(
+            text(f"INSERT INTO {table_name} ({noms}) VALUES ({valeurs})"),
+            [{f"c{i}": v for i, v in enumerate(record)} for record in records],
+        )
+
+
+async def _charger_par_copy(conn, table, columns, batch, natural_key):
+    async def raw():
+        return SimpleNamespace(driver_connection=_CopieSansDefauts(conn))
+
+    return await migrate_hyperfile._copy_batch(SimpleNamespace(get_raw_connection=raw), table, columns, batch, None)
+
+
+async def test_import_copy_applique_les_defauts_des_colonnes_non_importees(tmp_path, monkeypatch):
+    (tmp_path / "fournisseurs.csv").write_text(
+        "CODE;RAISON_SOCIALE;VILLE\nF001;Tissages du Nord;Lille\nF002;Cuirs Martin;\n", encoding="utf-8"
+    )
+    monkeypatch.setattr(migrate_hyperfile, "engine", engine_test)
+    monkeypatch.setattr(migrate_hyperfile, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(migrate_hyperfile, "CHECKPOINT_FILE", tmp_path / "checkpoints.json")
+    monkeypatch.setattr(migrate_hyperfile, "_insert_batch", _charger_par_copy)
+
+    written = await migrate_hyperfile.import_csv("fournisseurs.csv", Fournisseur, {
+        "CODE": "code", "RAISON_SOCIALE": "raison_sociale", "VILLE": "ville",
+    })
+
+    assert written == 2
+    async with async_session_test() as db:
+        fournisseurs = (await db.execute(select(Fournisseur).order_by(Fournisseur.code))).scalars().all()
+    assert [(f.code, f.ville, f.pays, f.actif) for f in fournisseurs] == [
+        ("F001", "Lille", "France", True),
+        ("F002", None, "France", True),
+    ]
+
+
+def test_ligne_sans_numero_rejetee():
+    records = [
+        (10, {"NUMERO_COMMANDE": "CMD-1", "LIGNE": "1"}),
+        (20, {"NUMERO_COMMANDE": "CMD-1", "LIGNE": ""}),
+        (30, {"NUMERO_COMMANDE": "CMD-1", "LIGNE": "0"}),
+        (40, {"NUMERO_COMMANDE": "CMD-1", "LIGNE": "2,0"}),
+    ]
+    stats = {"rejets": 0, "vides": Counter()}
+    rows = migrate_hyperfile._iter_rows(
+        records,
+        {"NUMERO_COMMANDE": "commande_id", "LIGNE": "ligne_numero"},
+        {"commande_id": {"CMD-1": 7}.get, "ligne_numero": migrate_hyperfile.to_numero},
+        {"commande_id": None, "ligne_numero": None},
+        ["commande_id", "ligne_numero"],
+        stats,
+    )
+
+    # Les lignes sans numéro ne sont pas fusionnées sur un numéro 0 : elles sont rejetées et signalées
+    assert list(rows) == [(10, {"commande_id": 7, "ligne_numero": 1}), (40, {"commande_id": 7, "ligne_numero": 2})]
+    assert stats == {"rejets": 2, "vides": Counter({"ligne_numero": 2})}
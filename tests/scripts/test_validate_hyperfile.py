@@ -0,0 +1,38 @@
+from scripts.validate_hyperfile import validate
+
+
+def test_validate_detecte_les_anomalies(tmp_path):
+    (tmp_path / "clients.csv").write_bytes(
+        b"CODE_CLIENT;RAISON_SOCIALE;DELAI_REGLEMENT\n"
+        b"C1;Dupont;30\n"
+        b"C2;Caf\xe9 Martin;abc\n"
+        b"C1;Doublon;30\n"
+    )
+    (tmp_path / "commandes.csv").write_text(
+        "NUMERO;CODE_CLIENT;DATE;STATUT;TOTAL_HT\n"
+        "CMD-1;C1;15/01/2024;BROUILLON;10,50\n"
+        "CMD-2;C9;31/02/2024;INCONNU;1\n",
+        encoding="utf-8",
+    )
+
+    report = validate(tmp_path, workers=2, chunk_size=16)
+
+    assert report["valide"] is False
+    clients = report["fichiers"]["clients.csv"]
+    assert clients["lignes"] == 3
+    assert clients["anomalies"] == {"encodage": 1, "type": 1, "doublon": 1}
+    commandes = report["fichiers"]["commandes.csv"]
+    assert commandes["anomalies"] == {"type": 2, "orphelin": 1}
+    assert "commandes.csv:CODE_VRP" in report["references_non_verifiees"]
+
+
+def test_validate_export_propre(tmp_path):
+    (tmp_path / "articles.csv").write_text(
+        "REFERENCE;DESIGNATION;PRIX_VENTE_HT;STOCK\nCASQ-001;Casque;189,90;45\nGANT-002;Gants;49,90;0\n",
+        encoding="utf-8",
+    )
+
+    report = validate(tmp_path, workers=1)
+
+    assert report["valide"] is True
+    assert report["fichiers"]["articles.csv"] == {"lignes": 2, "anomalies": {}, "exemples": []}
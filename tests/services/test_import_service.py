@@ -0,0 +1,15 @@
+import io
+
+from app.services.import_service import BLOC_ENCODAGE, ouvrir
+
+
+def test_ouvrir_reconnait_l_encodage():
+    # Fichier court lu en entier : un accent Windows-1252 en fin de fichier n'est pas de l'UTF-8 coupé
+    court = "reference;designation\nCASQ-01;Casque doré\n".encode("cp1252")
+    assert ouvrir(io.BytesIO(court)).read().endswith("Casque doré\n")
+
+    # Caractère coupé par la fin du bloc lu : le fichier reste de l'UTF-8
+    long = ("x" * (BLOC_ENCODAGE - 1) + "é\n").encode("utf-8")
+    assert ouvrir(io.BytesIO(long)).read().endswith("xé\n")
+
+    assert ouvrir(io.BytesIO("\ufeffréf;qté\n".encode("utf-8"))).read() == "réf;qté\n"
@@ -0,0 +1,22 @@
+from sqlalchemy import delete, insert, select
+
+from app.models import Facture, FactureArchive
+from app.services import numerotation_service
+from tests.conftest import async_session_test
+
+
+async def test_numeros_deja_portes_ecartes():
+    async with async_session_test() as db:
+        # Deux pièces existantes (compteur initialisé à 2), dont une archivée, portent les numéros suivants
+        factures = Facture.__table__
+        montants = {"total_ht": 0, "total_tva": 0, "total_ttc": 0, "montant_regle": 0, "remise_globale_pct": 0}
+        await db.execute(insert(factures), [
+            {"id": 1, "numero": "FAC-000003", "client_id": 1, "statut": "PAYEE", **montants},
+            {"id": 2, "numero": "FAC-000004", "client_id": 1, "statut": "PAYEE", **montants},
+        ])
+        archivee = (await db.execute(select(factures).where(factures.c.id == 2))).mappings().one()
+        await db.execute(insert(FactureArchive.__table__).values(**archivee, lignes=[]))
+        await db.execute(delete(factures).where(factures.c.id == 2))
+
+        assert await numerotation_service.numero(db, Facture, "FAC") == "FAC-000005"
+        assert await numerotation_service.numeros(db, Facture, "FAC", 2) == ["FAC-000006", "FAC-000007"]
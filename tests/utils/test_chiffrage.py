@@ -0,0 +1,46 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.utils.chiffrage import VentilationTVA, chiffrer, montant_ligne, totaliser
+
+
+def ligne(quantite: int, prix: str, remise: str = "0", tva: str = "20.00") -> SimpleNamespace:
+    return SimpleNamespace(
+        quantite=quantite, prix_unitaire_ht=Decimal(prix), remise_pct=Decimal(remise), tva_pct=Decimal(tva)
+    )
+
+
+def test_chiffrer_ventile_la_tva_par_taux():
+    chiffrage = chiffrer(
+        [ligne(3, "19.99", "10"), ligne(1, "45.50"), ligne(2, "12.3456", tva="5.50")],
+        remise_globale_pct=Decimal("5"),
+    )
+    # 3 × 19,99 × 0,9 = 53,973 -> 53,97 ; 2 × 12,3456 = 24,6912 -> 24,69
+    assert chiffrage.montants_ht == [Decimal("53.97"), Decimal("45.50"), Decimal("24.69")]
+    assert chiffrage.ventilation == [
+        # 24,69 × 0,95 = 23,4555 -> 23,46 ; TVA 1,2903 -> 1,29
+        VentilationTVA(Decimal("5.50"), Decimal("23.46"), Decimal("1.29")),
+        # 99,47 × 0,95 = 94,4965 -> 94,50 ; TVA 18,90
+        VentilationTVA(Decimal("20.00"), Decimal("94.50"), Decimal("18.90")),
+    ]
+    assert chiffrage.total_ht == Decimal("117.96")
+    assert chiffrage.total_tva == Decimal("20.19")
+    assert chiffrage.total_ttc == Decimal("138.15")
+
+
+def test_chiffrer_arrondit_au_centime_superieur_et_symetriquement():
+    assert chiffrer([ligne(1, "0.125")]).montants_ht == [Decimal("0.13")]
+    assert chiffrer([ligne(-1, "0.125")]).montants_ht == [Decimal("-0.13")]
+    vide = chiffrer([])
+    assert (vide.total_ht, vide.total_tva, vide.total_ttc, vide.ventilation) == (0, 0, 0, [])
+
+
+def test_totaliser_depuis_les_bases_par_taux():
+    lignes = [ligne(3, "19.99", "10"), ligne(1, "45.50"), ligne(2, "12.3456", tva="5.50")]
+    complet = chiffrer(lignes, Decimal("5"))
+    totaux = totaliser({Decimal("20.00"): Decimal("99.47"), Decimal("5.50"): Decimal("24.69")}, Decimal("5"))
+    assert (totaux.total_ht, totaux.total_tva, totaux.total_ttc) == (
+        complet.total_ht, complet.total_tva, complet.total_ttc,
+    )
+    assert totaux.ventilation == complet.ventilation
+    assert montant_ligne(lignes[0]) == Decimal("53.97")